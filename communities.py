@@ -2,6 +2,8 @@ import pynet,netext
 import numpy as np
 import info_theory as ith
 import operator
+import hashlib
+import itertools
 
 def printname(fun):
     """Decorator for identifying the called method.
@@ -12,7 +14,18 @@ def printname(fun):
     return new_fun
 
 class NodeCover(object):
-    """Representation of possibly overlapping node partitions."""
+    """Representation of possibly overlapping node partitions.
+
+    The communities are stored either as a list of node sets or, for
+    covers made with fromArrays, as one array of the members of all
+    communities and the offsets where each community starts. The sets
+    are built from the arrays only when `comm` is used.
+    """
+
+    # Members of all communities and the offsets of the communities,
+    # or None if the communities are stored as sets.
+    _members = None
+    _offsets = None
     
     def __init__(self, 
                  cmap=None, 
@@ -81,8 +94,54 @@ class NodeCover(object):
         if self.nodeSeparator==None:
             self.nodeSeparator=" "
 
+    @staticmethod
+    def fromArrays(members, offsets, N_nodes=None):
+        """Create a node cover from concatenated communities.
+
+        Community i consists of members[offsets[i]:offsets[i+1]]. The
+        nodes of each community must be distinct. Communities are
+        ordered by size in decreasing order as in the constructor, but
+        their node sets are built only when they are needed.
+
+        The result is always a NodeCover, also when called through a
+        subclass; use NodePartition(labels=...) to create a partition
+        from arrays.
+
+        Parameters
+        ----------
+        members : numpy.ndarray
+            The nodes of all communities.
+        offsets : sequence of ints
+            The start of each community in `members`, followed by
+            len(members).
+        N_nodes : int
+            The total number of nodes in the network. If None, the
+            number of distinct nodes in `members` is used.
+        """
+        cover = NodeCover()
+        members = np.asarray(members)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        order = np.argsort(-np.diff(offsets), kind='mergesort')
+        positions, sizes = netext._neighborPositions(offsets, order)
+        cover._members = members[positions]
+        cover._offsets = np.concatenate(([0], np.cumsum(sizes)))
+        cover._comm = None
+        if N_nodes is None:
+            N_nodes = len(np.unique(members))
+        cover.N_nodes = N_nodes
+        return cover
+
+    def _getArrays(self):
+        """Return the communities as a sequence of the members of all
+        communities and an array of the offsets of the communities."""
+        if self._offsets is not None:
+            return self._members, self._offsets
+        sizes = self.getCommunitySizes()
+        members = list(itertools.chain.from_iterable(self.comm))
+        return members, np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+
     def _addCommunity(self,newCommunity):
-        self._comm.append(set(newCommunity))
+        self.comm.append(set(newCommunity))
 
     def _parseStrings(self,input):
         for line in input:
@@ -90,10 +149,17 @@ class NodeCover(object):
             self._addCommunity(fields)
 
     def _sortBySize(self):
-        self._comm.sort(key=len, reverse=True)     
+        self.comm.sort(key=len, reverse=True)     
 
     @property
     def comm(self):
+        if self._comm is None:
+            # Build the sets from the arrays. After this the sets are
+            # the only representation, so that they can be modified.
+            members, offsets = self._members, self._offsets.tolist()
+            self._comm = [set(members[start:end].tolist())
+                          for start, end in zip(offsets[:-1], offsets[1:])]
+            self._members = self._offsets = None
         return self._comm
 
     def __str__(self):
@@ -103,6 +169,8 @@ class NodeCover(object):
         return self.comm[index]
 
     def __len__(self):
+        if self._offsets is not None:
+            return len(self._offsets) - 1
         return len(self.comm)
 
     def __iter__(self):
@@ -111,6 +179,8 @@ class NodeCover(object):
 
     def getCommunitySizes(self):
         """Return list of community sizes."""
+        if self._offsets is not None:
+            return np.diff(self._offsets).tolist()
         return map(len, self.comm)
 
     def getGiant(self):
@@ -137,10 +207,9 @@ class NodeCover(object):
            are keys and the number of communities of that size is the
            value.
         """
-        dist = {}
-        for cs in self.getCommunitySizes():
-            dist[cs] = 1 + dist.get(cs, 0)
-        return dist
+        sizes, counts = np.unique(np.array(self.getCommunitySizes(), dtype=int),
+                                  return_counts=True)
+        return dict(zip(sizes.tolist(), counts.tolist()))
 
     def getSusceptibility1(self, size=None):
         """Return the susceptibility.
@@ -154,17 +223,15 @@ class NodeCover(object):
         community structure.  If there is only 0 or 1 community, zero
         is returned.
         """
-        sd = self.getSizeDist()
+        sizes = np.array(self.getCommunitySizes(), dtype=np.int64)
         
-        if len(sd) < 1:
+        if len(sizes) < 1:
             if size==None or size==0:
                 return 0.0
             else:
                 return 1.0
 
-        sizeSum = 0
-        for key, value in sd.iteritems():
-            sizeSum += key*value
+        sizeSum = int(sizes.sum())
 
         # If no size is given, assume that also communities of size 1
         # are included.
@@ -175,13 +242,11 @@ class NodeCover(object):
             sus=size-sizeSum #s=1
             assert(sus>=0)
 
-        # Remove largest component
-        gc = max(sd.keys())
-        sd[gc] = 0
-
-        # Calculate the susceptibility
-        for key, value in sd.iteritems():
-            sus += value*key**2
+        # Remove all largest components and calculate the
+        # susceptibility.
+        gc = int(sizes.max())
+        sizes = sizes[sizes != gc]
+        sus += int(np.dot(sizes, sizes))
         if (size-gc) == 0:
             return 0.0
         else:
@@ -201,17 +266,15 @@ class NodeCover(object):
         community structure.  If there is only 0 or 1 community, zero
         is returned.
         """
-        sd = self.getSizeDist()
+        sizes = np.array(self.getCommunitySizes(), dtype=np.int64)
         
-        if len(sd) < 1:
+        if len(sizes) < 1:
             if size==None or size==0:
                 return 0.0
             else:
                 return 1.0
 
-        sizeSum = 0
-        for key, value in sd.iteritems():
-            sizeSum += key*value
+        sizeSum = int(sizes.sum())
 
         # If no size is given, assume that also communities of size 1
         # are included.
@@ -222,13 +285,10 @@ class NodeCover(object):
             sus=size-sizeSum #s=1
             assert(sus>=0)
 
-        # Remove largest component
-        gc = max(sd.keys())
-        sd[gc] = sd[gc]-1
-
-        # Calculate the susceptibility
-        for key, value in sd.iteritems():
-            sus += value*key**2
+        # Remove one largest component and calculate the
+        # susceptibility.
+        gc = int(sizes.max())
+        sus += int(np.dot(sizes, sizes)) - gc**2
         if (size-gc) == 0:
             return 0.0
         else:
@@ -246,73 +306,58 @@ class NodeCover(object):
         community structure.  If there is only 0 or 1 community, zero
         is returned.
         """
-        sd = self.getSizeDist()
+        sizes = np.array(self.getCommunitySizes(), dtype=np.int64)
         
-        if len(sd) < 1:
+        if len(sizes) < 1:
             if size==None or size==0:
                 return 0.0
             else:
                 return 1.0
 
-        sizeSum = 0
-        for key, value in sd.iteritems():
-            sizeSum += key*value
+        if size!=None:
+            assert(size-sizes.sum()>=0)
 
-        # If no size is given, assume that also communities of size 1
-        # are included.
-        if size==None:
-            sus=0
-            size=sizeSum
-        else:
-            sus=size-sizeSum #s=1
-            assert(sus>=0)
-
-        gc = self.getCommunitySizes()
-        denom = np.sum(gc)**2
-        gc[0] = 0
-        numer = np.sum([x**2 for x in gc])
+        # The sizes are in decreasing order, so that sizes[0] is the
+        # largest community.
+        denom = sizes.sum()**2
+        numer = np.dot(sizes[1:], sizes[1:])
 
         return float(denom)/float(numer)
 
 
     def getCollapsed(self):
+        """Return a node cover where each node of this cover, which
+        must be a collection of nodes such as a k-clique, is replaced
+        by the nodes it contains.
         """
-
-        """
-        newcs = NodeCover()
-        for community in self._comm:
-            newCommunity = set()
-            for oldnode in community:
-                for newnode in oldnode:
-                    newCommunity.add(newnode)
-
-            newCommunityArray=[]
-            for node in newCommunity:
-                newCommunityArray.append(node)
-            newcs._addCommunity(newCommunityArray)
-
-        newcs._sortBySize()
-        return newcs
+        return self._getExpanded(lambda node: node)
 
     def getNew(self,newNodes):
         """
         Returns new community structure based on this one and
         new nodes denoted by indices on this one
         """
-        newcs=NodeCover({})
-        for community in self._comm:
-            newCommunity=set()
-            for oldnode in community:
-                for newnode in newNodes[oldnode]:
-                    newCommunity.add(newnode)
-
-            newCommunityArray=[]
-            for node in newCommunity:
-                newCommunityArray.append(node)
-            newcs._addCommunity(newCommunityArray)
-
-        newcs._sortBySize()
-        return newcs
+        return self._getExpanded(lambda node: newNodes[node])
+
+    def _getExpanded(self, expand):
+        """Return a node cover where each node of this cover is
+        replaced by the nodes in expand(node)."""
+        members, offsets = self._getArrays()
+        parts = [list(expand(node)) for node in members]
+        nodes = pynet._namesToArray(list(itertools.chain.from_iterable(parts)))
+        if len(nodes) == 0:
+            return NodeCover.fromArrays(nodes, np.zeros(len(offsets), dtype=np.int64))
+
+        # The community of each new node, and the distinct new nodes
+        # of each community in order.
+        nComms = len(offsets) - 1
+        commIDs = np.repeat(np.repeat(np.arange(nComms), np.diff(offsets)),
+                            map(len, parts))
+        names, nodes = np.unique(nodes, return_inverse=True)
+        keys = np.unique(commIDs*len(names) + nodes)
+        sizes = np.bincount(keys // len(names), minlength=nComms)
+        return NodeCover.fromArrays(names[keys % len(names)],
+                                    np.concatenate(([0], np.cumsum(sizes))))
 
     def getCommIDs(self):
         """Construct commIDs.
@@ -359,6 +404,23 @@ class NodeCover(object):
 
         return commNet
 
+    def _getOverlapCounts(self, other):
+        """Return the sizes of the intersections of communities.
+
+        Returns arrays (ci, cj, n_ij) of the same length, where n_ij
+        is the number of common nodes of community ci in self and
+        community cj in `other`. Only overlapping pairs are included,
+        ordered by ci and then by cj.
+        """
+        Nc_A = len(self)
+        cells = sorted((min(ci, cj), max(ci, cj) - Nc_A, n_ij)
+                       for ci, cj, n_ij in self._getOverlapNetwork(other).edges)
+        if len(cells) == 0:
+            return (np.zeros(0, dtype=int), np.zeros(0, dtype=int),
+                    np.zeros(0, dtype=int))
+        ci, cj, n_ij = zip(*cells)
+        return np.array(ci), np.array(cj), np.array(n_ij, dtype=int)
+
     def getMaxVariationOfInformation(self, otherCover):
         """Return maximum variation of information.
 
@@ -397,55 +459,13 @@ class NodeCover(object):
         course the other one is identical, in which case 1.0 is
         returned.)
         """
-        def p_log2_p(p):
-            return (0.0 if p == 0 else -p*np.log2(p))
-        
         # Find out the number of nodes.
         Nf = float(max(self.N_nodes, otherCover.N_nodes))
 
-        # Construct bipartite community network.
-        commNet = self._getOverlapNetwork(otherCover)
-        Nc_A = len(self)
-        Nc_B = len(otherCover)
-
-        # List of community sizes.
-        comm_sizes = self.getCommunitySizes() + otherCover.getCommunitySizes()
-
-        ret_val = 1.0
-        for IX, IY in [(xrange(Nc_A), xrange(Nc_A, Nc_A+Nc_B)),
-                       (xrange(Nc_A, Nc_A+Nc_B), xrange(Nc_A))]:
-            # IX contains the IDs of first communities (first node
-            # cover), IY the IDs of the second communities. These are
-            # flipped on the second iteration to calculate the same
-            # thing the other way around.
-            H_norm = []
-            for X_k in IX:
-                # Calculate the entropies H(X_k|Y_l) for all Y_l in IY
-                # and find the minimum. H_min is initialized to
-                # H(X_k), which is the maximum value and will be the
-                # final value if no Y_l is accepted.
-                px = comm_sizes[X_k]/Nf
-                H_min = H_X = ith.entropy_X([px, 1-px])
-                for Y_l in commNet[X_k]:
-                    cut_size = commNet[X_k][Y_l]
-                    union_size = comm_sizes[X_k] + comm_sizes[Y_l] - cut_size
-                    hP_same = (p_log2_p(cut_size/Nf)
-                               + p_log2_p((Nf - union_size)/Nf))
-                    hP_diff = (p_log2_p((comm_sizes[X_k] - cut_size)/Nf)
-                               + p_log2_p((comm_sizes[Y_l] - cut_size)/Nf))
-                    if (hP_same > hP_diff):
-                        py = comm_sizes[Y_l]/Nf
-                        H_Y = ith.entropy_X([py, 1-py])
-                        H_min = min(H_min, hP_same + hP_diff - H_Y)
-
-                        #print (X_k, Y_l, hP_same, hP_diff, hP_same > hP_diff,
-                        #       (hP_same + hP_diff - H_Y)/H_X)
-                H_norm.append((0 if H_X == 0 else H_min/H_X))
-
-            ret_val -= 0.5*sum(H_norm)/len(IX)
-            #print H_norm, sum(H_norm)/len(IX)
-
-        return ret_val
+        ci, cj, cut = self._getOverlapCounts(otherCover)
+        sizes_A = np.array(self.getCommunitySizes(), dtype=float)
+        sizes_B = np.array(otherCover.getCommunitySizes(), dtype=float)
+        return _maxVariationOfInformation(sizes_A, sizes_B, ci, cj, cut, Nf)
 
 
     def getMaxVariationOfInformation_slow(self, otherCover, N_nodes=None):
@@ -558,6 +578,77 @@ class NodeCover(object):
         return newNet
 
 
+def _plog2p(p):
+    """Return -p*log2(p) elementwise, with 0 for p = 0."""
+    p = np.asarray(p, dtype=float)
+    positive = p > 0
+    return np.where(positive, -p*np.log2(np.where(positive, p, 1)), 0.0)
+
+def _normalizedConditionalEntropies(sizes_X, sizes_Y, cx, cy, cut, Nf):
+    """Return the normalized entropies H(X_k|Y)/H(X_k) of the
+    communities X_k for the maximum variation of information.
+
+    H(X_k|Y) is the minimum of H(X_k|Y_l) over the communities Y_l
+    that overlap X_k and are accepted by the condition of Lancichinetti
+    et al., or H(X_k) if there are none. `cx`, `cy` and `cut` list the
+    overlapping pairs of communities and the sizes of their
+    intersections.
+    """
+    px = sizes_X/Nf
+    H_X = _plog2p(px) + _plog2p(1 - px)
+    H_min = H_X.copy()
+
+    size_x, size_y = sizes_X[cx], sizes_Y[cy]
+    union_size = size_x + size_y - cut
+    hP_same = _plog2p(cut/Nf) + _plog2p((Nf - union_size)/Nf)
+    hP_diff = _plog2p((size_x - cut)/Nf) + _plog2p((size_y - cut)/Nf)
+    accepted = hP_same > hP_diff
+    py = size_y[accepted]/Nf
+    H_Y = _plog2p(py) + _plog2p(1 - py)
+    np.minimum.at(H_min, cx[accepted], (hP_same + hP_diff)[accepted] - H_Y)
+
+    nonzero = H_X != 0
+    return np.where(nonzero, H_min/np.where(nonzero, H_X, 1), 0.0)
+
+
+def _maxVariationOfInformation(sizes_A, sizes_B, ci, cj, cut, Nf):
+    """Return the maximum variation of information of two node
+    covers from their community sizes and the sizes `cut` of the
+    intersections of communities ci and cj."""
+    ret_val = 1.0
+    for args in [(sizes_A, sizes_B, ci, cj), (sizes_B, sizes_A, cj, ci)]:
+        H_norm = _normalizedConditionalEntropies(*(args + (cut, Nf)))
+        ret_val -= 0.5*sum(H_norm.tolist())/len(H_norm)
+    return ret_val
+
+def _contingency(labels_A, labels_B, Nc_A, Nc_B):
+    """Return the nonzero elements of the contingency table of two
+    partitions.
+
+    `labels_A` and `labels_B` hold the community IDs of the same nodes
+    in the two partitions, with negative values for nodes that are not
+    in any community. Returns arrays (ci, cj, n_ij) ordered by ci and
+    then by cj.
+    """
+    common = (labels_A >= 0) & (labels_B >= 0)
+    cells = labels_A[common].astype(np.int64)*Nc_B + labels_B[common]
+    if Nc_A*Nc_B <= 4*len(cells) + 1024:
+        counts = np.bincount(cells, minlength=Nc_A*Nc_B)
+        cells = np.flatnonzero(counts)
+        counts = counts[cells]
+    else:
+        cells, counts = np.unique(cells, return_counts=True)
+    return cells // Nc_B, cells % Nc_B, counts
+
+def _mutualInformation(ci, cj, n_ij, sizes_A, sizes_B, n):
+    """Return the mutual information of two partitions of n nodes
+    from their contingency table."""
+    n_ij = n_ij.astype(float)
+    n_i = np.asarray(sizes_A)[ci]
+    n_j = np.asarray(sizes_B)[cj]
+    return sum((n_ij/n*np.log2(n_ij*n/n_i/n_j)).tolist(), 0.0)
+
+
 class NodePartition(NodeCover):
     """Representation of node partitions.
 
@@ -566,13 +657,14 @@ class NodePartition(NodeCover):
     network.
     """
 
-    def __init__(self, cmap=None, inputFile=None, N_nodes=None):
+    def __init__(self, cmap=None, inputFile=None, N_nodes=None, labels=None):
         """Initialize a node partition.
 
-        A node partition can be made based on a dictionary or read
-        from a file, or both. Communities will be sorted according to
-        size in decreasing order, so that community ID of 0 refers to
-        the largest community.
+        A node partition can be made based on a dictionary, an array
+        of community labels or read from a file, or any of these.
+        Communities will be sorted according to size in decreasing
+        order, so that community ID of 0 refers to the largest
+        community.
 
         Parameters
         ----------
@@ -585,11 +677,32 @@ class NodePartition(NodeCover):
         N_nodes : int
             The total number of nodes in the network. If None, it will
             be assumed to be the total number of nodes read from
-            `cmap` and `inputFile`.
+            `cmap`, `inputFile` and `labels`. Nodes with negative
+            labels are not counted, so give N_nodes=len(labels) if
+            they are nodes of the network; N_nodes is used to
+            normalize the mutual information.
+        labels : sequence of ints
+            The community label of each node: node i belongs to
+            community labels[i]. Nodes with negative labels do not
+            belong to any community.
         """
         if cmap is None:
             cmap = {}
 
+        # Add the communities in `labels` to cmap with new keys.
+        if labels is not None:
+            labels = np.asarray(labels)
+            order = np.argsort(labels, kind='mergesort')
+            order = order[labels[order] >= 0]
+            bounds = np.flatnonzero(np.diff(labels[order])) + 1
+            c_index = len(cmap)
+            for members in np.split(order, bounds):
+                if len(members) > 0:
+                    while c_index in cmap:
+                        c_index += 1
+                    cmap[c_index] = members.tolist()
+                    c_index += 1
+
         # Read data from inputfile and add the read communities to
         # cmap. The key in cmap does not matter, so we use integers
         # starting from len(cmap) as long as they are not already in
@@ -624,7 +737,8 @@ class NodePartition(NodeCover):
         self.N_nodes = N_nodes
 
         # Save calculated mutual informations with other
-        # nodePartitions into `self.MIs`. This way mutual information
+        # nodePartitions into `self.MIs`, with the content hashes of
+        # the other partitions as keys. This way mutual information
         # is not calculated again if for example
         # getNormalizedMutualInformation is called after calling
         # getMutualInformation.
@@ -649,22 +763,105 @@ class NodePartition(NodeCover):
                 self._comm[commID].add(node)
             return self._comm
 
-    def _getOverlapNetwork(self, other):
-        """Create a bipartite network from overlapping nodes.
+    @property
+    def labels(self):
+        """Community IDs of the nodes as an array.
 
-        In the overlap network the nodes correspond to communities and
-        edge weight is the number of common nodes between two
-        communities. Nodes [0 ... len(self)-1] correspond to
-        communities in self, and nodes [len(self)
-        ... len(self)+len(otherCover)] correspond to communities in
-        `other`.
+        labels[i] is the community ID of node i, or -1 if node i does
+        not belong to any community. Requires that the nodes are
+        non-negative integers.
         """
-        commNet = pynet.SymmNet()
-        for node in self._commIDs:
-            ci = self._commIDs[node]
-            cj = len(self) + other._commIDs[node]
-            commNet[ci, cj] += 1
-        return commNet
+        try:
+            return self._labels
+        except AttributeError:
+            nodes, nodeLabels = self._nodeLabels()
+            if nodes.dtype != np.int64 or (len(nodes) > 0 and nodes[0] < 0):
+                raise ValueError("Node names must be non-negative integers.")
+            n = self.N_nodes
+            if len(nodes) > 0:
+                n = max(n, nodes[-1] + 1)
+            labels = -np.ones(n, dtype=int)
+            labels[nodes] = nodeLabels
+            self._labels = labels
+            return self._labels
+
+    def _nodeLabels(self):
+        """Return the nodes as a sorted array and the community IDs
+        of these nodes."""
+        try:
+            return self._sortedNodes, self._sortedLabels
+        except AttributeError:
+            nodes = pynet._namesToArray(self._commIDs.keys())
+            order = np.argsort(nodes, kind='mergesort')
+            self._sortedNodes = nodes[order]
+            self._sortedLabels = np.array(self._commIDs.values(), dtype=int)[order]
+            return self._sortedNodes, self._sortedLabels
+
+    def _hasIndexLabels(self):
+        """Return True if the nodes are non-negative integers small
+        enough to be used as indices of the labels array."""
+        nodes = self._nodeLabels()[0]
+        if nodes.dtype != np.int64 or len(nodes) == 0:
+            return False
+        return nodes[0] >= 0 and nodes[-1] < 2*max(self.N_nodes, len(nodes))
+
+    def _getOverlapCounts(self, other):
+        """Return the sizes of the intersections of communities.
+
+        Returns arrays (ci, cj, n_ij) of the same length, where n_ij
+        is the number of common nodes of community ci in self and
+        community cj in `other`. Only overlapping pairs are included,
+        ordered by ci and then by cj. The contingency table is counted
+        from the label arrays of the partitions.
+        """
+        if not isinstance(other, NodePartition):
+            return NodeCover._getOverlapCounts(self, other)
+        labels_A, labels_B = self._alignedLabels(other)
+        return _contingency(labels_A, labels_B, len(self), len(other))
+
+    def _getContentHash(self):
+        """Return a hash of the nodes and communities of the partition.
+
+        Partitions with the same communities of the same nodes have
+        the same hash regardless of the community IDs.
+        """
+        try:
+            return self._contentHash
+        except AttributeError:
+            nodes, labels = self._nodeLabels()
+
+            # Number the communities in the order of their first node.
+            first, inverse = np.unique(labels, return_index=True,
+                                       return_inverse=True)[1:]
+            canonical = np.argsort(np.argsort(first))[inverse].astype(np.int64)
+
+            contentHash = hashlib.sha1(canonical.tostring())
+            if nodes.dtype == np.int64:
+                contentHash.update(nodes.tostring())
+            else:
+                contentHash.update(repr(nodes.tolist()))
+            contentHash.update(repr(self.N_nodes))
+            self._contentHash = contentHash.hexdigest()
+            return self._contentHash
+
+    def _alignedLabels(self, other):
+        """Return the community labels of the same nodes in self and
+        `other` as two arrays of equal length."""
+        if self._hasIndexLabels() and other._hasIndexLabels():
+            labels_A, labels_B = self.labels, other.labels
+            n = min(len(labels_A), len(labels_B))
+            return labels_A[:n], labels_B[:n]
+
+        # Look up the nodes of self among the sorted nodes of `other`.
+        nodes_A, labels_A = self._nodeLabels()
+        nodes_B, labels_B = other._nodeLabels()
+        if len(nodes_B) == 0:
+            return labels_A, -np.ones(len(labels_A), dtype=int)
+        if nodes_A.dtype != nodes_B.dtype:
+            nodes_A, nodes_B = nodes_A.astype(object), nodes_B.astype(object)
+        positions = np.minimum(np.searchsorted(nodes_B, nodes_A), len(nodes_B) - 1)
+        found = nodes_B[positions] == nodes_A
+        return labels_A, np.where(found, labels_B[positions], -1)
 
     def getSetsForNodes(self):
         """Return a map of nodes to the set it belongs."""
@@ -709,24 +906,18 @@ class NodePartition(NodeCover):
         and E is the number of overlapping pairs of communities.
         """
         # Check if mutual information has already been calculated.
-        if id(otherPartition) in self.MIs:
-            return self.MIs[id(otherPartition)]
+        otherHash = otherPartition._getContentHash()
+        if otherHash in self.MIs:
+            return self.MIs[otherHash]
         
-        commNet = self._getOverlapNetwork(otherPartition)
-
-        # Calculate mutual information.
-        mi=0.0
-        n = self.N_nodes
-        for ci, cj, n_ij in commNet.edges:
-            ci, cj = min(ci, cj), max(ci, cj) - len(self)
-            n_i = self.C_sizes[ci]
-            n_j = otherPartition.C_sizes[cj]
-            mi += n_ij/n*np.log2(n_ij*n/n_i/n_j)
+        ci, cj, n_ij = self._getOverlapCounts(otherPartition)
+        mi = _mutualInformation(ci, cj, n_ij, self.C_sizes,
+                                otherPartition.C_sizes, self.N_nodes)
 
         # Add this mutual information to the list of already
         # calculated mutual informations.
-        self.MIs[id(otherPartition)] = mi
-        otherPartition.MIs[id(self)] = mi
+        self.MIs[otherHash] = mi
+        otherPartition.MIs[self._getContentHash()] = mi
 
         return mi
 
@@ -772,42 +963,39 @@ class NodePartition(NodeCover):
            `otherPartition`, and 0 otherwise. pm[1] contains the same
            information for `otherPartition`.
         """
-        commNet = self._getOverlapNetwork(otherPartition)
-        ti_0 = np.ones(len(self), dtype=float)
-        ti_1 = np.ones(len(otherPartition), dtype=float)
+        ci, cj, isect = self._getOverlapCounts(otherPartition)
+        size_i = np.array(self.C_sizes)[ci]
+        size_j = np.array(otherPartition.C_sizes)[cj]
+        perfect = (isect == size_i) & (isect == size_j)
+
+        # `self` tiled by `otherPartition`
+        tiled = ~perfect & (isect > size_j/2.0)
+        ti_0 = 1 + np.bincount(ci[tiled], minlength=len(self),
+                               weights=(size_j - 2*isect)[tiled]/size_i[tiled].astype(float))
+
+        # `otherPartition` tiled by `self`
+        tiled = ~perfect & (isect > size_i/2.0)
+        ti_1 = 1 + np.bincount(cj[tiled], minlength=len(otherPartition),
+                               weights=(size_i - 2*isect)[tiled]/size_j[tiled].astype(float))
+
+        # Perfect matches.
         pm_0 = np.zeros(len(self), dtype=int)
         pm_1 = np.zeros(len(otherPartition), dtype=int)
+        ti_0[ci[perfect]] = 0
+        ti_1[cj[perfect]] = 0
+        pm_0[ci[perfect]] = 1
+        pm_1[cj[perfect]] = 1
 
-        for comm_id_i, comm_id_j, isect in commNet.edges:
-            if comm_id_i < comm_id_j:
-                comm_id_j -= len(self)
-            else:
-                comm_id_i, comm_id_j = comm_id_j, comm_id_i-len(self)
-            comm_i, comm_j = self[comm_id_i], otherPartition[comm_id_j]
-            
-            if isect == len(comm_i) and isect == len(comm_j):
-                # Perfect match.
-                ti_0[comm_id_i] = 0
-                ti_1[comm_id_j] = 0
-                pm_0[comm_id_i] = 1
-                pm_1[comm_id_j] = 1
-            else:
-                # `self` tiled by `otherPartition`
-                if isect > len(comm_j)/2.0:
-                    ti_0[comm_id_i] += float(len(comm_j) - 2*isect)/len(comm_i)
-
-                # `otherPartition` tiled by `self`
-                if isect > len(comm_i)/2.0:
-                    ti_1[comm_id_j] += float(len(comm_i) - 2*isect)/len(comm_j)
-                
         return [ti_0, ti_1], [pm_0, pm_1]
         
     def modularity(self, net):
         """Return modularity of this community structure.
 
-        NB! This implementation is very slow if there is even one big
-        community because the current code iterates through all node
-        pairs (not just links!) inside each community.
+        The sum is taken over the pairs of distinct nodes inside each
+        community, each pair counted once. This equals (Q + sum_i
+        k_i^2/(2m)^2)/2, where Q is the standard modularity returned
+        by getModularity, so both are maximized by the same
+        partitions. Time complexity is O(N+E).
 
         Parameters
         ----------
@@ -822,15 +1010,359 @@ class NodePartition(NodeCover):
             The modularity of the partition.
         """
 
-        modularity = 0.0
-        m2 = 2.0*sum(net.weights)
-        for c in self.comm:
-            c = list(c)
-            for n_i,i in enumerate(c):
-                for j in c[n_i+1:]:
-                    modularity += m2*net[i][j] - net[i].strength()*net[j].strength()
+        src, dest, weights, names = net.toArrays()
+        labels = _labelArray(self._commIDs, names)
+        m2 = 2.0*weights.sum()
+        internal, squares = _modularityTerms(src, dest, weights, labels)
+        strengths = _strengthArray(src, dest, weights, len(names))
+        squares -= np.dot(strengths, strengths)
+        return (m2*internal - squares/2)/m2**2
+
+
+def _labelArray(commIDs, names):
+    """Return an array of community IDs numbered from 0 for the nodes
+    in `names`.
 
-        return modularity/(m2)**2
+    Nodes missing from `commIDs` get communities of their own.
+    """
+    labels = np.empty(len(names), dtype=int)
+    index = {}
+    for i, name in enumerate(names):
+        if name in commIDs:
+            labels[i] = index.setdefault(commIDs[name], len(index))
+        else:
+            labels[i] = -1
+    missing = labels < 0
+    labels[missing] = len(index) + np.arange(missing.sum())
+    return labels
+
+def _strengthArray(src, dest, weights, nNodes):
+    """Return the strengths of the nodes of undirected edge arrays."""
+    return (np.bincount(src, weights=weights, minlength=nNodes)
+            + np.bincount(dest, weights=weights, minlength=nNodes))
+
+def _modularityTerms(src, dest, weights, labels):
+    """Return the total weight of the edges inside communities and the
+    sum of the squared strengths of the communities.
+
+    `labels` holds a non-negative community ID for each node and each
+    undirected edge is listed once in `src`, `dest` and `weights`.
+    """
+    inside = (labels[src] == labels[dest]) & (src != dest)
+    strengths = _strengthArray(src, dest, weights, len(labels))
+    commStrengths = np.bincount(labels, weights=strengths)
+    return weights[inside].sum(), np.dot(commStrengths, commStrengths)
+
+def getModularity(net, commIDs):
+    """Return the modularity of a partition of a network.
+
+    The modularity is
+        Q = sum_c [ W_c/m - (S_c/(2m))^2 ],
+    where W_c is the total weight of the edges inside community c,
+    S_c is the total strength of its nodes and m is the total weight
+    of all edges. Edge directions are ignored. Time complexity is
+    O(N+E).
+
+    Parameters
+    ----------
+    net : pynet.SymmNet or pynet.Net object
+        The network.
+    commIDs : NodePartition or dict {node: community_ID}
+        The community of each node. Nodes not in `commIDs` are
+        considered to be communities of their own.
+
+    Return
+    ------
+    modularity : float
+    """
+    if isinstance(commIDs, NodePartition):
+        commIDs = commIDs._commIDs
+    src, dest, weights, names = net.toArrays()
+    labels = _labelArray(commIDs, names)
+    m = weights.sum()
+    if m == 0:
+        return 0.0
+    internal, squares = _modularityTerms(src, dest, weights, labels)
+    return internal/m - squares/(2*m)**2
+
+def _louvainMoves(indptr, indices, weights, strengths, m2, order, tolerance):
+    """Move nodes greedily between communities to increase modularity.
+
+    The network is given as a symmetric matrix in compressed sparse
+    row format where diagonal elements hold the weights inside the
+    nodes. Each node is in turn moved to the neighboring community
+    with the largest modularity gain. Sweeps over the nodes in
+    `order` are repeated until the modularity increases by at most
+    `tolerance`. Returns the list of community IDs of the nodes and
+    whether any node was moved.
+    """
+    indptr, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+    strengths = strengths.tolist()
+    labels = range(len(strengths))
+    totals = list(strengths)
+    moved = False
+    improvement = tolerance + 1
+    while improvement > tolerance:
+        improvement = 0.0
+        for i in order:
+            # Weights from node i to each neighboring community.
+            links = {}
+            for p in xrange(indptr[i], indptr[i+1]):
+                j = indices[p]
+                if j != i:
+                    links[labels[j]] = links.get(labels[j], 0.0) + weights[p]
+
+            # Remove i from its community and find the best one to
+            # put it back to.
+            current, k_i = labels[i], strengths[i]
+            totals[current] -= k_i
+            best = current
+            stayGain = bestGain = links.get(current, 0.0) - totals[current]*k_i/m2
+            for c, w in links.iteritems():
+                gain = w - totals[c]*k_i/m2
+                if gain > bestGain:
+                    best, bestGain = c, gain
+            totals[best] += k_i
+            if best != current:
+                labels[i] = best
+                moved = True
+                improvement += 2*(bestGain - stayGain)/m2
+    return labels, moved
+
+def _aggregateCommunities(indptr, indices, weights, strengths, labels):
+    """Return the network where each community is a single node.
+
+    Returns the new community IDs of the nodes (numbered from 0) and
+    the indptr, indices, weights and strengths of the new network.
+    """
+    labels = np.unique(labels, return_inverse=True)[1]
+    n = labels.max() + 1
+    rows = np.repeat(np.arange(len(strengths)), np.diff(indptr))
+    keys = labels[rows]*n + labels[indices]
+    keys, inverse = np.unique(keys, return_inverse=True)
+    newWeights = np.bincount(inverse, weights=weights)
+    indptr, indices, newWeights = pynet._buildCSR(n, keys//n, keys%n, newWeights)
+    return labels, indptr, indices, newWeights, np.bincount(labels, weights=strengths)
+
+def getLouvainPartition(net, seed=None, tolerance=1e-7):
+    """Find communities by greedy multi-level modularity maximization.
+
+    Implements the method of Blondel et al. (2008): nodes are moved
+    one by one to the neighboring community that gives the largest
+    increase in modularity until no move helps, and the communities
+    are then merged into single nodes and the process is repeated
+    until the partition does not change. Edge directions are
+    ignored. Each level takes O(E) time per sweep.
+
+    Parameters
+    ----------
+    net : pynet.SymmNet or pynet.Net object
+        The network.
+    seed : int
+        Seed for the random order in which the nodes are visited.
+        With the same seed the result is always the same.
+    tolerance : float
+        The sweeps over nodes on one level are stopped when the
+        modularity increases by at most this much.
+
+    Return
+    ------
+    partition : NodePartition
+        The communities found. Use getModularity to get the modularity
+        of the partition.
+    """
+    names, indptr, indices, weights = netext._undirectedCSR(net)
+    nNodes = len(names)
+    rows = np.repeat(np.arange(nNodes), np.diff(indptr))
+    strengths = np.bincount(rows, weights=weights, minlength=nNodes)
+    m2 = weights.sum()
+    nodeLabels = np.arange(nNodes)
+    randomState = np.random.RandomState(seed)
+    while m2 > 0:
+        order = randomState.permutation(len(strengths)).tolist()
+        labels, moved = _louvainMoves(indptr, indices, weights, strengths,
+                                      m2, order, tolerance)
+        if not moved:
+            break
+        labels, indptr, indices, weights, strengths = _aggregateCommunities(
+            indptr, indices, weights, strengths, np.array(labels))
+        nodeLabels = labels[nodeLabels]
+
+    order = np.argsort(nodeLabels, kind='mergesort')
+    bounds = np.flatnonzero(np.diff(nodeLabels[order])) + 1
+    cmap = {}
+    for commID, members in enumerate(np.split(order, bounds)):
+        if len(members) > 0:
+            cmap[commID] = [names[i] for i in members]
+    return NodePartition(cmap, N_nodes=nNodes)
+
+
+def _partitionLabelMatrix(partitions):
+    """Return the community labels of all partitions as rows of a
+    matrix whose columns correspond to the same nodes. The columns
+    are the sorted nodes of all partitions."""
+    arrays = [p._nodeLabels() for p in partitions]
+    nodes = [a[0] for a in arrays]
+    if any(n.dtype != np.int64 for n in nodes):
+        nodes = [n.astype(object) for n in nodes]
+    offsets = np.concatenate(([0], np.cumsum(map(len, nodes))))
+    allNodes, columns = np.unique(np.concatenate(nodes), return_inverse=True)
+    matrix = -np.ones((len(partitions), len(allNodes)), dtype=np.int32)
+    for row, (n, labels) in enumerate(arrays):
+        matrix[row, columns[offsets[row]:offsets[row+1]]] = labels
+    return matrix
+
+def _partitionSimilarity(metric, ci, cj, n_ij, sizes_A, sizes_B,
+                         H_A, H_B, N_A, N_B):
+    """Return the comparison `metric` of two partitions from their
+    contingency table, as the NodePartition methods do."""
+    if metric == "maxvi":
+        return _maxVariationOfInformation(sizes_A.astype(float), sizes_B.astype(float),
+                                          ci, cj, n_ij, float(max(N_A, N_B)))
+    mi = _mutualInformation(ci, cj, n_ij, sizes_A, sizes_B, N_A)
+    if metric == "mi":
+        return mi
+    elif metric == "nmi":
+        return 2*mi/(H_A + H_B)
+    else:
+        return 1.0 - mi/max(H_A, H_B)
+
+def _comparePairs(sources, first, second, labels, nColumns, sizes,
+                  sizeOffsets, entropies, nNodes, metric):
+    """Compare the pairs of partitions (first[k], second[k]) for k in
+    `sources`."""
+    values = np.empty(len(sources))
+    for k, pair in enumerate(sources):
+        i, j = first[pair], second[pair]
+        sizes_A = sizes[sizeOffsets[i]:sizeOffsets[i+1]]
+        sizes_B = sizes[sizeOffsets[j]:sizeOffsets[j+1]]
+        ci, cj, n_ij = _contingency(labels[i*nColumns:(i+1)*nColumns],
+                                    labels[j*nColumns:(j+1)*nColumns],
+                                    len(sizes_A), len(sizes_B))
+        values[k] = _partitionSimilarity(metric, ci, cj, n_ij, sizes_A, sizes_B,
+                                         entropies[i], entropies[j],
+                                         nNodes[i], nNodes[j])
+    return values
+
+def compareAll(partitions, metric="nmi", n_jobs=1, cache=None):
+    """Compare all pairs of node partitions.
+
+    All partitions are encoded once as arrays of community labels, and
+    the contingency table of each pair is counted from these arrays.
+    Partitions with identical contents are compared only once. A
+    cache dictionary can be given to keep the results between calls.
+
+    Parameters
+    ----------
+    partitions : sequence of NodePartition objects
+        The partitions to compare. The partitions should be of the
+        same nodes.
+    metric : str
+        'nmi' for the normalized mutual information, 'mi' for the
+        mutual information, 'mimetric' for the metric of getMImetric
+        and 'maxvi' for the maximum variation of information.
+    n_jobs : int
+        Number of worker processes. If None, the number of CPUs is
+        used.
+    cache : dict or None
+        Results of earlier calls, with keys (metric, hash, hash) where
+        the content hashes of the two partitions are in sorted order.
+        Pairs found in the cache are not compared again, and the new
+        results are added to it. If None, nothing is kept between
+        calls.
+
+    Return
+    ------
+    matrix : numpy.ndarray with shape (M, M)
+        A symmetric matrix where element (i, j) is the comparison of
+        partitions i and j.
+    """
+    if metric not in ("nmi", "mi", "mimetric", "maxvi"):
+        raise ValueError("Unknown metric: %s" % str(metric))
+    M = len(partitions)
+    hashes = [p._getContentHash() for p in partitions]
+    matrix = np.zeros((M, M))
+    if cache is None:
+        cache = {}
+
+    # Find the pairs that are not in the cache. Pairs of identical
+    # partitions are compared only once.
+    pending = {}
+    for i in range(M):
+        for j in range(i, M):
+            key = (metric,) + tuple(sorted((hashes[i], hashes[j])))
+            if key in cache:
+                matrix[i, j] = matrix[j, i] = cache[key]
+            else:
+                pending.setdefault(key, []).append((i, j))
+    if len(pending) == 0:
+        return matrix
+
+    keys = pending.keys()
+    labels = _partitionLabelMatrix(partitions)
+    sizes = [np.array(p.C_sizes, dtype=int) for p in partitions]
+    sizeOffsets = np.concatenate(([0], np.cumsum(map(len, sizes))))
+    results = netext._mapSources(
+        _comparePairs, np.arange(len(keys)), n_jobs,
+        first=np.array([pending[key][0][0] for key in keys]),
+        second=np.array([pending[key][0][1] for key in keys]),
+        labels=labels.ravel(), nColumns=labels.shape[1],
+        sizes=np.concatenate(sizes), sizeOffsets=sizeOffsets,
+        entropies=np.array([p.entropy for p in partitions], dtype=float),
+        nNodes=np.array([p.N_nodes for p in partitions]), metric=metric)
+
+    for key, value in zip(keys, np.concatenate(results).tolist()):
+        cache[key] = value
+        for i, j in pending[key]:
+            matrix[i, j] = matrix[j, i] = value
+    return matrix
+
+
+def _coverArrays(cover):
+    """Return the communities of a NodeCover or a list of node sets as
+    the members of all communities and their offsets."""
+    if isinstance(cover, NodeCover):
+        return cover._getArrays()
+    sizes = map(len, cover)
+    members = list(itertools.chain.from_iterable(cover))
+    return members, np.concatenate(([0], np.cumsum(sizes))).astype(np.int64)
+
+def _superCommunities(finer, coarser):
+    """Return for each community in `finer` the largest index of a
+    community in `coarser` that contains it, or -1 if there is none.
+
+    The pairs of communities that share nodes are counted from arrays
+    of the memberships of the nodes, so that the time complexity is
+    linear in the number of memberships for partitions.
+    """
+    members_F, offsets_F = _coverArrays(finer)
+    members_C, offsets_C = _coverArrays(coarser)
+    Nc_F, Nc_C = len(offsets_F) - 1, len(offsets_C) - 1
+    sizes_F = np.diff(offsets_F)
+    fathers = -np.ones(Nc_F, dtype=np.int64)
+    if Nc_C == 0:
+        return fathers
+    fathers[sizes_F == 0] = Nc_C - 1
+    nodes = pynet._namesToArray(list(members_F) + list(members_C))
+    if len(nodes) == 0:
+        return fathers
+    names, nodes = np.unique(nodes, return_inverse=True)
+    nodes_F, nodes_C = nodes[:len(members_F)], nodes[len(members_F):]
+
+    # The communities of `coarser` that contain each node.
+    order = np.argsort(nodes_C, kind='mergesort')
+    comms_C = np.repeat(np.arange(Nc_C), np.diff(offsets_C))[order]
+    nodePtr = np.concatenate(([0], np.cumsum(np.bincount(nodes_C, minlength=len(names)))))
+
+    # Count the common nodes of each pair of overlapping communities.
+    positions, counts = netext._neighborPositions(nodePtr, nodes_F)
+    pairs = (np.repeat(np.repeat(np.arange(Nc_F), sizes_F), counts)*Nc_C
+             + comms_C[positions])
+    pairs, common = np.unique(pairs, return_counts=True)
+    comm_F, comm_C = pairs // Nc_C, pairs % Nc_C
+    contained = common == sizes_F[comm_F]
+    np.maximum.at(fathers, comm_F[contained], comm_C[contained])
+    return fathers
 
 
 class communityTree:
@@ -856,13 +1388,12 @@ class communityTree:
 
         #go through each level and add links:
         for thisLevel in range(1,len(cslist)):
-            self.tree.append([])
-            for communityIndex in range(0,len(cslist[thisLevel])):
-               self.tree[thisLevel].append(None)
-               for fatherIndex in range(0,len(cslist[thisLevel-1])):
-                    if cslist[thisLevel][communityIndex]<=cslist[thisLevel-1][fatherIndex]:
-                        bestFatherIndex=fatherIndex #there might be multiple candidates for father, choose the smallest one
-               self.tree[thisLevel][communityIndex]=bestFatherIndex                        
+            fathers=_superCommunities(cslist[thisLevel],cslist[thisLevel-1])
+            if (fathers<0).any():
+                raise ValueError("Community %d at level %d is not contained in any community "
+                                 "of the previous level." % (np.flatnonzero(fathers<0)[0],thisLevel))
+            self.tree.append(fathers.tolist())
+            for communityIndex,bestFatherIndex in enumerate(self.tree[thisLevel]):
                self.net[self._getNameByNode((thisLevel,communityIndex)),self._getNameByNode((thisLevel-1,bestFatherIndex))]=len(cslist)+1-thisLevel
 
         cslist.reverse()
@@ -877,19 +1408,21 @@ class communityTree:
         #return node[0]+node[1]*self.multiplier        
 
     def _getLeafOrderInTree(self):
-        #order=[(0,0)]
-        order=map(lambda x:(0,x),range(len(self.tree[0])))
+        """Returns the communities without children in the order of a
+        depth-first traversal from the roots, children in index order."""
+        children={}
         for level in range(1,len(self.tree)):
-            replace={}
-            for i in range(0,len(self.tree[level])):
-                father=(level-1,self.tree[level][i])
-                if father in replace:
-                    replace[father]+=[(level,i)]
-                else:
-                    replace[father]=[(level,i)]
-            for father in replace.keys():
-                fi=order.index(father)
-                order=order[0:fi]+replace[father]+order[fi+1:]
+            for i,father in enumerate(self.tree[level]):
+                children.setdefault((level-1,father),[]).append((level,i))
+        order=[]
+        stack=map(lambda x:(0,x),range(len(self.tree[0])))
+        stack.reverse()
+        while len(stack)>0:
+            node=stack.pop()
+            if node in children:
+                stack.extend(reversed(children[node]))
+            else:
+                order.append(node)
         return order
 
     def getNodeCoordinatesByWeight(self,weightFunction,xscale=1,yscale=1):
@@ -1,5 +1,5 @@
-import pynet,communities
-from numpy.core.fromnumeric import argmax
+import pynet,communities,netext
+import numpy
 
 def getNodeFitnessForAll(net,com,alpha,useStrength=True):    
     inK=[]
@@ -52,40 +52,187 @@ def getNeighborNodes(net,com):
                 neighbors.add(neighbor)
     return list(neighbors)
 
-def detectCommunityForNode(net,alpha,node,useStrength=True):
-    com=[node]
-    cont=True
-    while cont==True and len(com)>0:
-        neighbors=getNeighborNodes(net,com)
-        if len(neighbors)==0:
-            break
-        fitness=map(lambda x:getNodeFitness(net,com,x,alpha,useStrength),neighbors)
-        best=argmax(fitness)
-        if fitness[best]<0:
-            cont=False
-        else:
-            com.append(neighbors[best])
-            remove=True
-            while remove==True:
-                remove=False
-                newcom=[]
-                fitness=getNodeFitnessForAll(net,com,alpha,useStrength)
-                for i,n in enumerate(com):
-                    #if getNodeFitness(net,com,n,alpha,useStrength)>=0:
-                    if fitness[i]>=0:
-                        newcom.append(n)
+class _LFKCommunity(object):
+    """
+    A community grown with the LFK method. The total and internal
+    strength of the community and the weight of the edges from each
+    neighboring node to the members are kept up to date, so that a
+    node is added or removed in time proportional to its degree.
+
+    adjacency(node) must return the lists of the neighbors of the node
+    and the weights of the edges to them.
+    """
+    def __init__(self,adjacency,alpha):
+        self.adjacency=adjacency
+        self.alpha=alpha
+        self.members=[]
+        self.memberSet=set()
+        self.inside={} #node -> total weight of its edges to the members
+        self.links={} #node -> number of its edges to the members
+        self.strengths={}
+        self.inK=0.0 #internal edges counted in both directions
+        self.allK=0.0
+
+    def fitness(self,inK,allK):
+        if allK<=0:
+            return 0.0
+        return inK/pow(allK,self.alpha)
+
+    def strength(self,node):
+        if node not in self.strengths:
+            self.strengths[node]=float(sum(self.adjacency(node)[1]))
+        return self.strengths[node]
+
+    def add(self,node):
+        self.inK+=2*self.inside.get(node,0.0)
+        self.allK+=self.strength(node)
+        self.members.append(node)
+        self.memberSet.add(node)
+        for neighbor,weight in zip(*self.adjacency(node)):
+            if neighbor!=node:
+                self.inside[neighbor]=self.inside.get(neighbor,0.0)+weight
+                self.links[neighbor]=self.links.get(neighbor,0)+1
+
+    def removeMany(self,nodes):
+        for node in nodes:
+            self.inK-=2*self.inside.get(node,0.0)
+            self.allK-=self.strength(node)
+            self.memberSet.remove(node)
+            for neighbor,weight in zip(*self.adjacency(node)):
+                if neighbor!=node:
+                    if self.links[neighbor]==1:
+                        del self.links[neighbor]
+                        del self.inside[neighbor]
                     else:
-                        remove=True
-                com=newcom
-    return com
+                        self.links[neighbor]-=1
+                        self.inside[neighbor]-=weight
+        self.members=[node for node in self.members if node in self.memberSet]
+
+    def bestCandidate(self):
+        """
+        Returns the neighboring node whose addition increases the
+        fitness most and the increase, or (None,None) if the community
+        has no neighbors.
+        """
+        current=self.fitness(self.inK,self.allK)
+        best,bestFitness=None,None
+        for node,weight in self.inside.iteritems():
+            if node not in self.memberSet:
+                fitness=self.fitness(self.inK+2*weight,self.allK+self.strength(node))-current
+                if best is None or fitness>bestFitness:
+                    best,bestFitness=node,fitness
+        return best,bestFitness
+
+    def negativeMembers(self):
+        """
+        Returns the members whose removal would increase the fitness.
+        """
+        current=self.fitness(self.inK,self.allK)
+        return [node for node in self.members
+                if current-self.fitness(self.inK-2*self.inside.get(node,0.0),
+                                        self.allK-self.strength(node))<0]
+
+def _growCommunity(adjacency,alpha,node):
+    com=_LFKCommunity(adjacency,alpha)
+    com.add(node)
+    while len(com.members)>0:
+        best,fitness=com.bestCandidate()
+        if best is None or fitness<0:
+            break
+        com.add(best)
+        remove=com.negativeMembers()
+        while len(remove)>0:
+            com.removeMany(remove)
+            remove=com.negativeMembers()
+    return com.members
+
+def _netAdjacency(net,useStrength):
+    def adjacency(node):
+        neighbors=list(net[node])
+        if useStrength:
+            return neighbors,[net[node,neighbor] for neighbor in neighbors]
+        return neighbors,[1]*len(neighbors)
+    return adjacency
+
+def _csrAdjacency(indptr,indices,weights,useStrength):
+    def adjacency(node):
+        start,end=indptr[node],indptr[node+1]
+        if useStrength:
+            return indices[start:end].tolist(),weights[start:end].tolist()
+        return indices[start:end].tolist(),[1]*(end-start)
+    return adjacency
+
+def detectCommunityForNode(net,alpha,node,useStrength=True):
+    """
+    Grows the LFK community of a node: the neighboring node that
+    increases the fitness inK/(inK+outK)^alpha of the community most
+    is added as long as the increase is non-negative, and after each
+    addition the members whose removal increases the fitness are
+    removed. If useStrength is False, the edges are unweighted.
+    """
+    return _growCommunity(_netAdjacency(net,useStrength),alpha,node)
+
+def _detectForSeeds(sources,indptr,indices,weights,alpha,useStrength):
+    """
+    Grows the communities of the seed nodes in sources, skipping the
+    seeds that are in the communities already found. Returns a list of
+    (seed,community) pairs of node indices.
+    """
+    adjacency=_csrAdjacency(indptr,indices,weights,useStrength)
+    covered=set()
+    found=[]
+    for seed in sources.tolist():
+        if seed not in covered:
+            com=_growCommunity(adjacency,alpha,seed)
+            covered.update(com)
+            found.append((seed,com))
+    return found
+
+def detectCommunities(net,alpha,useStrength=True,processes=1):
+    """
+    Finds overlapping communities with the LFK method (Lancichinetti,
+    Fortunato and Kertesz 2009). Nodes are taken as seeds in order,
+    and the community of each seed that is not in the communities
+    found before it is grown with detectCommunityForNode. The edges
+    are treated as undirected.
+
+    Parameters
+    ----------
+    net : pynet network
+    alpha : float
+        Resolution parameter of the fitness function.
+    useStrength : bool
+        If False, the edge weights are ignored.
+    processes : int
+        Number of worker processes. The seeds are divided between the
+        workers, and the communities of the seeds that turn out to be
+        covered by the communities of earlier seeds are discarded when
+        merging. The result is the same for any number of processes.
+        If None, the number of CPUs is used.
+
+    Returns
+    -------
+    A communities.NodeCover object.
+    """
+    names,indptr,indices,weights=netext._undirectedCSR(net)
+    seeds=numpy.arange(len(names))
+    results=netext._mapSources(_detectForSeeds,seeds,processes,indptr=indptr,
+                               indices=indices,weights=weights,alpha=alpha,
+                               useStrength=useStrength)
+    grown={}
+    for found in results:
+        grown.update(found)
 
-def detectCommunities(net,alpha,useStrength=True):
-    todo=set(list(net))
+    #keep the communities of the seeds that are not covered by the
+    #communities of earlier seeds, as in a serial run
+    adjacency=_csrAdjacency(indptr,indices,weights,useStrength)
+    covered=set()
     cmap={}
-    while len(todo)>0:
-        node=todo.pop()
-        print "Nodes left: "+str(len(todo))+" now processing node: "+ str(node)
-        com=detectCommunityForNode(net,alpha,node,useStrength)
-        todo=todo-set(com)
-        cmap[node]=com
-    return communities.NodeFamily(cmap)
+    for seed in seeds.tolist():
+        if seed not in covered:
+            com=grown.get(seed)
+            if com is None:
+                com=_growCommunity(adjacency,alpha,seed)
+            covered.update(com)
+            cmap[names[seed]]=[names[i] for i in com]
+    return communities.NodeCover(cmap,N_nodes=len(names))
@@ -8,10 +8,12 @@ def makeER(n,p):
     * the sparce version should be implemented
     """
     net=pynet.SymmNet()
+    edges=[]
     for i in range(0,n):
         for j in range(0,i):
             if p > np.random.ranf():
-                net[i,j]=1
+                edges.append((i,j,1))
+    net.addEdges(edges)
     return net
 
 def makeSparseER(n,p):
@@ -25,6 +27,7 @@ def makeSparseER(n,p):
     """
 
     net=pynet.SymmNet()
+    edges=[]
     v = 1 
     w = -1
     while (v < n):
@@ -34,8 +37,9 @@ def makeSparseER(n,p):
             w = w-v
             v = v+1
         if (v < n):
-            net[v,w]=1
+            edges.append((v,w,1))
 
+    net.addEdges(edges)
     return net
 
 def linearLattice(n,r):
@@ -45,10 +49,12 @@ def linearLattice(n,r):
     net=pynet.SymmNet()
     if r>=n:
         r=n-1
+    edges=[]
     for i in range(n):
         for ri in range(r):
-            net[i,(i+ri+1)%n]=1
-            net[i,(i-1-ri)%n]=1
+            edges.append((i,(i+ri+1)%n,1))
+            edges.append((i,(i-1-ri)%n,1))
+    net.addEdges(edges)
     return net
 
 def girvanNewman(communitySize,numberOfCommunities,kIn,kOut):
@@ -103,13 +109,14 @@ def girvanNewman(communitySize,numberOfCommunities,kIn,kOut):
         pOut=0.0
 
     net=pynet.SymmNet() #the net object to be returned
+    edges=[]
     
     #First, put the internal edges:
     for communityIndex in range(numberOfCommunities):
         for node1Index in range(communitySize):
             for node2Index in range(node1Index+1,communitySize):
                 if pIn > np.random.ranf():
-                    net[communityIndex*communitySize+node1Index,communityIndex*communitySize+node2Index]=1
+                    edges.append((communityIndex*communitySize+node1Index,communityIndex*communitySize+node2Index,1))
 
     #Second, put the external edges:
     for community1Index in range(numberOfCommunities):
@@ -117,6 +124,7 @@ def girvanNewman(communitySize,numberOfCommunities,kIn,kOut):
             for node1Index in range(communitySize):
                 for node2Index in range(communitySize):
                     if pOut > np.random.ranf():
-                        net[community1Index*communitySize+node1Index,community2Index*communitySize+node2Index]=1
+                        edges.append((community1Index*communitySize+node1Index,community2Index*communitySize+node2Index,1))
 
+    net.addEdges(edges)
     return net
@@ -6,6 +6,7 @@ Network analysis functions and some related dialog windows for pynet
 
 
 import pynet,os,netio,netext
+import numpy
 import random
 import heapq
 import string
@@ -244,25 +245,90 @@ def normalize(Nk):
 
     return Nk
 
+def _undirectedEdges(net):
+    '''Returns the node names, the degrees, and the undirected edges
+       (src,dest,weights) of a network, each edge once with src<dest.
+       For directed networks edges in both directions are merged.'''
+    names,indptr,indices,weights=netext._undirectedCSR(net)
+    degrees=numpy.diff(indptr)
+    rows=numpy.repeat(numpy.arange(len(degrees)),degrees)
+    upper=rows<indices
+    return names,degrees,rows[upper],indices[upper],weights[upper]
+
+def _iterTriangles(nNodes,degrees,src,dest,chunkSize=2**20):
+    '''Finds the triangles of an undirected network given as edge
+       arrays (each edge once). Yields chunks of six arrays: the
+       three nodes of each triangle and the indices in src,dest of
+       the edges (a,b), (b,c) and (a,c).
+
+       The edges are oriented from lower to higher degree (ties by
+       index). For each oriented edge a->b the out-neighbors c of b
+       are candidates, and the edge a->c is looked up in the sorted
+       array of oriented edges, so each triangle is found once.'''
+    rank=numpy.empty(nNodes,dtype=numpy.int64)
+    rank[numpy.lexsort((numpy.arange(nNodes),degrees))]=numpy.arange(nNodes)
+    swap=rank[src]>rank[dest]
+    lo=numpy.where(swap,dest,src).astype(numpy.int64)
+    hi=numpy.where(swap,src,dest).astype(numpy.int64)
+    keys=lo*nNodes+hi
+    edgeOrder=numpy.argsort(keys)
+    keys,lo,hi=keys[edgeOrder],lo[edgeOrder],hi[edgeOrder]
+    outPtr=numpy.concatenate(([0],numpy.cumsum(numpy.bincount(lo,minlength=nNodes))))
+
+    # The oriented edges are processed in chunks with a bounded number
+    # of candidates.
+    cumulative=numpy.cumsum(numpy.diff(outPtr)[hi])
+    start=0
+    while start<len(keys):
+        offset=cumulative[start-1] if start>0 else 0
+        end=max(numpy.searchsorted(cumulative,offset+chunkSize,side='right'),start+1)
+        positions,lengths=netext._neighborPositions(outPtr,hi[start:end])
+        first=numpy.repeat(numpy.arange(start,end),lengths)
+        wanted=lo[first]*nNodes+hi[positions]
+        found=numpy.minimum(numpy.searchsorted(keys,wanted),len(keys)-1)
+        triangle=keys[found]==wanted
+        first,positions,found=first[triangle],positions[triangle],found[triangle]
+        yield (lo[first],hi[first],hi[positions],
+               edgeOrder[first],edgeOrder[positions],edgeOrder[found])
+        start=end
+
+def triangleCounts(net):
+    '''Counts the triangles of a network in one pass over a
+       degree-ordered adjacency. Edge directions are ignored.
+
+       Returns a tuple (names,degrees,nodeTriangles,src,dest,edgeTriangles)
+       of numpy arrays: nodeTriangles[i] is the number of triangles
+       of node names[i], and edgeTriangles[e] is the number of common
+       neighbors of the nodes of the edge (names[src[e]],names[dest[e]]).
+       Each edge is listed once.'''
+    names,degrees,src,dest,weights=_undirectedEdges(net)
+    nNodes=len(names)
+    nodeTriangles=numpy.zeros(nNodes,dtype=numpy.int64)
+    edgeTriangles=numpy.zeros(len(src),dtype=numpy.int64)
+    for a,b,c,ab,bc,ac in _iterTriangles(nNodes,degrees,src,dest):
+        for nodes in (a,b,c):
+            nodeTriangles+=numpy.bincount(nodes,minlength=nNodes)
+        for edges in (ab,bc,ac):
+            edgeTriangles+=numpy.bincount(edges,minlength=len(src))
+    return numpy.asarray(names),degrees,nodeTriangles,src,dest,edgeTriangles
+
+def _clusteringArray(degrees,nodeTriangles):
+    '''Returns the clustering coefficients 2T/(k(k-1)) and a mask of
+       the nodes with degree larger than one.'''
+    defined=degrees>1
+    pairs=numpy.where(defined,degrees*(degrees-1),1).astype(float)
+    return 2*nodeTriangles/pairs,defined
+
 def clustering_valuelist(net):
     '''Returns a list [k_i, c_i] for each node,
        where k_i is its degree and c_i the clustering coeff'''
     
-    c=[]
-    degs=[]
-    for i in net:
-        tempc=0
-        for j in net[i]:
-            for k in net[j]:
-                if k in net[i]:
-                    tempc+=1
-        k=net[i].deg()
-        if k>1:
-           c.append(float(tempc)/float(k*(k-1)))
-           degs.append(k)
-        else:
-            c.append(None)
-            degs.append(k)
+    names,degrees,nodeTriangles,src,dest,edgeTriangles=triangleCounts(net)
+    c,defined=_clusteringArray(degrees,nodeTriangles)
+    nodeIndex=dict(zip(names.tolist(),range(len(names))))
+    indices=[nodeIndex[i] for i in net]
+    degs=degrees[indices].tolist()
+    c=numpy.where(defined,c,None)[indices].tolist()
     return [degs,c]
 
 def weight_distribution(network,style='logbin',Nbins=25):
@@ -459,19 +525,51 @@ def findbin(bins,value):
 
     
 def clustering(net):
-    c={}
-    for i in net:
-        c[i]=0
-        for j in net[i]:
-            for k in net[j]:
-                if k in net[i]:
-                    c[i]=c[i]+1
-        k=net[i].deg()
-        if k>1:
-            c[i]=float(c[i])/float(k*(k-1))
+    '''Returns the clustering coefficients of the nodes as a
+       dictionary. Edge directions are ignored, and nodes with degree
+       smaller than two have coefficient 0.'''
+    names,degrees,nodeTriangles,src,dest,edgeTriangles=triangleCounts(net)
+    c,defined=_clusteringArray(degrees,nodeTriangles)
+    c=numpy.where(defined,c,0)
+    return dict(zip(names.tolist(),c.tolist()))
+
+def weightedClustering(net,method='onnela'):
+    '''Returns the weighted clustering coefficients of the nodes as a
+       dictionary. Edge directions are ignored.
+
+       method='onnela' : the geometric mean of the weights of the
+           triangles, normalized by the largest weight,
+           c_i = sum_jk (w_ij w_jk w_ik)^(1/3)/(max(w) k_i (k_i-1))
+       method='barrat' : the weights of the edges of node i in its
+           triangles, c_i = sum_jk (w_ij+w_ik)/2/(s_i (k_i-1)),
+           where s_i is the strength of node i
+
+       The sums are over ordered pairs of neighbors. Nodes with degree
+       smaller than two have coefficient 0.'''
+    if method not in ('onnela','barrat'):
+        raise ValueError("Invalid method: "+str(method))
+    names,degrees,src,dest,weights=_undirectedEdges(net)
+    nNodes=len(names)
+    weights=numpy.asarray(weights,dtype=float)
+    sums=numpy.zeros(nNodes)
+    for a,b,c,ab,bc,ac in _iterTriangles(nNodes,degrees,src,dest):
+        if method=='onnela':
+            value=2*numpy.power(weights[ab]*weights[bc]*weights[ac],1.0/3)
+            for nodes in (a,b,c):
+                sums+=numpy.bincount(nodes,weights=value,minlength=nNodes)
         else:
-            c[i]=0
-    return c
+            for nodes,edge1,edge2 in ((a,ab,ac),(b,ab,bc),(c,ac,bc)):
+                sums+=numpy.bincount(nodes,weights=weights[edge1]+weights[edge2],minlength=nNodes)
+    defined=degrees>1
+    if method=='onnela':
+        maxWeight=weights.max() if len(weights)>0 else 1.0
+        normalization=maxWeight*degrees*(degrees-1)
+    else:
+        strengths=(numpy.bincount(src,weights=weights,minlength=nNodes)
+                   +numpy.bincount(dest,weights=weights,minlength=nNodes))
+        normalization=strengths*(degrees-1)
+    c=numpy.where(defined,sums/numpy.where(defined,normalization,1),0)
+    return dict(zip(names,c.tolist()))
 
 def globalClustering(net):
     c=clustering(net)
@@ -496,21 +594,47 @@ def overlap(net,node1,node2):
     n_ij/(k_i-1+k_j-1-n_ij)
     where n_ij is the number of common neighbors of nodes i and j
     (=number of triangles) and k_i and k_j are the degrees of nodes i
-    and j.
+    and j. Edge directions are ignored.
     """
-    nTriangles=0
+    nTriangles=_commonNeighbors(net,node1,node2)
+    return _overlapArray(numpy.array([net[node1].deg()]),numpy.array([net[node2].deg()]),
+                         numpy.array([nTriangles])).item()
+
+def _commonNeighbors(net,node1,node2):
+    """Returns the number of common neighbors of two nodes. The
+    neighbors of the node with the smaller degree are tested for
+    edges to the other node, in either direction."""
     if net[node1].deg()>net[node2].deg():
         small,large=node2,node1
     else:
         small,large=node1,node2
-    for neigh in net[small]:
-        if large in net[neigh]: #assume no self-links.
-            nTriangles+=1
-    d=net[node1].deg()+net[node2].deg()-2-nTriangles
-    if d>0:
-        return nTriangles/float(d)
-    else:
-        return 0.0
+    if net.isSymmetric():
+        return sum(1 for neigh in net[small] if large in net[neigh]) #assume no self-links.
+    return sum(1 for neigh in net[small] if large in net[neigh] or neigh in net[large])
+
+def _overlapArray(degrees1,degrees2,nTriangles):
+    """Overlaps of edges from the degrees of their nodes and the
+    numbers of common neighbors."""
+    d=degrees1+degrees2-2-nTriangles
+    return numpy.where(d>0,nTriangles/numpy.where(d>0,d,1).astype(float),0.0)
+
+def _edgeClusteringArray(degrees1,degrees2,nTriangles):
+    """Edge clusterings of edges from the degrees of their nodes and
+    the numbers of common neighbors."""
+    d=numpy.minimum(degrees1,degrees2)-1.0
+    return numpy.where(d>0,nTriangles/numpy.where(d>0,d,1),0.0)
+
+def getOverlaps(net):
+    """
+    Returns the overlaps of all edges, computed with triangleCounts.
+
+    Returns
+    -------
+    A tuple (src,dest,overlaps) of numpy arrays, where src and dest
+    are the names of the nodes of each edge. Each edge is listed once.
+    """
+    names,degrees,nodeTriangles,src,dest,edgeTriangles=triangleCounts(net)
+    return names[src],names[dest],_overlapArray(degrees[src],degrees[dest],edgeTriangles)
 
 def edgeClustering(net,node1,node2):
     """
@@ -521,17 +645,22 @@ def edgeClustering(net,node1,node2):
     (=number of triangles) and k_i and k_j are the degrees of nodes i
     and j.
     In case min(k_i,k_j)=1; we define it as 0.
+    Edge directions are ignored.
     """
-    nTriangles=0
-    if net[node1].deg()>net[node2].deg():
-        small,large=node2,node1
-    else:
-        small,large=node1,node2
-    for neigh in net[small]:
-        if large in net[neigh]: #assume no self-links.
-            nTriangles+=1
-    d=net[small].deg()-1.0
-    if d>0:
-        return nTriangles/float(d)
-    else:
-        return 0.0
+    nTriangles=_commonNeighbors(net,node1,node2)
+    return _edgeClusteringArray(numpy.array([net[node1].deg()]),numpy.array([net[node2].deg()]),
+                                numpy.array([nTriangles])).item()
+
+def getEdgeClusterings(net):
+    """
+    Returns the edge clusterings of all edges, computed with
+    triangleCounts.
+
+    Returns
+    -------
+    A tuple (src,dest,edgeClusterings) of numpy arrays, where src and
+    dest are the names of the nodes of each edge. Each edge is listed
+    once.
+    """
+    names,degrees,nodeTriangles,src,dest,edgeTriangles=triangleCounts(net)
+    return names[src],names[dest],_edgeClusteringArray(degrees[src],degrees[dest],edgeTriangles)
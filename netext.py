@@ -8,14 +8,22 @@ import percolator
 import transforms
 import shutil
 import copy
+import itertools
 import numpy
+import sys
+import ctypes
+import multiprocessing
+import multiprocessing.sharedctypes
 
 
 class Net_edges:
     def __init__(self,net):
         self.net=net
     def __iter__(self):
-        if self.net.isSymmetric():
+        if isinstance(self.net,pynet.CSRNet):
+            for edge in self.net._iterEdges():
+                yield edge
+        elif self.net.isSymmetric():
             for node1Index in self.net:
                 node1=self.net[node1Index]
                 for node2Index in node1:
@@ -28,6 +36,8 @@ class Net_edges:
                     yield [node1Index,node2Index,self.net[node1Index,node2Index]]       
 
     def __len__(self):
+        if isinstance(self.net,pynet.CSRNet):
+            return self.net._numberOfEdges()
         lenght=0
         if self.net.isSymmetric():
             for nodeIndex in self.net:
@@ -267,6 +277,8 @@ class Enumerator:
 
 
 def deg(net):
+    if isinstance(net,pynet.CSRNet):
+        return dict(zip(net._indexToName,net._degrees().tolist()))
     degrees={}
     for node in net:
         degrees[node]=net[node].deg()
@@ -357,11 +369,182 @@ def getPathLengths(net,start,undirected=True):
             edge=newEdge
         return pathlengths
 
-def getMeanPathLength(net,maxSamples=1000):
+def _undirectedCSR(net):
+    """
+    Returns the node names and the indptr, indices and weights arrays
+    of the network in compressed sparse row format, treating all edges
+    as undirected. Node i of the arrays is names[i]. If a directed
+    network has edges in both directions between two nodes, the smaller
+    weight is used.
+    """
+    if isinstance(net,pynet.CSRSymmNet):
+        return net._indexToName,net._indptr,net._indices,net._weights
+    src,dest,weights,names=net.toArrays()
+    nNodes=len(names)
+    rows=numpy.concatenate((src,dest))
+    cols=numpy.concatenate((dest,src))
+    weights=numpy.concatenate((weights,weights))
+    if not net.isSymmetric():
+        #edges in both directions become a single undirected edge
+        keys=rows*nNodes+cols
+        order=numpy.lexsort((weights,keys))
+        keys,first=numpy.unique(keys[order],return_index=True)
+        rows,cols,weights=keys//nNodes,keys%nNodes,weights[order][first]
+    indptr,indices,weights=pynet._buildCSR(nNodes,rows,cols,weights)
+    return names.tolist(),indptr,indices,weights
+
+def _neighborPositions(indptr,nodes):
+    """
+    Returns the positions of the neighbors of the given nodes in the
+    indices array of a CSR matrix, and the number of neighbors of
+    each node.
+    """
+    starts=indptr[nodes]
+    lengths=indptr[nodes+1]-starts
+    total=lengths.sum()
+    #position in indices for each element of the output
+    offsets=numpy.repeat(starts-numpy.cumsum(lengths)+lengths,lengths)
+    return offsets+numpy.arange(total),lengths
+
+def _bfsFromSources(indptr,indices,sources):
+    """
+    Runs a level-synchronous breadth-first search from each source.
+
+    Returns the histogram of the distances to all reached nodes summed
+    over the sources (histogram[d] is the number of pairs at distance
+    d) and, for each source, the number of reached nodes and the sum
+    of the distances to them. The sources themselves are not counted.
+    """
+    nNodes=len(indptr)-1
+    #visited[i]==stamp marks the nodes visited from the current source
+    visited=numpy.zeros(nNodes,dtype='int64')
+    histogram=numpy.zeros(1,dtype='int64')
+    reached=numpy.zeros(len(sources),dtype='int64')
+    distanceSums=numpy.zeros(len(sources),dtype='int64')
+    for i,source in enumerate(sources):
+        stamp=i+1
+        visited[source]=stamp
+        frontier=numpy.array([source],dtype='int64')
+        distance=0
+        while len(frontier)>0:
+            distance+=1
+            neighbors=indices[_neighborPositions(indptr,frontier)[0]]
+            neighbors=numpy.unique(neighbors[visited[neighbors]!=stamp])
+            if len(neighbors)==0:
+                break
+            visited[neighbors]=stamp
+            if distance>=len(histogram):
+                histogram=numpy.concatenate((histogram,numpy.zeros(len(histogram),dtype='int64')))
+            histogram[distance]+=len(neighbors)
+            reached[i]+=len(neighbors)
+            distanceSums[i]+=distance*len(neighbors)
+            frontier=neighbors.astype('int64')
+    return numpy.trim_zeros(histogram,'b'),reached,distanceSums
+
+#The arrays shared with the worker processes of _mapSources. They are
+#set before the pool is created, so that forked workers see them.
+_poolShared={}
+
+def _poolWorker(args):
+    function,sources=args
+    return function(sources=sources,**_poolShared)
+
+def _sharedArray(array):
+    """
+    Copies an array to shared memory that forked processes can read
+    without copying it.
+    """
+    ctype={1:ctypes.c_int8,4:ctypes.c_int32,8:ctypes.c_int64}[array.dtype.itemsize]
+    raw=multiprocessing.sharedctypes.RawArray(ctype,max(len(array),1))
+    shared=numpy.frombuffer(raw,dtype=array.dtype)[:len(array)]
+    shared[:]=array
+    return shared
+
+def _mapSources(function,sources,processes,**arrays):
+    """
+    Calls function(sources=chunk,**arrays) for chunks of the source
+    indices and returns the list of the results in order. With more
+    than one process the chunks are run in a pool of forked workers,
+    which share the numpy arrays among the keyword arguments. If
+    processes is None, the number of CPUs is used.
+    """
+    if processes is None:
+        processes=multiprocessing.cpu_count()
+    if sys.platform=="win32":
+        processes=1
+    processes=max(1,min(processes,len(sources)))
+    if processes==1:
+        return [function(sources=sources,**arrays)]
+
+    for name,array in arrays.iteritems():
+        if isinstance(array,numpy.ndarray):
+            array=_sharedArray(array)
+        _poolShared[name]=array
+    try:
+        pool=multiprocessing.Pool(processes)
+        try:
+            #several chunks per worker to even out the load
+            chunks=numpy.array_split(sources,4*processes)
+            return pool.map(_poolWorker,[(function,chunk) for chunk in chunks if len(chunk)>0])
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        _poolShared.clear()
+
+def bfsDistanceHistograms(net,sources=None,processes=1):
+    """
+    Computes unweighted shortest path lengths from a set of source
+    nodes with breadth-first search. The edges are treated as
+    undirected.
+
+    Parameters
+    ----------
+    net : pynet network
+    sources : list
+        Names of the source nodes. If None, all nodes are used.
+    processes : int
+        Number of worker processes. The sources are divided between
+        the workers, which share the adjacency arrays of the network.
+        If None, the number of CPUs is used. Platforms without fork
+        always use a single process.
+
+    Returns
+    -------
+    histogram : numpy.ndarray
+        histogram[d] is the number of (source, node) pairs at distance
+        d. Pairs of a source with itself are not counted, so that
+        histogram[0] is always 0.
+    reached : numpy.ndarray
+        Number of nodes reachable from each source, in the order of
+        sources.
+    distanceSums : numpy.ndarray
+        Sum of the distances to the reachable nodes for each source.
+    """
+    names,indptr,indices,weights=_undirectedCSR(net)
+    if sources is None:
+        sourceIndices=numpy.arange(len(names),dtype='int64')
+    else:
+        nameToIndex=dict(itertools.izip(names,itertools.count()))
+        sourceIndices=numpy.array([nameToIndex[source] for source in sources],dtype='int64')
+
+    results=_mapSources(_bfsFromSources,sourceIndices,processes,indptr=indptr,indices=indices)
+    histogram=numpy.zeros(max(len(result[0]) for result in results),dtype='int64')
+    for result in results:
+        histogram[:len(result[0])]+=result[0]
+    reached=numpy.concatenate([result[1] for result in results])
+    distanceSums=numpy.concatenate([result[2] for result in results])
+    return histogram,reached,distanceSums
+
+def getMeanPathLength(net,maxSamples=1000,processes=1):
     """
     Returns the mean path length of a network. If maxSample is not negative
     only at maxSample number of nodes is used as a starting point for finding
     paths instead of exhaustively going through all the paths.
+
+    The mean is taken first over the nodes reachable from each starting
+    point and then over the starting points. The searches are run with
+    bfsDistanceHistograms in the given number of processes.
     """
     #First check if we can use the c++-implementation
     #if net.__class__ == pynet.LCELibSparseSymmNet:
@@ -374,89 +557,225 @@ def getMeanPathLength(net,maxSamples=1000):
     if len(net)>maxSamples and maxSamples>0:
         random.shuffle(nodes)
         nodes=nodes[:maxSamples]
-    m=0
-    for node in nodes:
-        m+=numpy.mean(getPathLengths(net,node).values())
+    histogram,reached,distanceSums=bfsDistanceHistograms(net,nodes,processes)
+    if numpy.any(reached==0):
+        #the mean over no paths is undefined
+        return float("nan")
+    m=numpy.sum(distanceSums/reached.astype('float'))
     return float(m)/float(len(nodes))
 
-def getPathLengthDistribution(net,maxSamples=1000):
+def getPathLengthDistribution(net,maxSamples=1000,processes=1):
     """
     Returns the shortest unweighted path length distribution of a network. If maxSample is not negative
     only at maxSample number of nodes is used as a starting point for finding
     paths instead of exhaustively going through all the paths.
+
+    The searches are run with bfsDistanceHistograms in the given number
+    of processes.
     """
     nodes=list(net)
     if len(net)>maxSamples and maxSamples>0:
         random.shuffle(nodes)
         nodes=nodes[:maxSamples]
-    m=0
-    distanceDist={}
-    for node in nodes:
-        distances=getPathLengths(net,node).values()
-        m+=len(distances)
-        for distance in distances:
-            distanceDist[distance]=distanceDist.get(distance,0)+1
+    histogram,reached,distanceSums=bfsDistanceHistograms(net,nodes,processes)
+    m=histogram.sum()
 
     #Normalize the distribution
-    for distance in distanceDist:
-        distanceDist[distance]=distanceDist[distance]/float(m)
+    distanceDist={}
+    for distance in numpy.flatnonzero(histogram).tolist():
+        distanceDist[distance]=int(histogram[distance])/float(m)
 
     return distanceDist
 
-def getBetweennessCentrality(net,edgeBC=False):
+def _brandesBFS(indptr,indices,source,dist,sigma,delta,nodeBC,edgeValues):
     """
-    Returns a map from each node to its unweighted betweenness centrality.
-
-    Note: this function needs some more testing.
+    Adds the dependencies of the unweighted shortest paths from one
+    source to nodeBC and, if edgeValues is not None, to the edges at
+    their positions in the indices array. The search proceeds one
+    level at a time with array operations. dist, sigma and delta are
+    work arrays that must be -1, 0 and 0 for all nodes, and are
+    restored before returning.
+    """
+    dist[source]=0
+    sigma[source]=1.0
+    frontier=numpy.array([source],dtype='int64')
+    levels=[frontier]
+    dagEdges=[]
+    while True:
+        positions,lengths=_neighborPositions(indptr,frontier)
+        preds=numpy.repeat(frontier,lengths)
+        succs=indices[positions].astype('int64')
+        newNodes=numpy.unique(succs[dist[succs]<0])
+        if len(newNodes)==0:
+            break
+        dist[newNodes]=len(levels)
+        #the edges of the shortest path DAG lead to the new nodes
+        onDag=(dist[succs]==len(levels))
+        preds,succs,positions=preds[onDag],succs[onDag],positions[onDag]
+        succOrder=numpy.searchsorted(newNodes,succs)
+        sigma[newNodes]=numpy.bincount(succOrder,weights=sigma[preds],minlength=len(newNodes))
+        dagEdges.append((preds,succs,positions))
+        levels.append(newNodes)
+        frontier=newNodes
+
+    #accumulate the dependencies from the farthest level back
+    for preds,succs,positions in reversed(dagEdges):
+        partialDelta=sigma[preds]/sigma[succs]*(1+delta[succs])
+        predNodes,predOrder=numpy.unique(preds,return_inverse=True)
+        delta[predNodes]+=numpy.bincount(predOrder,weights=partialDelta)
+        if edgeValues is not None:
+            edgeValues[positions]+=partialDelta
+
+    visited=numpy.concatenate(levels)
+    nodeBC[visited[1:]]+=delta[visited[1:]]
+    dist[visited]=-1
+    sigma[visited]=0
+    delta[visited]=0
+
+def _brandesDijkstra(adjacency,source,nodeBC,edgeValues):
+    """
+    Same as _brandesBFS, but for weighted shortest paths. adjacency
+    is a list of (neighbor, weight, position) lists of the nodes.
+    """
+    heappush,heappop=heapq.heappush,heapq.heappop
+    sigma={source:1.0}
+    seen={source:0.0}
+    preds={source:[]}
+    done=set()
+    stack=[]
+    heap=[(0.0,source)]
+    while heap:
+        distance,v=heappop(heap)
+        if v in done:
+            continue
+        done.add(v)
+        stack.append(v)
+        sigmaV=sigma[v]
+        for w,weight,position in adjacency[v]:
+            if w in done:
+                continue
+            newDistance=distance+weight
+            oldDistance=seen.get(w)
+            if oldDistance is None or newDistance<oldDistance:
+                seen[w]=newDistance
+                heappush(heap,(newDistance,w))
+                sigma[w]=sigmaV
+                preds[w]=[(v,position)]
+            elif newDistance==oldDistance:
+                sigma[w]+=sigmaV
+                preds[w].append((v,position))
+
+    delta=dict.fromkeys(stack,0.0)
+    while stack:
+        w=stack.pop()
+        for v,position in preds[w]:
+            partialDelta=sigma[v]/sigma[w]*(1+delta[w])
+            delta[v]+=partialDelta
+            if edgeValues is not None:
+                edgeValues[position]+=partialDelta
+        if w!=source:
+            nodeBC[w]+=delta[w]
+
+def _brandesFromSources(indptr,indices,weights,sources,edgeBC):
+    """
+    Returns the node betweenness values (and the values of the edges
+    at their positions in indices, or None) summed over the sources.
+    If weights is None, the paths are unweighted.
+    """
+    nNodes=len(indptr)-1
+    nodeBC=numpy.zeros(nNodes)
+    if edgeBC:
+        edgeValues=numpy.zeros(len(indices))
+    else:
+        edgeValues=None
+    if weights is None:
+        dist=-numpy.ones(nNodes,dtype='int64')
+        sigma=numpy.zeros(nNodes)
+        delta=numpy.zeros(nNodes)
+        for source in sources.tolist():
+            _brandesBFS(indptr,indices,source,dist,sigma,delta,nodeBC,edgeValues)
+    else:
+        neighbors,edgeWeights=indices.tolist(),weights.tolist()
+        bounds=indptr.tolist()
+        adjacency=[zip(neighbors[start:end],edgeWeights[start:end],xrange(start,end))
+                   for start,end in zip(bounds[:-1],bounds[1:])]
+        for source in sources.tolist():
+            _brandesDijkstra(adjacency,source,nodeBC,edgeValues)
+    return nodeBC,edgeValues
+
+def getBetweennessCentrality(net,edgeBC=False,weighted=False,samples=None,processes=1):
+    """
+    Returns a map from each node to its betweenness centrality.
+
+    The edges are treated as undirected and, following the original
+    implementation, the values are divided by two.
+
+    Parameters
+    ----------
+    net : pynet network
+    edgeBC : bool
+        If True, also the edge betweenness centralities are returned
+        as a pynet.SymmNet.
+    weighted : bool
+        If True, the edge weights are used as edge lengths, and the
+        shortest paths are found with Dijkstra's algorithm. All weights
+        must be positive. Otherwise the paths are unweighted.
+    samples : int
+        If given, only this many randomly chosen source nodes are
+        used, and the values are scaled by len(net)/samples to
+        estimate the exact values.
+    processes : int
+        Number of worker processes that the sources are divided
+        between. If None, the number of CPUs is used.
+
+    Returns
+    -------
+    cb : dict
+        Betweenness centrality of each node.
+    bcNet : pynet.SymmNet
+        Only if edgeBC is True. Edge betweenness centralities of the
+        edges that are on some shortest path.
     """
     #Implementation of the algorithm found in this paper:
     #www.inf.uni-konstanz.de/algo/publications/b-fabc-01.pdf
-    cb={}
-    for node in net:
-        cb[node]=0
-    if edgeBC:
-        bcNet=pynet.SymmNet()
-        
-    for node in net:
-        st=[]
-        p={}
-        sigma={}
-        d={}
-        delta={}
-        for t in net:
-            p[t]=[]
-            sigma[t]=0
-            d[t]=-1
-            delta[t]=0
-        sigma[node]=1
-        d[node]=0
-        q=[node]
-        while len(q)>0:
-            v=q.pop(0)
-            st.append(v)
-            for w in net[v]:
-                if d[w]<0:
-                    q.append(w)
-                    d[w]=d[v]+1
-                if d[w]==d[v]+1:
-                    sigma[w]+=sigma[v]
-                    p[w].append(v)
-        while len(st)>0:
-            w=st.pop()
-            for v in p[w]:
-                partialDelta=float(sigma[v])/float(sigma[w])*(1+delta[w])
-                delta[v]+=partialDelta
-                if edgeBC:
-                    bcNet[v,w]=bcNet[v,w]+partialDelta
-            if w!=node:
-                cb[w]+=delta[w]
-
-    for node in cb:
-        cb[node]=cb[node]/2.0
+    names,indptr,indices,weights=_undirectedCSR(net)
+    nNodes=len(names)
+    if weighted:
+        if numpy.any(weights<=0):
+            raise ValueError("Weighted betweenness requires positive weights.")
+    else:
+        weights=None
+
+    if samples is not None and samples<nNodes:
+        sources=numpy.array(sorted(random.sample(xrange(nNodes),samples)),dtype='int64')
+        scale=nNodes/float(samples)
+    else:
+        sources=numpy.arange(nNodes,dtype='int64')
+        scale=1.0
+
+    results=_mapSources(_brandesFromSources,sources,processes,indptr=indptr,
+                        indices=indices,weights=weights,edgeBC=edgeBC)
+    nodeBC=numpy.zeros(nNodes)
+    for result in results:
+        nodeBC+=result[0]
+    nodeBC*=scale/2.0
+    cb=dict(itertools.izip(names,nodeBC.tolist()))
 
     if edgeBC:
-        for e in bcNet.edges:
-            bcNet[e[0],e[1]]=e[2]/2.0
+        edgeValues=numpy.zeros(len(indices))
+        for result in results:
+            edgeValues+=result[1]
+        #sum the values of the two directions of each edge
+        rows=numpy.repeat(numpy.arange(nNodes),numpy.diff(indptr))
+        cols=indices.astype('int64')
+        keys=rows*nNodes+cols
+        reverse=numpy.searchsorted(keys,cols*nNodes+rows)
+        values=(edgeValues+edgeValues[reverse])*(scale/2.0)
+        onPaths=(rows<cols)&(values>0)
+        bcNet=pynet.SymmNet()
+        bcNet.addEdges([(names[i],names[j],w) for i,j,w in
+                        itertools.izip(rows[onPaths].tolist(),cols[onPaths].tolist(),
+                                       values[onPaths].tolist())])
         return cb,bcNet
     else:
         return cb
@@ -11,7 +11,9 @@
   The user can also use loadNet_[format] and writeNet_[format]
   directly to force loading or writing to be done in given format.
 
-  Currently only the edg, gml and matrix format has been implemented 
+  Currently only the edg, gml and matrix format has been implemented,
+  in addition to the binary npnet format which is meant for fast
+  loading of large networks.
 
   Future additions
   ----------------
@@ -24,7 +26,13 @@
 
 import pynet,netext,warnings
 import sys
-knownFiletypes=["edg","gml","mat","net","adj"]
+import struct
+import ast
+import gzip,bz2
+import itertools
+import numpy
+knownFiletypes=["edg","gml","mat","net","adj","npnet"]
+binaryFiletypes=["npnet"]
 
 def getFiletype(fileName):
     """Infer the type of a file.
@@ -59,40 +67,169 @@ def loadNet_gml(input):
     complicated gml-files.
     """
 
-    source=None
-    target=None
-    value=None
-    for line in input:
-        line=line.strip()
-        if line.startswith("directed"):
-            if line[9:10]=="0":
+    net=None
+    for item in _iterItems_gml(input):
+        if item[0]=="directed":
+            if item[1]=="0":
                 net=pynet.SymmNet()
-            elif line[9:10]=="1":
+            elif item[1]=="1":
                 net=pynet.Net()
-        elif line.startswith("source"):
-            source=line.split()[1]
-        elif line.startswith("target"):
-            target=line.split()[1]
-        elif line.startswith("value"):
-            value=line.split()[1]
-        elif line.startswith("edge"):
-            if source!=None and target!=None:
-                if value!=None:
-                    net[source][target]=float(value)
-                else:
-                    net[source][target]=1
-                source=None
-                target=None
-                value=None
-    if source!=None and target!=None:
-        if value!=None:
-            net[source][target]=float(value)
         else:
-            net[source][target]=1
-
+            if net is None:
+                net=pynet.SymmNet()
+            source,target,weight=item[1:]
+            net[source][target]=weight
 
     return net
 
+_edgChunkBytes=2**24 #approximate size of the chunks read by the fast edg parser
+
+#whitespace characters and characters that are not allowed in integers
+_edgSpace=numpy.zeros(256,dtype=bool)
+_edgSpace[[ord(char) for char in " \t\n\r\x0b\x0c"]]=True
+_edgNonDigit=~_edgSpace
+_edgNonDigit[ord("0"):ord("9")+1]=False
+
+def _parseEdgChunk(lines):
+    """Parse lines of a numerical edg file into arrays.
+
+    Returns the source nodes, destination nodes and weights of the
+    edges as arrays. Each line must have the same number of whitespace
+    separated fields, at least two, or be empty. Missing weights are
+    set to one and fields after the third are ignored.
+
+    Returns None if the lines are not in this simple format. Raises
+    ValueError if the node names are not integers.
+    """
+    chunk="".join(lines)
+    chars=numpy.frombuffer(chunk,dtype=numpy.uint8)
+    space=_edgSpace[chars]
+    starts=~space
+    starts[1:]&=space[:-1]
+    tokenStarts=numpy.flatnonzero(starts)
+    if len(tokenStarts)==0:
+        return (numpy.zeros(0,dtype='int64'),numpy.zeros(0,dtype='int64'),
+                numpy.zeros(0))
+    for line in lines:
+        nFields=len(line.split())
+        if nFields>0:
+            break
+    if nFields<2:
+        return None
+
+    #every line must have exactly nFields fields or be empty
+    if len(tokenStarts)%nFields!=0:
+        return None
+    lineEnds=numpy.flatnonzero(chars==ord("\n"))
+    lineOfToken=numpy.searchsorted(lineEnds,tokenStarts).reshape(-1,nFields)
+    if (numpy.any(lineOfToken!=lineOfToken[:,:1])
+        or numpy.any(numpy.diff(lineOfToken[:,0])<=0)):
+        return None
+
+    #node names must be integer literals, as required by int()
+    otherChars=numpy.flatnonzero(_edgNonDigit[chars])
+    tokenOfChar=numpy.searchsorted(tokenStarts,otherChars,side="right")-1
+    inName=(tokenOfChar%nFields)<2
+    isSign=((chars[otherChars]==ord("+"))|(chars[otherChars]==ord("-")))
+    isSign&=(tokenStarts[tokenOfChar]==otherChars)
+    if numpy.any(inName&~isSign):
+        raise ValueError("Node names are not integers.")
+
+    values=numpy.fromstring(chunk,dtype='float',sep=" ")
+    if len(values)!=len(tokenStarts):
+        return None
+    values=values.reshape(-1,nFields)
+    if numpy.any(numpy.abs(values[:,:2])>=2**53):
+        return None
+    if nFields>2:
+        weights=values[:,2].copy()
+    else:
+        weights=numpy.ones(len(values))
+    return values[:,0].astype('int64'),values[:,1].astype('int64'),weights
+
+def _readEdgArrays(input, hasHeaderLine, numerical):
+    """Parse a numerical edg file into arrays.
+
+    Reads the edges from input in large chunks with _parseEdgChunk
+    and returns them as arrays of source nodes, destination nodes and
+    weights. Returns None if the file is not in the simple format
+    _parseEdgChunk accepts. Raises ValueError if the node names are
+    not integers.
+    """
+    #Check for headers, the same way as loadNet_edg does
+    possibleHeaders=[["from","to","weight"],["head","tail","weight"]]
+    if hasHeaderLine != False:
+        firstLine=input.readline().strip().lower()
+        fields=firstLine.split()
+        if hasHeaderLine==None and fields not in possibleHeaders:
+            input.seek(0)
+        elif hasHeaderLine==None and numerical is None:
+            #the header line would have made the file non-numerical
+            raise ValueError("Header line in the input.")
+        if hasHeaderLine==True:
+            input.seek(0)
+
+    srcChunks,destChunks,weightChunks=[],[],[]
+    while True:
+        lines=input.readlines(_edgChunkBytes)
+        if len(lines)==0:
+            break
+        edgeArrays=_parseEdgChunk(lines)
+        if edgeArrays is None:
+            return None
+        srcChunks.append(edgeArrays[0])
+        destChunks.append(edgeArrays[1])
+        weightChunks.append(edgeArrays[2])
+
+    if len(srcChunks)==0:
+        return (numpy.zeros(0,dtype='int64'),numpy.zeros(0,dtype='int64'),
+                numpy.zeros(0))
+    return (numpy.concatenate(srcChunks),numpy.concatenate(destChunks),
+            numpy.concatenate(weightChunks))
+
+def _netFromEdgArrays(src, dest, weights, mutualEdges, symmetricNet,
+                      allowSelfEdges):
+    """Build the network for loadNet_edg from numerical edge arrays."""
+    selfEdges=(src==dest)
+    if allowSelfEdges:
+        selfNodes=numpy.unique(src[selfEdges])
+    else:
+        selfNodes=numpy.zeros(0,dtype='int64')
+    src,dest,weights=src[~selfEdges],dest[~selfEdges],weights[~selfEdges]
+
+    nodes,inverse=numpy.unique(numpy.concatenate((src,dest)),return_inverse=True)
+    nNodes=max(len(nodes),1)
+    srcIndex,destIndex=inverse[:len(src)],inverse[len(src):]
+    if symmetricNet:
+        low=numpy.minimum(srcIndex,destIndex)
+        high=numpy.maximum(srcIndex,destIndex)
+        keys=low*nNodes+high
+    else:
+        keys=srcIndex*nNodes+destIndex
+
+    #duplicate edges are summed
+    keys,edgeOf=numpy.unique(keys,return_inverse=True)
+    totalWeights=numpy.bincount(edgeOf,weights=weights,minlength=len(keys))
+    if mutualEdges:
+        #keep the edges that are listed in both directions
+        forward=numpy.bincount(edgeOf,weights=(srcIndex<destIndex),minlength=len(keys))
+        backward=numpy.bincount(edgeOf,weights=(srcIndex>destIndex),minlength=len(keys))
+        mutual=(forward>0)&(backward>0)
+        keys,totalWeights=keys[mutual],totalWeights[mutual]
+        #only the nodes of the mutual edges are added
+        used=numpy.unique(numpy.concatenate((keys//nNodes,keys%nNodes)))
+        newIndex=numpy.zeros(nNodes,dtype='int64')
+        newIndex[used]=numpy.arange(len(used))
+        edgeSrc,edgeDest=newIndex[keys//nNodes],newIndex[keys%nNodes]
+        nodes=nodes[used]
+    else:
+        edgeSrc,edgeDest=keys//nNodes,keys%nNodes
+
+    #nodes with only self-edges are added without edges
+    names=numpy.concatenate((nodes,numpy.setdiff1d(selfNodes,nodes)))
+    return pynet.fromArrays(edgeSrc,edgeDest,totalWeights,names=names,
+                            symmetric=symmetricNet)
+
 def loadNet_edg(input, mutualEdges=False, splitterChar=None, symmetricNet=True,
                 numerical=None, allowSelfEdges=True, hasHeaderLine=False):
     """Read network data from input in edg format.
@@ -111,7 +248,30 @@ def loadNet_edg(input, mutualEdges=False, splitterChar=None, symmetricNet=True,
     the first line is read normally, and if it is None the first line
     is skanned for "from to weight" string to decide if it is a header
     line.
+
+    Whitespace separated numerical files are parsed in large chunks
+    with numpy and the edges are inserted in one go. Other inputs, and
+    directed networks with mutualEdges, are read line by line.
     """
+    if (splitterChar is None and numerical is not False
+        and (symmetricNet or not mutualEdges)):
+        try:
+            start=input.tell()
+        except (AttributeError, IOError):
+            start=None
+        if start is not None:
+            try:
+                edgeArrays=_readEdgArrays(input, hasHeaderLine, numerical)
+            except ValueError:
+                if numerical is None:
+                    #the same answer isNumerical would give
+                    numerical=False
+                edgeArrays=None
+            if edgeArrays is not None:
+                return _netFromEdgArrays(*(edgeArrays+(mutualEdges,symmetricNet,
+                                                       allowSelfEdges)))
+            input.seek(start)
+
     def isNumerical(input):
 	try:
 	   for line in input:
@@ -142,6 +302,7 @@ def loadNet_edg(input, mutualEdges=False, splitterChar=None, symmetricNet=True,
             input.seek(0)
 
     nodeMap = {} # Used only if mutualEdges = True.
+    edges = [] # The edges are added to the network in one go at the end.
 
     for line in input:
         fields=line.split(splitterChar)
@@ -156,17 +317,19 @@ def loadNet_edg(input, mutualEdges=False, splitterChar=None, symmetricNet=True,
                 if fields[0]!=fields[1]:
                     if mutualEdges:
                         if nodeMap.has_key( (fields[1], fields[0]) ):
-                            newNet[fields[0]][fields[1]] += nodeMap[(fields[1], fields[0])]
-                            newNet[fields[0]][fields[1]] += float(fields[2])
+                            edges.append((fields[0], fields[1],
+                                          nodeMap[(fields[1], fields[0])] + float(fields[2])))
                             nodeMap[(fields[1], fields[0])] = 0
                             nodeMap[(fields[0], fields[1])] = 0
                         else:
                             nodeMap[(fields[0], fields[1])] = nodeMap.get((fields[0], fields[1]), 0) + float(fields[2])
                     else:
-                        newNet[fields[0]][fields[1]] += float(fields[2])
+                        edges.append((fields[0], fields[1], float(fields[2])))
                 else:
                     newNet.addNode(fields[0])
 
+    newNet.addEdges(edges, accumulate=True)
+
     return newNet
 
 def loadNet_adj(input, mutualEdges=False, splitterChar=None, symmetricNet=True,
@@ -468,6 +631,153 @@ def writeNet_adj(net,outputFile,splitterChar=" "):
         outputFile.write(splitterChar.join(map(str,nodes)))
         outputFile.write("\n")        
 
+#--- The binary npnet format
+#
+# magic string (8 bytes)
+# header: symmetric, number of nodes, number of stored entries,
+#         type of node names, length of the name table in bytes,
+#         item size of the index arrays (6 little-endian int64 values)
+# node name table
+# indptr (int64), indices (int32 or int64), weights (float64)
+# for directed networks also the incoming edges as indptr, indices and
+# weights, followed by the total degrees (int64)
+#
+# Each array starts at an offset divisible by 8.
+_npnetMagic="\x93NPNET\x01\n"
+_npnetHeader=struct.Struct("<6q")
+# Name type 3 was used for pickled names, which are not loaded.
+_npnetIntNames,_npnetStrNames,_npnetUnicodeNames,_npnetPickledNames,_npnetLiteralNames=range(5)
+
+def _isLiteralName(name):
+    """True if ast.literal_eval(repr(name)) gives the name back."""
+    if isinstance(name,tuple):
+        return all(_isLiteralName(item) for item in name)
+    if isinstance(name,float):
+        return name==name and abs(name)!=float("inf")
+    return name is None or isinstance(name,(int,long,str,unicode))
+
+def _npnetNameTable(names):
+    """Returns the type of the node names and the name table."""
+    if all(isinstance(name,(int,long)) and not isinstance(name,bool) for name in names):
+        return _npnetIntNames,numpy.array(names,dtype='<i8').tostring()
+    if all(isinstance(name,str) for name in names):
+        nameType,encoded=_npnetStrNames,names
+    elif all(isinstance(name,unicode) for name in names):
+        nameType,encoded=_npnetUnicodeNames,[name.encode("utf-8") for name in names]
+    elif all(_isLiteralName(name) for name in names):
+        return _npnetLiteralNames,repr(list(names))
+    else:
+        raise ValueError("Node names of npnet files must be numbers, strings, "
+                         "None or tuples of these. Use the edg format instead.")
+    offsets=numpy.zeros(len(encoded)+1,dtype='<i8')
+    numpy.cumsum([len(name) for name in encoded],out=offsets[1:])
+    return nameType,offsets.tostring()+"".join(encoded)
+
+def _npnetNames(nameType,nNodes,table):
+    """Inverse of _npnetNameTable."""
+    if nameType==_npnetIntNames:
+        return numpy.fromstring(table,dtype='<i8',count=nNodes).tolist()
+    if nameType==_npnetLiteralNames:
+        names=ast.literal_eval(table)
+        if not isinstance(names,list) or len(names)!=nNodes:
+            raise ValueError("Invalid node name table in the npnet file.")
+        return names
+    if nameType not in (_npnetStrNames,_npnetUnicodeNames):
+        raise ValueError("Unsupported type of node names in the npnet file.")
+    offsets=numpy.fromstring(table,dtype='<i8',count=nNodes+1).tolist()
+    names=[table[8*(nNodes+1)+start:8*(nNodes+1)+end]
+           for start,end in zip(offsets[:-1],offsets[1:])]
+    if nameType==_npnetUnicodeNames:
+        names=[name.decode("utf-8") for name in names]
+    return names
+
+def _npnetPadding(size):
+    return "\0"*(-size%8)
+
+def writeNet_npnet(net, outputFile):
+    """
+    Writes the network in the binary npnet format.
+
+    The network is stored in compressed sparse row format, the
+    same way as in pynet.CSRSymmNet and pynet.CSRDirNet. Networks of
+    other types are frozen first. Node names that are not all
+    integers, all strings or all unicode strings are stored with repr
+    and read back with ast.literal_eval, so they must be numbers,
+    strings, None or tuples of these; other names raise ValueError.
+    """
+    if not hasattr(outputFile, 'write'):
+        raise ValueError("Parameter 'outputFile' must be a file object.")
+    net=net.freeze()
+    nameType,nameTable=_npnetNameTable(net._indexToName)
+    if net.isSymmetric():
+        arrays=[net._indptr,net._indices,net._weights]
+    else:
+        arrays=[net._indptr,net._indices,net._weights,
+                net._inIndptr,net._inIndices,net._inWeights,net._degree]
+    dtypes=['<i8','<i%d' % net._indices.itemsize,'<f8']*2+['<i8']
+
+    outputFile.write(_npnetMagic)
+    outputFile.write(_npnetHeader.pack(int(net.isSymmetric()),len(net._indexToName),
+                                       len(net._indices),nameType,len(nameTable),
+                                       net._indices.itemsize))
+    outputFile.write(nameTable)
+    outputFile.write(_npnetPadding(len(nameTable)))
+    for array,dtype in zip(arrays,dtypes):
+        data=numpy.ascontiguousarray(array,dtype=dtype)
+        if isinstance(outputFile,file):
+            outputFile.flush()
+            data.tofile(outputFile)
+        else:
+            outputFile.write(data.tostring())
+        outputFile.write(_npnetPadding(data.nbytes))
+
+def loadNet_npnet(input):
+    """
+    Reads a network in the binary npnet format.
+
+    The arrays are memory mapped from the file when input is a real
+    file, so that nothing is parsed or copied at load time and the
+    operating system loads the pages when they are first used. The
+    returned network is a read-only pynet.CSRSymmNet or
+    pynet.CSRDirNet.
+    """
+    magic=input.read(len(_npnetMagic))
+    if magic!=_npnetMagic:
+        raise ValueError("The input is not in the npnet format.")
+    symmetric,nNodes,nEntries,nameType,nameBytes,indexSize=_npnetHeader.unpack(
+        input.read(_npnetHeader.size))
+    names=_npnetNames(nameType,nNodes,input.read(nameBytes))
+    offset=len(_npnetMagic)+_npnetHeader.size+nameBytes+len(_npnetPadding(nameBytes))
+
+    def readArray(dtype,count):
+        """Reads the next array from the file starting at offset."""
+        dtype=numpy.dtype(dtype)
+        nbytes=dtype.itemsize*count
+        if count==0:
+            array=numpy.zeros(0,dtype=dtype)
+        elif isinstance(input,file):
+            array=numpy.memmap(input,dtype=dtype,mode='r',offset=offset,shape=(count,))
+        else:
+            input.seek(offset)
+            array=numpy.fromstring(input.read(nbytes),dtype=dtype)
+            array.setflags(write=False)
+        return array,offset+nbytes+len(_npnetPadding(nbytes))
+
+    indexType='<i%d' % indexSize
+    arrays=[]
+    for dtype,count in [('<i8',nNodes+1),(indexType,nEntries),('<f8',nEntries)]:
+        array,offset=readArray(dtype,count)
+        arrays.append(array)
+    if symmetric:
+        newNet=pynet.CSRSymmNet()
+    else:
+        for dtype,count in [('<i8',nNodes+1),(indexType,nEntries),('<f8',nEntries),('<i8',nNodes)]:
+            array,offset=readArray(dtype,count)
+            arrays.append(array)
+        newNet=pynet.CSRDirNet()
+    newNet._setArrays(names,*arrays)
+    return newNet
+
 def writeNet(net, output, headers=False, fileType=None):
     """Write network to disk.
 
@@ -494,7 +804,10 @@ def writeNet(net, output, headers=False, fileType=None):
     # file object.
     fileOpened = False
     if isinstance(output, str) or isinstance(output,unicode):
-        outputFile = open(output, 'w')
+        if (fileType or getFiletype(output)) in binaryFiletypes:
+            outputFile = open(output, 'wb')
+        else:
+            outputFile = open(output, 'w')
         fileOpened = True
     elif not hasattr(output, 'write'):
         raise ValueError("'output' must be a string or an object "
@@ -544,7 +857,10 @@ def loadNet(input, fileType=None, **keywords):
     # file object.
     fileOpened = False
     if isinstance(input, str) or isinstance(input, unicode):
-        inputFile = open(input, 'r')
+        if (fileType or getFiletype(input)) in binaryFiletypes:
+            inputFile = open(input, 'rb')
+        else:
+            inputFile = open(input, 'r')
         fileOpened = True
     elif not isinstance(input, file):
         raise ValueError("'input' must be a string or a file object.")
@@ -572,6 +888,260 @@ def loadNet(input, fileType=None, **keywords):
 
     return newNet
     
+def _edgeFileName(fileName):
+    """Return the file name without a gz or bz2 suffix."""
+    for suffix in (".gz",".bz2"):
+        if fileName.endswith(suffix):
+            return fileName[:-len(suffix)]
+    return fileName
+
+def _openEdgeFile(fileName):
+    """Open a possibly compressed file for reading."""
+    if fileName.endswith(".gz"):
+        return gzip.open(fileName,'rb')
+    elif fileName.endswith(".bz2"):
+        return bz2.BZ2File(fileName,'r')
+    return open(fileName,'r')
+
+def _nodeName(name, numerical):
+    """Convert a node name read from a file to int if required."""
+    if numerical==False:
+        return name
+    try:
+        return int(name)
+    except ValueError:
+        if numerical:
+            raise
+        return name
+
+def _iterEdges_edg(input, splitterChar=None, numerical=None):
+    """Yield the edges of an edg file line by line."""
+    possibleHeaders=[["from","to","weight"],["head","tail","weight"]]
+    for lineNumber,line in enumerate(input):
+        fields=line.split(splitterChar)
+        if lineNumber==0 and [field.strip().lower() for field in fields] in possibleHeaders:
+            continue
+        if len(fields)>1:
+            if len(fields)==2:
+                weight=1.0
+            else:
+                weight=float(fields[2])
+            source=_nodeName(fields[0].strip(),numerical)
+            target=_nodeName(fields[1].strip(),numerical)
+            if source!=target:
+                yield source,target,weight
+
+def _iterEdgeChunks_edg(input, chunksize, splitterChar=None, numerical=None):
+    """Yield the edges of an edg file as arrays of at most chunksize edges."""
+    possibleHeaders=[["from","to","weight"],["head","tail","weight"]]
+    first=True
+    while True:
+        lines=list(itertools.islice(input,chunksize))
+        if len(lines)==0:
+            break
+        if first:
+            first=False
+            if [field.strip().lower() for field in lines[0].split(splitterChar)] in possibleHeaders:
+                lines=lines[1:]
+        edgeArrays=None
+        if splitterChar is None and numerical!=False:
+            try:
+                edgeArrays=_parseEdgChunk(lines)
+            except ValueError:
+                pass
+        if edgeArrays is not None:
+            notSelf=edgeArrays[0]!=edgeArrays[1]
+            edgeArrays=tuple(array[notSelf] for array in edgeArrays)
+        else:
+            edgeArrays=_edgeListToArrays(list(_iterEdges_edg(lines,splitterChar,numerical)))
+        if len(edgeArrays[0])>0:
+            yield edgeArrays
+
+def _iterItems_gml(input):
+    """Parse a gml file for loadNet_gml and iterEdges.
+
+    Yields ("directed", flag) for the directed line of the graph and
+    ("edge", source, target, weight) for each edge. Self-edges are
+    skipped.
+    """
+    source=None
+    target=None
+    value=None
+    for line in input:
+        line=line.strip()
+        if line.startswith("directed"):
+            yield "directed",line[9:10]
+        elif line.startswith("source"):
+            source=line.split()[1]
+        elif line.startswith("target"):
+            target=line.split()[1]
+        elif line.startswith("value"):
+            value=line.split()[1]
+        elif line.startswith("edge"):
+            if source!=None and target!=None and source!=target:
+                if value!=None:
+                    yield "edge",source,target,float(value)
+                else:
+                    yield "edge",source,target,1.0
+            source=None
+            target=None
+            value=None
+    if source!=None and target!=None and source!=target:
+        if value!=None:
+            yield "edge",source,target,float(value)
+        else:
+            yield "edge",source,target,1.0
+
+def _iterEdges_gml(input):
+    """Yield the edges of a gml file, named as in loadNet_gml."""
+    for item in _iterItems_gml(input):
+        if item[0]=="edge":
+            yield item[1:]
+
+def _iterEdges_net(input, numerical=None):
+    """Yield the edges of a Pajek net file.
+
+    Nodes are named by their labels in the *Vertices section, or by
+    their numbers if they have no label. Both *Edges and *Arcs
+    sections, and their list forms, are read.
+    """
+    labels={}
+    section=None
+    for line in input:
+        line=line.strip()
+        if len(line)==0 or line.startswith("%"):
+            continue
+        if line.startswith("*"):
+            section=line.split()[0].lower()
+            continue
+        if section=="*vertices":
+            fields=line.split(None,1)
+            if len(fields)>1:
+                label=fields[1]
+                if label.startswith('"'):
+                    label=label[1:label.find('"',1)]
+                else:
+                    label=label.split()[0]
+                labels[fields[0]]=_nodeName(label,numerical)
+        elif section in ("*edges","*arcs"):
+            fields=line.split()
+            if len(fields)>1:
+                if len(fields)>2:
+                    weight=float(fields[2])
+                else:
+                    weight=1.0
+                source=labels.get(fields[0],None)
+                if source is None:
+                    source=_nodeName(fields[0],numerical)
+                target=labels.get(fields[1],None)
+                if target is None:
+                    target=_nodeName(fields[1],numerical)
+                if source!=target:
+                    yield source,target,weight
+        elif section in ("*edgeslist","*arcslist"):
+            fields=line.split()
+            source=labels.get(fields[0],None)
+            if source is None:
+                source=_nodeName(fields[0],numerical)
+            for field in fields[1:]:
+                target=labels.get(field,None)
+                if target is None:
+                    target=_nodeName(field,numerical)
+                if source!=target:
+                    yield source,target,1.0
+
+def _edgeListToArrays(edges):
+    """Convert a list of (source, target, weight) to three arrays."""
+    if len(edges)==0:
+        return (numpy.zeros(0,dtype='int64'),numpy.zeros(0,dtype='int64'),
+                numpy.zeros(0))
+    sources,targets,weights=zip(*edges)
+    return (pynet._namesToArray(list(sources)),pynet._namesToArray(list(targets)),
+            numpy.array(weights,dtype='float'))
+
+def _chunkEdges(edges, chunksize):
+    """Group an iterator of edges into arrays of at most chunksize edges."""
+    while True:
+        chunk=list(itertools.islice(edges,chunksize))
+        if len(chunk)==0:
+            break
+        yield _edgeListToArrays(chunk)
+
+def iterEdges(input, fileType=None, chunksize=None, **keywords):
+    """Iterate over the edges in a network file without loading the network.
+
+    The file is read lazily, so that files larger than the available
+    memory can be processed edge by edge.
+
+    Parameters
+    ----------
+    input : str or file
+        Name of the file to be opened or a file object. Files whose
+        names end with .gz or .bz2 are decompressed on the fly.
+    fileType : str
+        Type of the file, 'edg', 'gml' or 'net'. If None, the suffix of
+        the file name (without the compression suffix) is used.
+    chunksize : int
+        If None, the edges are yielded one by one as (source, target,
+        weight) tuples. Otherwise arrays (sources, targets, weights) of
+        at most chunksize edges are yielded. The type of the node
+        arrays is decided separately for each chunk: they are of
+        integer type if all the names in the chunk are integers and of
+        object type otherwise. With numerical=None the chunks of one
+        file can therefore have different types, and they should not
+        be concatenated as such; give numerical=True or False to get
+        the same type in every chunk.
+    splitterChar : str
+        The field separator of edg files. None means whitespace.
+    numerical : bool
+        For edg and net files: if True, node names must be integers, if
+        False, they are kept as strings, and if None, names that are
+        integers are converted to ints.
+
+    Self-edges are skipped. Edges are yielded as they are listed in
+    the file, so duplicate edges are not summed and for symmetric
+    networks the same edge can appear in both directions.
+
+    Exceptions
+    ----------
+    ValueError : If the file type is not supported.
+    """
+    if fileType is None:
+        if isinstance(input, str) or isinstance(input, unicode):
+            fileType = getFiletype(_edgeFileName(input))
+        elif hasattr(input, 'name'):
+            fileType = getFiletype(_edgeFileName(input.name))
+    if fileType not in ('edg', 'gml', 'net'):
+        raise ValueError("Unknown file type '%s' for iterEdges." % fileType)
+    return _iterEdgesFromFile(input, fileType, chunksize, keywords)
+
+def _iterEdgesFromFile(input, fileType, chunksize, keywords):
+    """The generator returned by iterEdges."""
+    fileOpened = False
+    if isinstance(input, str) or isinstance(input, unicode):
+        inputFile = _openEdgeFile(input)
+        fileOpened = True
+    else:
+        inputFile = input
+
+    try:
+        if fileType == 'edg' and chunksize is not None:
+            edges = _iterEdgeChunks_edg(inputFile, chunksize, **keywords)
+        else:
+            if fileType == 'edg':
+                edges = _iterEdges_edg(inputFile, **keywords)
+            elif fileType == 'gml':
+                edges = _iterEdges_gml(inputFile, **keywords)
+            else:
+                edges = _iterEdges_net(inputFile, **keywords)
+            if chunksize is not None:
+                edges = _chunkEdges(edges, chunksize)
+        for edge in edges:
+            yield edge
+    finally:
+        if fileOpened:
+            inputFile.close()
+
 def loadNodeProperties(net,input,splitterChar=None,propertyNames=None,
                        allowMissingData=False,allowExtraData=False):
     """Read metadata (properties for nodes) from a file.
@@ -4,7 +4,7 @@ This contains general framework for edge and node percolation studies, but
 also functions for k-clique percolation.
 """
 
-import pynet,netext,array,math,netio,communities,numpy,transforms
+import pynet,netext,array,math,netio,communities,numpy,transforms,itertools
 from operator import mul
 
 
@@ -61,10 +61,18 @@ class KtreeInteger:
             self.ktree[node]=newParent        
 
     def getSetIndex(self,node):
-        parent=self.__getRealParent(node)
-        if node!=parent:
-            self.__setRealParent(node,self.getSetIndex(parent))
-        return self.__getRealParent(node)
+        #find the root
+        root=node
+        parent=self.__getRealParent(root)
+        while root!=parent:
+            root=parent
+            parent=self.__getRealParent(root)
+        #compress the path
+        while node!=root:
+            parent=self.__getRealParent(node)
+            self.__setRealParent(node,root)
+            node=parent
+        return root
 
             
     def mergeSets(self,node1,node2):
@@ -160,6 +168,262 @@ class KtreeInteger:
     def getParent(self,node):
         return self.getSetIndex(node)
 
+class KtreeArray:
+    """
+    A Kruskal tree (union-find) over the integers 0...size-1 stored in
+    preallocated numpy arrays.
+
+    Single merges use iterative path halving, and edges can be added
+    in large batches with mergeMany. Instead of a size distribution
+    dictionary, the tree keeps a histogram of set sizes (sizeCounts),
+    the number of sets (nSets) and the sum of squared set sizes
+    (suscSum), from which the statistics are computed on demand. The
+    tree grows automatically when elements outside the current size
+    are used.
+    """
+    def __init__(self,size=0):
+        """
+        Parameters
+        ----------
+        size : int
+            Initial number of elements in the tree.
+        """
+        self.size=0
+        self.giantSize=0
+        self.nSets=0
+        self.suscSum=0
+        self._secondBound=0 #upper bound for the second largest set size
+        self.ktree=numpy.zeros(0,dtype=numpy.int32)
+        self.subTreeWeight=numpy.zeros(0,dtype=numpy.int32)
+        self.sizeCounts=numpy.zeros(2,dtype=numpy.int64)
+        self.setSize(size)
+
+    def setSize(self,newSize):
+        """Add singleton elements so that the tree has newSize elements."""
+        if newSize<self.size:
+            raise Exception("The size cannot be decreased.")
+        if newSize>len(self.ktree):
+            capacity=max(newSize,2*len(self.ktree))
+            if capacity<2**31:
+                dtype=numpy.int32
+            else:
+                dtype=numpy.int64
+            ktree=numpy.arange(capacity,dtype=dtype)
+            ktree[:self.size]=self.ktree[:self.size]
+            subTreeWeight=numpy.ones(capacity,dtype=dtype)
+            subTreeWeight[:self.size]=self.subTreeWeight[:self.size]
+            sizeCounts=numpy.zeros(capacity+1,dtype=numpy.int64)
+            sizeCounts[:len(self.sizeCounts)]=self.sizeCounts
+            self.ktree,self.subTreeWeight,self.sizeCounts=ktree,subTreeWeight,sizeCounts
+        if newSize>0:
+            self.giantSize=max(self.giantSize,1)
+        added=newSize-self.size
+        if newSize>1:
+            self._secondBound=max(self._secondBound,1)
+        self.sizeCounts[1]+=added
+        self.nSets+=added
+        self.suscSum+=added
+        self.size=newSize
+
+    def getSetIndex(self,node):
+        if node>=self.size:
+            self.setSize(node+1)
+        ktree=self.ktree
+        parent=ktree.item(node)
+        while parent!=node:
+            grandParent=ktree.item(parent)
+            ktree.itemset(node,grandParent)
+            node,parent=grandParent,ktree.item(grandParent)
+        return node
+
+    def mergeSets(self,node1,node2):
+        """
+        Merge the sets of node1 and node2. Returns True if the nodes
+        were in different sets.
+        """
+        set1=self.getSetIndex(node1)
+        set2=self.getSetIndex(node2)
+        if set1==set2:
+            return False
+        weights=self.subTreeWeight
+        size1,size2=weights.item(set1),weights.item(set2)
+        if size1>size2:
+            set1,set2=set2,set1
+        newSize=size1+size2
+        self.ktree.itemset(set1,set2)
+        weights.itemset(set2,newSize)
+        sizeCounts=self.sizeCounts
+        sizeCounts[size1]-=1
+        sizeCounts[size2]-=1
+        sizeCounts[newSize]+=1
+        if newSize>self.giantSize:
+            if sizeCounts.item(self.giantSize)>0:
+                self._secondBound=self.giantSize
+            self.giantSize=newSize
+        elif newSize>self._secondBound:
+            self._secondBound=newSize
+        self.nSets-=1
+        self.suscSum+=2*size1*size2
+        return True
+
+    def _roots(self,nodes):
+        """Returns the roots of the nodes and points the nodes to them."""
+        ktree=self.ktree
+        roots=ktree[nodes]
+        while True:
+            parents=ktree[roots]
+            if (parents==roots).all():
+                break
+            roots=parents
+        ktree[nodes]=roots
+        return roots
+
+    def mergeMany(self,src,dest):
+        """
+        Merge the sets of src[i] and dest[i] for all i.
+
+        Parameters
+        ----------
+        src, dest : sequences of ints
+            Elements of the tree. The tree is grown if necessary.
+        """
+        src=numpy.asarray(src,dtype=numpy.int64).ravel()
+        dest=numpy.asarray(dest,dtype=numpy.int64).ravel()
+        if len(src)!=len(dest):
+            raise ValueError("src and dest must be of equal length.")
+        if len(src)==0:
+            return
+        if min(src.min(),dest.min())<0:
+            raise ValueError("The elements must be non-negative.")
+        maxNode=max(src.max(),dest.max())
+        if maxNode>=self.size:
+            self.setSize(int(maxNode)+1)
+        ktree,weights=self.ktree,self.subTreeWeight
+        src,dest=src.astype(ktree.dtype),dest.astype(ktree.dtype)
+        slot=numpy.empty(self.size,dtype=numpy.int64)
+
+        while len(src)>0:
+            roots1=self._roots(src)
+            roots2=self._roots(dest)
+            different=roots1!=roots2
+            src,dest=src[different],dest[different]
+            roots1,roots2=roots1[different],roots2[different]
+            if len(src)==0:
+                break
+
+            # The smaller set (ties by larger index) is hooked under
+            # the larger one. The order is strict, so no cycles are
+            # created. A root with several candidate parents is hooked
+            # under one of them and its other edges wait for the next
+            # round.
+            weights1,weights2=weights[roots1],weights[roots2]
+            swap=(weights1>weights2)|((weights1==weights2)&(roots1<roots2))
+            child=numpy.where(swap,roots2,roots1)
+            parent=numpy.where(swap,roots1,roots2)
+            positions=numpy.arange(len(child))
+            slot[child]=positions
+            winners=slot[child]==positions
+            child,parent=child[winners],parent[winners]
+            childWeights=weights[child]
+            ktree[child]=parent
+
+            # Chains of hooked roots are shortcut by pointer jumping,
+            # after which every child points to its new root.
+            while True:
+                grandParents=ktree[ktree[child]]
+                if (grandParents==ktree[child]).all():
+                    break
+                ktree[child]=grandParents
+            newRoots=ktree[child]
+            slot[newRoots]=positions[:len(newRoots)]
+            roots=newRoots[slot[newRoots]==positions[:len(newRoots)]]
+            oldWeights=weights[roots].astype(numpy.int64)
+            numpy.add.at(weights,newRoots,childWeights)
+            newWeights=weights[roots].astype(numpy.int64)
+
+            # The second largest set is either a new root, the old
+            # largest set or a set below the old bound.
+            candidates=numpy.r_[newWeights,self.giantSize,self._secondBound]
+            candidates.partition(len(candidates)-2)
+            self._secondBound=int(candidates[-2])
+            self.giantSize=max(self.giantSize,int(candidates[-1]))
+
+            numpy.add.at(self.sizeCounts,childWeights,-1)
+            numpy.add.at(self.sizeCounts,oldWeights,-1)
+            numpy.add.at(self.sizeCounts,newWeights,1)
+            childWeights=childWeights.astype(numpy.int64)
+            self.nSets-=len(child)
+            self.suscSum+=int(numpy.dot(newWeights,newWeights)-numpy.dot(oldWeights,oldWeights)
+                              -numpy.dot(childWeights,childWeights))
+
+    def getSizeDistribution(self):
+        """Returns a dictionary of set sizes and their counts."""
+        sizes=numpy.flatnonzero(self.sizeCounts[:self.giantSize+1])
+        return dict(zip(sizes.tolist(),self.sizeCounts[sizes].tolist()))
+
+    def getSecondSize(self):
+        """Returns the size of the second largest set."""
+        sizeCounts,giantSize=self.sizeCounts,self.giantSize
+        if sizeCounts.item(giantSize)>1:
+            return giantSize
+        bound=min(self._secondBound,giantSize-1)
+        for i in xrange(16):
+            if bound<=0 or sizeCounts.item(bound)>0:
+                self._secondBound=max(bound,0)
+                return self._secondBound
+            bound-=1
+        smaller=numpy.flatnonzero(sizeCounts[1:bound+1])
+        if len(smaller)==0:
+            self._secondBound=0
+        else:
+            self._secondBound=int(smaller[-1])+1
+        return self._secondBound
+
+    def getSusceptibility(self):
+        """
+        Returns the susceptibility, i.e. the weighted mean size of the
+        sets excluding the largest one.
+        """
+        if self.size==self.giantSize:
+            return 0.0
+        return (self.suscSum-self.giantSize*self.giantSize)/float(self.size-self.giantSize)
+
+    def getSetIndices(self):
+        """Returns the set index of each element as a numpy array."""
+        return self._roots(numpy.arange(self.size,dtype=self.ktree.dtype))
+
+    def getCommStruct(self,separateElements=True):
+        setIndices=self.getSetIndices()
+        order=numpy.argsort(setIndices,kind="mergesort")
+        sortedIndices=setIndices[order]
+        starts=numpy.flatnonzero(numpy.r_[True,sortedIndices[1:]!=sortedIndices[:-1]])
+        communityMap={}
+        for nodes in numpy.split(order,starts[1:]):
+            if len(nodes)>0 and (separateElements or len(nodes)>1):
+                communityMap[int(setIndices[nodes[0]])]=nodes.tolist()
+        return communities.NodePartition(communityMap)
+
+    def __iter__(self):
+        for i in self.ktree[:self.size].tolist():
+            yield i
+
+    def __len__(self):
+        return self.size
+
+    def mergeSetsWithElements(self,elements):
+        elements=numpy.asarray(elements)
+        self.mergeMany(elements[1:],numpy.repeat(elements[:1],len(elements)-1))
+
+    def addEdge(self,edge):
+        self.mergeSets(edge[0],edge[1])
+
+    #this is for legacy support
+    def setParent(self,node,newParent):
+        self.mergeSets(node,newParent)
+    def getParent(self,node):
+        return self.getSetIndex(node)
+
+
 class KtreeInteger_old:
     def __init__(self,size=0):
         self.ktree=[]
@@ -252,7 +516,7 @@ class Ktree:
             for nodeName in nodeNames:
                 self.nodeIndex[nodeName]
 
-        self.ktree=KtreeInteger(size)
+        self.ktree=KtreeArray(size)
 
     def _get_index(self,element):
         return self.nodeIndex[element]
@@ -270,6 +534,16 @@ class Ktree:
     def addEdge(self,edge):
         self.setParent(edge[0],edge[1])
 
+    def addEdges(self,edges):
+        """
+        Merge the sets of the two end points of each edge in a
+        single batch. The edges are sequences (node1,node2,...).
+        """
+        nodeIndex=self.nodeIndex
+        src=numpy.fromiter((nodeIndex[edge[0]] for edge in edges),dtype=numpy.int64)
+        dest=numpy.fromiter((nodeIndex[edge[1]] for edge in edges),dtype=numpy.int64)
+        self.ktree.mergeMany(src,dest)
+
     def __iter__(self):
         return self.nodeIndex.__iter__()
 
@@ -288,6 +562,8 @@ class Ktree:
         return newcs
 
 class Percolator:
+    bufferSize=2**16
+
     def __init__(self,edgesAndEvaluations,buildNet=True,symmetricNet=True,nodes=None,returnKtree=False):
         self.edges=edgesAndEvaluations
         self.buildNet=buildNet
@@ -307,8 +583,12 @@ class Percolator:
         else:
             ktree=Ktree(size=len(self.nodes),nodeNames=self.nodes)
             
+        # Edges are merged into the tree in batches.
+        edgeBuffer=[]
         for edge in self.edges:
             if isinstance(edge,EvaluationEvent):
+                ktree.addEdges(edgeBuffer)
+                edgeBuffer=[]
                 if self.returnKtree:
                     ktree.threshold=edge.threshold
                     ktree.addedEdges=edge.addedElements
@@ -321,7 +601,10 @@ class Percolator:
                         cs.net=net
                     yield cs
             else:
-                ktree.addEdge(edge)
+                edgeBuffer.append(edge)
+                if len(edgeBuffer)>=self.bufferSize:
+                    ktree.addEdges(edgeBuffer)
+                    edgeBuffer=[]
                 if self.buildNet:
                     net[edge[0],edge[1]]=edge[2]
 
@@ -482,6 +765,348 @@ def getComponents(net):
     for cs in p:
         return cs
 
+# The statistics recorded by the percolation curve functions.
+curveStatistics=("giantSize","secondSize","susceptibility","nClusters")
+
+def _iterKtree(src,dest,edgeEnds,treeSizes):
+    """
+    Adds the edges (src[i],dest[i]) to a KtreeArray in order and
+    yields the tree at each evaluation.
+
+    Parameters
+    ----------
+    src, dest : numpy arrays
+        Node indices of the edges in the order of addition.
+    edgeEnds : sequence of ints
+        The number of edges added at each evaluation.
+    treeSizes : sequence of ints
+        The number of nodes present at each evaluation.
+    """
+    ktree=KtreeArray(0)
+    added=0
+    for edgeEnd,treeSize in zip(edgeEnds,treeSizes):
+        if treeSize>ktree.size:
+            ktree.setSize(treeSize)
+        if edgeEnd-added<32:
+            mergeSets=ktree.mergeSets
+            for i,j in zip(src[added:edgeEnd].tolist(),dest[added:edgeEnd].tolist()):
+                mergeSets(i,j)
+        else:
+            ktree.mergeMany(src[added:edgeEnd],dest[added:edgeEnd])
+        added=edgeEnd
+        yield ktree
+
+def _ktreeStatistics(ktree):
+    """Returns the statistics in curveStatistics for a KtreeArray."""
+    return (ktree.giantSize,ktree.getSecondSize(),ktree.getSusceptibility(),ktree.nSets)
+
+def _curveStatistics(src,dest,edgeEnds,treeSizes):
+    """
+    Returns the statistics of _iterKtree(src,dest,edgeEnds,treeSizes)
+    as a numpy array with one row for each statistic in
+    curveStatistics and one column for each evaluation.
+    """
+    statistics=numpy.zeros((len(curveStatistics),len(edgeEnds)))
+    for evaluation,ktree in enumerate(_iterKtree(src,dest,edgeEnds,treeSizes)):
+        statistics[:,evaluation]=_ktreeStatistics(ktree)
+    return statistics
+
+def _curveFromOrder(nNodes,src,dest,evaluations,nodeOrder=None):
+    """
+    Returns the statistics of a percolation curve for one ordering.
+
+    In edge percolation the edges src,dest are added in the given
+    order and evaluations are numbers of added edges. In node
+    percolation the nodes are added in nodeOrder, each node brings
+    the edges to the nodes already present, and evaluations are
+    numbers of added nodes.
+    """
+    if nodeOrder is None:
+        return _curveStatistics(src,dest,evaluations,[nNodes]*len(evaluations))
+    src,dest,activation=_nodeOrderEdges(nNodes,src,dest,nodeOrder)
+    edgeEnds=numpy.searchsorted(activation,evaluations,side="right")
+    return _curveStatistics(src,dest,edgeEnds,evaluations)
+
+def _nodeOrderEdges(nNodes,src,dest,nodeOrder):
+    """
+    Relabels the nodes by their position in nodeOrder and sorts the
+    edges by the number of nodes that must be present for them to be
+    active. Edges to nodes that are not in nodeOrder are left out.
+    Returns the new src and dest arrays and the activation times.
+    """
+    rank=numpy.empty(nNodes,dtype=numpy.int64)
+    rank.fill(nNodes)
+    rank[nodeOrder]=numpy.arange(len(nodeOrder))
+    src,dest=rank[src],rank[dest]
+    activation=numpy.maximum(src,dest)+1
+    order=numpy.argsort(activation,kind="mergesort")
+    order=order[activation[order]<=len(nodeOrder)]
+    return src[order],dest[order],activation[order]
+
+def _randomCurve(nNodes,src,dest,evaluations,nodePercolation,randomState):
+    """Returns the statistics of a percolation curve for a random ordering."""
+    if nodePercolation:
+        return _curveFromOrder(nNodes,src,dest,evaluations,randomState.permutation(nNodes))
+    order=randomState.permutation(len(src))
+    return _curveFromOrder(nNodes,src[order],dest[order],evaluations)
+
+def _curveEvaluations(evaluations,nElements):
+    """Checks the evaluation points of a percolation curve."""
+    if evaluations is None:
+        return numpy.arange(nElements+1)
+    evaluations=numpy.sort(numpy.asarray(evaluations,dtype=numpy.int64))
+    if len(evaluations)>0 and (evaluations[0]<0 or evaluations[-1]>nElements):
+        raise ValueError("The evaluation points must be between 0 and "+str(nElements)+".")
+    return evaluations
+
+def getPercolationCurve(net,evaluations=None,orderings=1,nodePercolation=False,seed=None):
+    """
+    Computes a percolation curve in a single pass over the edges.
+
+    The edges (or nodes) are added in random order to a Kruskal tree
+    as in the Newman-Ziff algorithm, and the statistics of the
+    components are recorded as numpy arrays at the evaluation points
+    instead of building a NodePartition at each of them.
+
+    Parameters
+    ----------
+    net : pynet network
+        The network. Edge directions are ignored.
+    evaluations : sequence of ints or None
+        The numbers of added edges (or nodes) at which the statistics
+        are recorded. If None, the statistics are recorded after every
+        added element, starting from zero elements.
+    orderings : int
+        The number of random orderings the curve is averaged over.
+    nodePercolation : bool
+        If False, all nodes are present from the start and edges are
+        added. If True, nodes are added and each added node brings its
+        edges to the nodes that are already present.
+    seed : int or None
+        Seed for the numpy random number generator.
+
+    Returns
+    -------
+    curve : dict
+        The key 'added' gives the evaluation points, and the keys
+        'giantSize', 'secondSize', 'susceptibility' and 'nClusters'
+        give the size of the largest and the second largest
+        component, the susceptibility and the number of components at
+        these points averaged over the orderings. Isolated nodes
+        count as components.
+
+    Examples
+    --------
+    >>> net=pynet.SymmNet()
+    >>> net[0,1]=net[1,2]=net[2,0]=1
+    >>> getPercolationCurve(net)['giantSize'].tolist()
+    [1.0, 2.0, 3.0, 3.0]
+    """
+    src,dest,weights,names=net.toArrays()
+    nNodes=len(names)
+    if nodePercolation:
+        evaluations=_curveEvaluations(evaluations,nNodes)
+    else:
+        evaluations=_curveEvaluations(evaluations,len(src))
+    randomState=numpy.random.RandomState(seed)
+
+    statistics=numpy.zeros((len(curveStatistics),len(evaluations)))
+    for ordering in range(orderings):
+        statistics+=_randomCurve(nNodes,src,dest,evaluations,nodePercolation,randomState)
+    statistics/=orderings
+
+    curve={"added":evaluations}
+    for name,values in zip(curveStatistics,statistics):
+        curve[name]=values
+    return curve
+
+class NodePercolator:
+    """
+    Node percolation: the nodes of a network are added one by one and
+    each added node brings its edges to the nodes already present.
+
+    The components are kept in a KtreeArray, so the whole sweep is a
+    single pass over the edges. Iterating over the percolator yields
+    the statistics of the components at the evaluation points.
+
+    Examples
+    --------
+    >>> net=pynet.SymmNet()
+    >>> net[0,1]=net[1,2]=net[2,3]=1
+    >>> for s in NodePercolator(net,order=[1,3,2,0]): print s["giantSize"],
+    0 1 1 3 4
+    """
+    def __init__(self,net,order="random",evaluations=None,nodeProperty=None,
+                 ascending=True,seed=None,returnKtree=False):
+        """
+        Parameters
+        ----------
+        net : pynet network
+            The network. Edge directions are ignored.
+        order : str or list
+            The order of adding the nodes. 'random' is a random order,
+            'degree' is the order of node degrees and 'property' the
+            order of the node property given by nodeProperty. Nodes
+            with equal degrees or property values are in random
+            order. A list of node names gives the order explicitly;
+            nodes that are not in the list are never added.
+        evaluations : sequence of ints or None
+            The numbers of added nodes at which the statistics are
+            yielded. If None, they are yielded after every added
+            node, starting from zero nodes.
+        nodeProperty : str
+            Name of the node property used with order='property'.
+        ascending : bool
+            If False, 'degree' and 'property' orders start from the
+            largest values.
+        seed : int or None
+            Seed for the numpy random number generator.
+        returnKtree : bool
+            If True, the KtreeArray is yielded instead of the
+            statistics. Element i of the tree is the node
+            self.nodeOrder[i].
+        """
+        self.net=net
+        self.returnKtree=returnKtree
+        self._src,self._dest,weights,names=net.toArrays()
+        nNodes=self._nNodes=len(names)
+        randomState=numpy.random.RandomState(seed)
+
+        values=None
+        if order=="degree":
+            # Edges in both directions between two nodes count once.
+            low=numpy.minimum(self._src,self._dest)
+            high=numpy.maximum(self._src,self._dest)
+            pairs=numpy.unique(low*nNodes+high)
+            values=(numpy.bincount(pairs//nNodes,minlength=nNodes)
+                    +numpy.bincount(pairs%nNodes,minlength=nNodes))
+        elif order=="property":
+            if nodeProperty is None:
+                raise ValueError("nodeProperty is needed for order='property'.")
+            propertyMap=net.nodeProperty[nodeProperty]
+            values=numpy.array([propertyMap[name] for name in names.tolist()])
+        elif isinstance(order,str) and order!="random":
+            raise ValueError("Invalid order: "+str(order))
+
+        if isinstance(order,str):
+            nodeIndices=randomState.permutation(nNodes)
+            if values is not None:
+                # The sort is stable, so ties stay in random order.
+                sortedValues=values[nodeIndices]
+                if not ascending:
+                    sortedValues=-sortedValues
+                nodeIndices=nodeIndices[numpy.argsort(sortedValues,kind="mergesort")]
+                self.thresholds=values[nodeIndices].tolist()
+        else:
+            nameIndex=dict(zip(names.tolist(),range(nNodes)))
+            nodeIndices=numpy.array([nameIndex[name] for name in order],dtype=numpy.int64)
+            if len(set(nodeIndices.tolist()))!=len(nodeIndices):
+                raise ValueError("A node appears more than once in the order.")
+        if values is None:
+            self.thresholds=None
+        self._nodeIndices=nodeIndices
+        self.nodeOrder=names[nodeIndices].tolist()
+        self.evaluations=_curveEvaluations(evaluations,len(nodeIndices))
+
+    def __iter__(self):
+        src,dest,activation=_nodeOrderEdges(self._nNodes,self._src,self._dest,self._nodeIndices)
+        edgeEnds=numpy.searchsorted(activation,self.evaluations,side="right")
+        for addedNodes,addedEdges,ktree in itertools.izip(self.evaluations.tolist(),edgeEnds.tolist(),
+                                                          _iterKtree(src,dest,edgeEnds,self.evaluations)):
+            if self.thresholds is not None and addedNodes>0:
+                threshold=self.thresholds[addedNodes-1]
+            else:
+                threshold=None
+            if self.returnKtree:
+                ktree.threshold=threshold
+                ktree.addedNodes=addedNodes
+                ktree.addedEdges=addedEdges
+                yield ktree
+            else:
+                statistics={"added":addedNodes,"addedEdges":addedEdges,"threshold":threshold}
+                statistics.update(zip(curveStatistics,_ktreeStatistics(ktree)))
+                yield statistics
+
+def _ensembleRuns(sources,nNodes,src,dest,evaluations,nodePercolation,seed):
+    """
+    Computes the percolation curves of the runs in sources and returns
+    their number, mean and sum of squared deviations from the mean.
+    """
+    mean=numpy.zeros((len(curveStatistics),len(evaluations)))
+    squares=numpy.zeros_like(mean)
+    for count,run in enumerate(sources):
+        randomState=numpy.random.RandomState(seed+run)
+        statistics=_randomCurve(nNodes,src,dest,evaluations,nodePercolation,randomState)
+        delta=statistics-mean
+        mean+=delta/(count+1)
+        squares+=delta*(statistics-mean)
+    return len(sources),mean,squares
+
+def getPercolationEnsemble(net,orderings=100,evaluations=None,nodePercolation=False,seed=None,processes=None):
+    """
+    Computes the mean and variance of percolation curves over an
+    ensemble of random orderings.
+
+    The orderings are divided between a pool of worker processes
+    that share the edge arrays of the network. Run i uses the random
+    number generator numpy.random.RandomState(seed+i), so that the
+    results do not depend on the number of processes.
+
+    Parameters
+    ----------
+    net : pynet network
+        The network. Edge directions are ignored.
+    orderings : int
+        The number of random orderings.
+    evaluations : sequence of ints or None
+        The evaluation points as in getPercolationCurve.
+    nodePercolation : bool
+        If True, nodes are added instead of edges as in
+        getPercolationCurve.
+    seed : int or None
+        The seed of the first run. If None, a random seed is drawn.
+    processes : int or None
+        Number of worker processes. If None, the number of CPUs is
+        used. Platforms without fork always use a single process.
+
+    Returns
+    -------
+    mean : dict
+        The mean curve in the format of getPercolationCurve.
+    variance : dict
+        The variance of each statistic over the orderings, with the
+        same keys as mean.
+    """
+    if orderings<1:
+        raise ValueError("At least one ordering is needed.")
+    src,dest,weights,names=net.toArrays()
+    nNodes=len(names)
+    if nodePercolation:
+        evaluations=_curveEvaluations(evaluations,nNodes)
+    else:
+        evaluations=_curveEvaluations(evaluations,len(src))
+    if seed is None:
+        seed=numpy.random.randint(2**31)
+
+    results=netext._mapSources(_ensembleRuns,numpy.arange(orderings),processes,
+                               nNodes=nNodes,src=src,dest=dest,evaluations=evaluations,
+                               nodePercolation=nodePercolation,seed=seed)
+
+    # Combine the chunks with the pairwise update of the variance.
+    count,mean,squares=results[0]
+    for chunkCount,chunkMean,chunkSquares in results[1:]:
+        total=count+chunkCount
+        delta=chunkMean-mean
+        mean=mean+delta*chunkCount/float(total)
+        squares=squares+chunkSquares+delta*delta*count*chunkCount/float(total)
+        count=total
+
+    meanCurve,varianceCurve={"added":evaluations},{"added":evaluations}
+    for name,values,sumOfSquares in zip(curveStatistics,mean,squares):
+        meanCurve[name]=values
+        varianceCurve[name]=sumOfSquares/count
+    return meanCurve,varianceCurve
+
 def getKCliqueComponents(net,k):
     """
     Returns community structure calculated with unweighted k-clique percolation.
@@ -502,15 +1127,7 @@ def getKCliqueComponents(net,k):
     >>> getKCliqueComponents(n,5).getSizeDist()=={5: 36, 6: 9, 7: 4, 8: 2}
     True
     """
-    def evaluateAtEnd(edges):
-        for edge in edges:
-            yield edge
-        yield EvaluationEvent()
-    edgesAndEvaluations=evaluateAtEnd(net.edges)
-
-    kcliques=kcliquesByEdges(edgesAndEvaluations,k) #unweighted clique percolation        
-    for community in communitiesByKCliques(kcliques):
-        return community
+    return getMultiKCliqueComponents(net,[k])[k]
 
 
 class KClique(object):
@@ -566,6 +1183,159 @@ class EvaluationEvent:
         self.threshold=threshold
         self.addedElements=addedElements
 
+def _degeneracyOrder(nNodes,src,dest):
+    """
+    Returns the nodes in smallest-last (degeneracy) order, found with
+    the bucket algorithm of Batagelj and Zaversnik. Every node has at
+    most d neighbors later in the order, where d is the degeneracy of
+    the network.
+    """
+    indptr,indices,weights=pynet._buildCSR(nNodes,numpy.concatenate((src,dest)),
+                                           numpy.concatenate((dest,src)),
+                                           numpy.ones(2*len(src)))
+    degree=numpy.diff(indptr)
+    # Nodes sorted by degree, and the start of each degree in the order.
+    vert=numpy.argsort(degree,kind="mergesort")
+    pos=numpy.empty(nNodes,dtype=numpy.int64)
+    pos[vert]=numpy.arange(nNodes)
+    bin=numpy.searchsorted(degree[vert],numpy.arange(degree.max()+1 if nNodes>0 else 1))
+    degree,vert,pos,bin=degree.tolist(),vert.tolist(),pos.tolist(),bin.tolist()
+    indptr,indices=indptr.tolist(),indices.tolist()
+    for i in xrange(nNodes):
+        v=vert[i]
+        dv=degree[v]
+        for u in indices[indptr[v]:indptr[v+1]]:
+            du=degree[u]
+            if du>dv:
+                # Move u to the start of its bucket and shrink the bucket.
+                pu,pw=pos[u],bin[du]
+                w=vert[pw]
+                if u!=w:
+                    pos[u],pos[w]=pw,pu
+                    vert[pu],vert[pw]=w,u
+                bin[du]+=1
+                degree[u]=du-1
+    return numpy.array(vert,dtype=numpy.int64)
+
+def _iterKCliqueChunks(nNodes,src,dest,k,chunkSize=2**18):
+    """
+    Yields all k-cliques of an undirected network given as edge
+    arrays in chunks of integer arrays of shape (n,k). Each row holds
+    the node indices of one clique in increasing order.
+    """
+    for size,chunk in _iterCliqueLevels(nNodes,src,dest,[k],chunkSize):
+        yield chunk
+
+def _iterCliqueLevels(nNodes,src,dest,sizes,chunkSize=2**18):
+    """
+    Yields (k,chunk) for the cliques of all sizes k in sizes, where
+    chunk is an integer array with the node indices of one k-clique
+    in increasing order on each row. The cliques of each size are
+    grown from the cliques of the previous size, so all sizes are
+    found in a single pass.
+
+    The edges are oriented from earlier to later nodes in the
+    degeneracy order. A clique is grown from its first node by adding
+    out-neighbors of its last node, which are checked against the
+    other nodes of the clique with a binary search in the sorted
+    array of oriented edges.
+    """
+    sizes=set(sizes)
+    if 1 in sizes:
+        yield 1,numpy.arange(nNodes,dtype=numpy.int64).reshape(-1,1)
+    kMax=max(sizes)
+    if kMax<2:
+        return
+    src=numpy.asarray(src,dtype=numpy.int64)
+    dest=numpy.asarray(dest,dtype=numpy.int64)
+    nodeAtRank=_degeneracyOrder(nNodes,src,dest)
+    rank=numpy.empty(nNodes,dtype=numpy.int64)
+    rank[nodeAtRank]=numpy.arange(nNodes)
+
+    # Oriented edges in rank space, without duplicates.
+    lo=numpy.minimum(rank[src],rank[dest])
+    hi=numpy.maximum(rank[src],rank[dest])
+    keys=numpy.unique(lo*nNodes+hi)
+    lo,hi=keys//nNodes,keys%nNodes
+    outPtr=numpy.concatenate(([0],numpy.cumsum(numpy.bincount(lo,minlength=nNodes))))
+
+    def extend(cliques):
+        positions,lengths=netext._neighborPositions(outPtr,cliques[:,-1])
+        candidates=hi[positions]
+        cliques=numpy.repeat(cliques,lengths,axis=0)
+        keep=numpy.ones(len(candidates),dtype=bool)
+        for column in range(cliques.shape[1]-1):
+            wanted=cliques[:,column]*nNodes+candidates
+            found=numpy.minimum(numpy.searchsorted(keys,wanted),len(keys)-1)
+            keep&=keys[found]==wanted
+        return numpy.column_stack((cliques[keep],candidates[keep]))
+
+    def grow(cliques):
+        k=cliques.shape[1]
+        if k in sizes and len(cliques)>0:
+            yield k,numpy.sort(nodeAtRank[cliques],axis=1)
+        if k==kMax:
+            return
+        # The cliques are extended in chunks so that the arrays of
+        # candidates stay small.
+        cumulative=numpy.cumsum(numpy.diff(outPtr)[cliques[:,-1]])
+        start=0
+        while start<len(cliques):
+            offset=cumulative[start-1] if start>0 else 0
+            end=max(numpy.searchsorted(cumulative,offset+chunkSize,side="right"),start+1)
+            for level in grow(extend(cliques[start:end])):
+                yield level
+            start=end
+
+    for start in range(0,len(lo),chunkSize):
+        for level in grow(numpy.column_stack((lo[start:start+chunkSize],hi[start:start+chunkSize]))):
+            yield level
+
+def kcliqueArrays(net,k):
+    """
+    Finds all k-cliques of a network.
+
+    Parameters
+    ----------
+    net : pynet network
+        The network. Edge directions are ignored.
+    k : int, >= 1
+        The number of nodes in the cliques.
+
+    Returns
+    -------
+    cliques : numpy.ndarray
+        Integer array of shape (number of k-cliques, k). Each row
+        holds the indices of the nodes of one clique in names, in
+        increasing order.
+    names : numpy.ndarray
+        The node names as returned by net.toArrays().
+
+    Examples
+    --------
+    >>> net=pynet.SymmNet()
+    >>> net[0,1]=net[1,2]=net[2,0]=net[2,3]=1
+    >>> cliques,names=kcliqueArrays(net,3)
+    >>> names[cliques].tolist()
+    [[0, 1, 2]]
+    """
+    if k<1:
+        raise ValueError("k must be at least 1.")
+    src,dest,weights,names=net.toArrays()
+    return _kcliqueIndexArray(len(names),src,dest,k),names
+
+def _kcliqueIndexArray(nNodes,src,dest,k):
+    """Returns the k-cliques of _iterKCliqueChunks as a single array."""
+    chunks=list(_iterKCliqueChunks(nNodes,src,dest,k))
+    if len(chunks)==0:
+        return numpy.zeros((0,k),dtype=numpy.int64)
+    return numpy.concatenate(chunks)
+
+def _kcliqueObjects(cliques,names):
+    """Yields the rows of a clique array as KClique objects."""
+    for row in names[cliques].tolist():
+        yield KClique(row)
+
 def kcliquesAtSubnet(nodes,net,k):
     """List all k-cliques in a subnet of `net` induced by `nodes`.
 
@@ -653,28 +1423,193 @@ def kcliquesByEdges(edges, k):
             # Finally we add the new edge to the network.
             newNet[edge[0],edge[1]] = edge[2] 
 
+def _cliqueFormationOrder(nNodes,src,dest,k):
+    """
+    Finds the k-cliques of the edges (src[i],dest[i]) and sorts them
+    by the position of their last edge in this order. Returns the
+    sorted cliques and, for each number of added edges, the number of
+    cliques formed by them.
+    """
+    # The position of the first occurrence of each undirected edge.
+    keys=numpy.minimum(src,dest)*nNodes+numpy.maximum(src,dest)
+    keyOrder=numpy.argsort(keys,kind="mergesort")
+    sortedKeys=keys[keyOrder]
+
+    cliques=_kcliqueIndexArray(nNodes,src,dest,k)
+    formation=numpy.zeros(len(cliques),dtype=numpy.int64)
+    for i in range(k):
+        for j in range(i+1,k):
+            edgeIndex=keyOrder[numpy.searchsorted(sortedKeys,cliques[:,i]*nNodes+cliques[:,j])]
+            formation=numpy.maximum(formation,edgeIndex)
+    order=numpy.argsort(formation,kind="mergesort")
+    ends=numpy.searchsorted(formation[order],numpy.arange(1,len(src)+1))
+    return cliques[order],ends
+
+def _internSubcliques(cliques,nNodes):
+    """
+    Gives dense integer IDs to the (k-1)-cliques of the k-cliques in
+    the rows of cliques, in the order of their first appearance.
+
+    Returns
+    -------
+    ids : numpy.ndarray
+        Array of shape (number of k-cliques, k), where ids[i,j] is the
+        ID of clique i without its node in column j.
+    subcliques : numpy.ndarray
+        Array of shape (number of (k-1)-cliques, k-1) with the nodes of
+        each (k-1)-clique.
+    """
+    nCliques,k=cliques.shape
+    subcliques=numpy.empty((nCliques,k,k-1),dtype=cliques.dtype)
+    for column in range(k):
+        subcliques[:,column,:]=numpy.delete(cliques,column,axis=1)
+    subcliques=subcliques.reshape(nCliques*k,k-1)
+    if float(max(nNodes,1))**(k-1)<2**63:
+        # The node indices are packed into a single integer.
+        keys=numpy.zeros(len(subcliques),dtype=numpy.int64)
+        for column in range(k-1):
+            keys=keys*nNodes+subcliques[:,column]
+    else:
+        rows=numpy.ascontiguousarray(subcliques)
+        keys=rows.view(numpy.dtype((numpy.void,rows.dtype.itemsize*(k-1)))).ravel()
+    keys,first,inverse=numpy.unique(keys,return_index=True,return_inverse=True)
+    order=numpy.argsort(first)
+    newIds=numpy.empty(len(order),dtype=numpy.int64)
+    newIds[order]=numpy.arange(len(order))
+    return newIds[inverse].reshape(nCliques,k),subcliques[first[order]]
+
+def _mergeKCliques(ktree,ids):
+    """
+    Merges the sets of the (k-1)-cliques of each k-clique in ktree,
+    given the (k-1)-clique IDs with one row for each k-clique.
+    """
+    if len(ids)>0:
+        k=ids.shape[1]
+        ktree.setSize(max(ktree.size,int(ids.max())+1))
+        ktree.mergeMany(numpy.repeat(ids[:,0],k-1),ids[:,1:].ravel())
+
+def _subcliqueCommunities(ktree,subcliques,names,event,itemNumber):
+    """
+    Returns the communities of the nodes of the (k-1)-cliques in
+    ktree as a NodeCover with the attributes of the EvaluationEvent.
+    """
+    roots=ktree.getSetIndices().astype(numpy.int64)
+    nNodes=len(names)
+    keys=numpy.unique(numpy.repeat(roots,subcliques.shape[1])*nNodes+subcliques[:len(roots)].ravel())
+    roots,nodes=keys//nNodes,keys%nNodes
+    starts=numpy.flatnonzero(roots[1:]!=roots[:-1])+1
+    if len(nodes)>0:
+        offsets=numpy.concatenate(([0],starts,[len(nodes)]))
+    else:
+        offsets=numpy.zeros(1,dtype=numpy.int64)
+    communityStructure=communities.NodeCover.fromArrays(numpy.asarray(names)[nodes],offsets)
+    communityStructure.threshold=event.threshold
+    communityStructure.numberOfEdges=event.addedElements
+    communityStructure.numberOfKCliques=itemNumber
+    return communityStructure
+
+def _communitiesByElements(elementsAndEvaluations,ends,cliques,names):
+    """
+    Does the same as communitiesByKCliques for the k-cliques in the
+    rows of cliques, with the (k-1)-cliques given integer IDs.
+
+    The elements (edges or cliques) in elementsAndEvaluations are
+    only counted: after i+1 elements the first ends[i] cliques are
+    added. The EvaluationEvents give the evaluation points.
+    """
+    ids,subcliques=_internSubcliques(cliques,len(names))
+    ktree=KtreeArray(0)
+    merged,added,events=0,0,0
+    for element in elementsAndEvaluations:
+        if isinstance(element,EvaluationEvent):
+            position=ends[added-1] if added>0 else 0
+            _mergeKCliques(ktree,ids[merged:position])
+            merged=position
+            events+=1
+            # Numbered like the items of a stream of cliques and events.
+            yield _subcliqueCommunities(ktree,subcliques,names,element,position+events)
+        else:
+            added+=1
+
+def _cliqueIntensities(cliques,src,dest,weights,names,symmetric):
+    """
+    Returns the intensities of the cliques in the rows of cliques,
+    computed as in getIntensity: the product of the weights over both
+    directions of the edges, taken in the order of the node names, to
+    the power 1/(k*((k-1)/2)) with integer division.
+    """
+    nNodes,k=len(names),cliques.shape[1]
+    keys=src*nNodes+dest
+    if symmetric:
+        keys=numpy.concatenate((keys,dest*nNodes+src))
+        weights=numpy.concatenate((weights,weights))
+    keyOrder=numpy.argsort(keys)
+    keys,weights=keys[keyOrder],weights[keyOrder]
+
+    # The columns are ordered by node names like the nodes of KClique.
+    nameRank=numpy.empty(nNodes,dtype=numpy.int64)
+    nameRank[sorted(range(nNodes),key=names.__getitem__)]=numpy.arange(nNodes)
+    columns=numpy.argsort(nameRank[cliques],axis=1)
+    cliques=cliques[numpy.arange(len(cliques))[:,None],columns]
+
+    intensity=numpy.ones(len(cliques))
+    for i in range(k):
+        for j in range(k):
+            if i!=j:
+                wanted=cliques[:,i]*nNodes+cliques[:,j]
+                found=numpy.minimum(numpy.searchsorted(keys,wanted),max(len(keys)-1,0))
+                intensity*=numpy.where(keys[found]==wanted,weights[found],0)
+    return numpy.power(intensity,1.0/float(k*((k-1)//2)))
+
 def kcliquesWeight(net,k,weightFunction):
-    kcliques=list(kcliquesByEdges(net.edges,k))
+    kcliques=list(_kcliqueObjects(*kcliqueArrays(net,k)))
     kcliques.sort(lambda x,y: cmp(weightFunction(x,net),weightFunction(y,net)))
     return kcliques
     #for kclique in kcliques:
     #    yield kclique
 
 def communitiesByKCliques(kcliques):
-    # Calculate the neighboring relations
-    krTree=Ktree()
+    """
+    Generates k-clique communities from a sequence of k-cliques.
+
+    The (k-1)-cliques of the k-cliques are given dense integer IDs
+    through a table keyed by tuples of node indices, and the
+    communities of the (k-1)-cliques are kept in a KtreeArray.
+
+    Parameters
+    ----------
+    kcliques : iterable
+        KClique objects and EvaluationEvents.
+
+    Yield
+    -----
+    communityStructure : NodeCover
+        The k-clique communities at each EvaluationEvent, with the
+        attributes threshold, numberOfEdges and numberOfKCliques.
+    """
+    nodeIndex=netext.Enumerator()
+    subcliqueIndex={} #(k-1)-clique as a tuple of node indices -> ID
+    subcliques=array.array('l') #the node indices of the (k-1)-cliques
+    ids=array.array('l') #the (k-1)-clique IDs of each k-clique
+    ktree=KtreeArray(0)
+    k=0
     for kcliqueNumber,kclique in enumerate(kcliques):
         if isinstance(kclique,EvaluationEvent):
-            communityStructure=krTree.getCommStruct().getCollapsed()
-            communityStructure.threshold=kclique.threshold
-            communityStructure.numberOfEdges=kclique.addedElements
-            communityStructure.numberOfKCliques=kcliqueNumber+1
-            yield communityStructure
+            _mergeKCliques(ktree,numpy.array(ids,dtype=numpy.int64).reshape(-1,max(k,1)))
+            del ids[:]
+            subcliqueArray=numpy.array(subcliques,dtype=numpy.int64).reshape(-1,max(k-1,1))
+            names=pynet._namesToArray(nodeIndex.item)
+            yield _subcliqueCommunities(ktree,subcliqueArray,names,kclique,kcliqueNumber+1)
         else:
-            #for fewer operations at ktree, names of new cliques should be saved
-            #and given to ktree when merging the sets
-            krcliques=list(kclique.getSubcliques()) #list all k-1 cliques that are subcliques
-            krTree.mergeSetsWithElements(krcliques) #merge the sets of k-1 cliques at the list 
+            nodes=sorted(nodeIndex[node] for node in kclique)
+            k=len(nodes)
+            for i in range(k):
+                subclique=tuple(nodes[:i]+nodes[i+1:])
+                subcliqueId=subcliqueIndex.get(subclique)
+                if subcliqueId is None:
+                    subcliqueId=subcliqueIndex[subclique]=len(subcliqueIndex)
+                    subcliques.extend(subclique)
+                ids.append(subcliqueId)
 
 
 def cliquePercolator(net,k,evaluations,weightFunction="minweight",evaluationType="fraclist",reverse=False):    
@@ -733,29 +1668,88 @@ def cliquePercolator(net,k,evaluations,weightFunction="minweight",evaluationType
     -------
     Time : Number of k-cliques * k.
     Memory : For unweighted case the memory consumption is dominated by the number of (k-1)-cliques
-             in the network. For weighted case also all the k-cliques of the network are needed to be 
-             kept in the memory.
+             in the network, which are kept as rows of integer arrays. For weighted case also all the
+             k-cliques of the network are needed to be kept in the memory.
     """
 
     #TODO: add sanity checks for the parameters.
 
     #Phase I: find k-cliques
     if weightFunction=="minweight":
-        edges=list(net.edges)
-        edges.sort(lambda x, y: cmp(x[2],y[2]),reverse=reverse)
+        src,dest,weights,names=net.toArrays()
+        #the mergesort is stable like the sort of a list
+        if reverse:
+            order=numpy.argsort(-weights,kind="mergesort")
+        else:
+            order=numpy.argsort(weights,kind="mergesort")
+        src,dest,weights=src[order],dest[order],weights[order]
+        edges=zip(names[src].tolist(),names[dest].tolist(),weights.tolist())
         edgesAndEvaluations=EvaluationList(edges,evaluations=evaluations,evaluationType=evaluationType)
-        kcliques=kcliquesByEdges(edgesAndEvaluations,k) #unweighted clique percolation        
+        #unweighted clique percolation, the cliques are found by the enumerator
+        cliques,ends=_cliqueFormationOrder(len(names),src,dest,k)
+        communityStructures=_communitiesByElements(edgesAndEvaluations,ends,cliques,names)
     elif weightFunction=="intensity":
-        kcliqueList=kcliquesWeight(net,k,getIntensity)
-        kcliques=EvaluationList(kcliqueList,evaluations=evaluations,evaluationType=evaluationType,weightFunction=lambda x:getIntensity(x,net))
+        #the intensity of each clique is computed once and the cliques are sorted by it
+        src,dest,weights,names=net.toArrays()
+        cliques=_kcliqueIndexArray(len(names),src,dest,k)
+        intensities=_cliqueIntensities(cliques,src,dest,weights,names,net.isSymmetric())
+        order=numpy.argsort(intensities,kind="mergesort")
+        intensitiesAndEvaluations=EvaluationList(intensities[order],evaluations=evaluations,
+                                                 evaluationType=evaluationType,weightFunction=lambda x:x)
+        ends=numpy.arange(1,len(cliques)+1)
+        communityStructures=_communitiesByElements(intensitiesAndEvaluations,ends,cliques[order],names)
     else:
         raise Exception("No such weight function: "+str(weightFunction))
 
     #Phase II: using k-cliques, find clique communities
-    for community in communitiesByKCliques(kcliques):
+    for community in communityStructures:
         yield community
         
 
+def getMultiKCliqueComponents(net,ks):
+    """
+    Returns the communities of unweighted k-clique percolation for
+    several values of k.
+
+    The cliques of all sizes are found in a single enumeration, where
+    the cliques of each size are grown from those of the previous
+    size.
+
+    Parameters
+    ----------
+    net : A network object
+    ks : sequence of integers (larger than 1)
+        The clique sizes.
+
+    Returns
+    -------
+    A dictionary where the keys are the values of k and the values
+    are the community structures as NodeCover objects, equal to
+    getKCliqueComponents(net,k).
+    """
+    ks=sorted(set(ks))
+    if len(ks)==0:
+        return {}
+    if ks[0]<2:
+        raise ValueError("The clique sizes must be at least 2.")
+    src,dest,weights,names=net.toArrays()
+    chunks=dict((k,[]) for k in ks)
+    for k,chunk in _iterCliqueLevels(len(names),src,dest,ks):
+        chunks[k].append(chunk)
+
+    communityStructures={}
+    for k in ks:
+        if len(chunks[k])>0:
+            cliques=numpy.concatenate(chunks[k])
+        else:
+            cliques=numpy.zeros((0,k),dtype=numpy.int64)
+        del chunks[k]
+        ids,subcliques=_internSubcliques(cliques,len(names))
+        ktree=KtreeArray(0)
+        _mergeKCliques(ktree,ids)
+        communityStructures[k]=_subcliqueCommunities(ktree,subcliques,names,EvaluationEvent(),len(cliques)+1)
+    return communityStructures
+
 def getKCliqueBipartiteNet(net,k):
     """
     Returns a bipartite network where to partitions are k-cliques and 
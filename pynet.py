@@ -45,6 +45,47 @@ class VirtualNet(object):
 		self._setEdge(self._nodes[key[0]],self._nodes[key[1]],val)
 		return val
 
+	def addEdges(self,edges,accumulate=False):
+		"""
+		Adds a large number of edges to the network at once.
+
+		Parameters
+		----------
+		edges : iterable or a tuple of three numpy arrays
+			Either an iterable of (node1, node2, weight) triplets or
+			three numpy arrays (node1s, node2s, weights) of equal length.
+		accumulate : bool
+			If True, the weights are added to the current weights of
+			the edges, and edges listed multiple times get the sum of
+			the weights. Otherwise the weights replace the current
+			ones and the last one of repeated edges is used.
+		"""
+		if (isinstance(edges,(tuple,list)) and len(edges)==3
+		    and all(map(lambda x:isinstance(x,numpy.ndarray),edges))):
+			srcNames,destNames,weights=edges[0].tolist(),edges[1].tolist(),edges[2]
+		else:
+			srcNames,destNames,weights=[],[],[]
+			for edge in edges:
+				srcNames.append(edge[0])
+				destNames.append(edge[1])
+				weights.append(edge[2])
+		if len(srcNames)!=len(destNames) or len(srcNames)!=len(weights):
+			raise ValueError("The edge arrays must be of equal length.")
+
+		#name -> index, adding the new nodes on the way
+		nodes=self._nodes
+		def getIndex(nodeName):
+			try:
+				return nodes[nodeName]
+			except KeyError:
+				self.addNode(nodeName)
+				return nodes[nodeName]
+		src=numpy.array(map(getIndex,srcNames),dtype='int64')
+		dest=numpy.array(map(getIndex,destNames),dtype='int64')
+		assert not (src==dest).any(), "No self-edges."
+
+		self._setEdgesBulk(src,dest,numpy.asarray(weights,dtype='float'),accumulate)
+
 	def __delitem__(self,args):
 		if isinstance(args, tuple):
 			if len(args) != 2:
@@ -117,6 +158,90 @@ class VirtualNet(object):
 	def isSymmetric(self):
 		return self.symmetric
 
+	def freeze(self):
+		"""
+		Returns a read-only copy of the network stored in compressed
+		sparse row format (CSRSymmNet or CSRDirNet). The nodes of the
+		frozen network are indexed densely from 0 to len(net)-1.
+		"""
+		names,src,dest,weights=self._compactEdgeArrays()
+		if self.symmetric:
+			return CSRSymmNet._fromIndexArrays(names,src,dest,weights)
+		else:
+			return CSRDirNet._fromIndexArrays(names,src,dest,weights)
+
+	def toArrays(self):
+		"""
+		Returns the edges of the network as numpy arrays.
+
+		Returns
+		-------
+		src : numpy.ndarray
+		    Indices of the source nodes in names.
+		dest : numpy.ndarray
+		    Indices of the destination nodes in names.
+		weights : numpy.ndarray
+		    Edge weights.
+		names : numpy.ndarray
+		    Names of all nodes, including the ones without edges. The
+		    array is of integer type if all names are integers and of
+		    object type otherwise.
+
+		For symmetric networks each edge is listed only once. The
+		arrays can be given to fromArrays to recreate the network.
+		"""
+		names,src,dest,weights=self._compactEdgeArrays()
+		return src,dest,weights,_namesToArray(names)
+
+	def _edgeArrays(self):
+		"""
+		Returns the edges as three numpy arrays (source indices,
+		destination indices, weights) using the backend indices.
+		For symmetric networks each edge is listed only once.
+		Backends can override this with a faster implementation.
+		"""
+		src,dest,weights=[],[],[]
+		for nodeIndex in self._nodes.itervalues():
+			for neighIndex in self._iterNodeOut(nodeIndex):
+				if not self.symmetric or nodeIndex<neighIndex:
+					src.append(nodeIndex)
+					dest.append(neighIndex)
+					weights.append(self._getEdge(nodeIndex,neighIndex))
+		return (numpy.array(src,dtype='int64'),numpy.array(dest,dtype='int64'),
+			numpy.array(weights,dtype='float'))
+
+	def _compactEdgeArrays(self):
+		"""
+		Same as _edgeArrays, but the indices are renumbered to run from
+		0 to len(net)-1 and the list of node names in that order is
+		returned as the first element.
+		"""
+		src,dest,weights=self._edgeArrays()
+		liveIndices=sorted(self._nodes.itervalues())
+		names=[self._indexToName[index] for index in liveIndices]
+		if len(liveIndices)!=len(self._indexToName):
+			newIndex=numpy.zeros(len(self._indexToName),dtype='int64')
+			newIndex[liveIndices]=numpy.arange(len(liveIndices))
+			src,dest=newIndex[src],newIndex[dest]
+		return names,src,dest,weights
+
+	def neighborsArray(self,nodeName):
+		"""
+		Returns the names of the neighbors of a node as a numpy array,
+		in the same order as iterating over net[nodeName].
+		"""
+		neighbors=self._neighborIndexArray(self._nodes[nodeName])
+		return _namesToArray([self._indexToName[index] for index in neighbors.tolist()])
+
+	def weightsArray(self,nodeName):
+		"""
+		Returns the weights of the edges of a node as a numpy array,
+		in the same order as neighborsArray(nodeName). For directed
+		networks the weights of the edges in both directions are summed.
+		"""
+		nodeIndex=self._nodes[nodeName]
+		return self._weightIndexArray(nodeIndex,self._neighborIndexArray(nodeIndex))
+
 	def deg(self,nodeName):
 		return self._degIndex(self._nodes[nodeName])
 
@@ -151,7 +276,48 @@ class VirtualNet(object):
 		raise NotImplemented
 	def _iterNode(self,nodeIndex):
 		raise NotImplemented
-	
+
+	#--- Virtual functions that can be overridden for speed
+	def _neighborIndexArray(self,nodeIndex):
+		"""
+		Returns the backend indices of the neighbors of a node as an
+		array, in the same order as _iterNode.
+		"""
+		return numpy.fromiter(self._iterNode(nodeIndex),dtype='int64')
+	def _weightIndexArray(self,nodeIndex,neighbors):
+		"""
+		Returns the weights of the edges between a node and the given
+		neighbor indices as an array.
+		"""
+		neighbors=neighbors.tolist()
+		weights=numpy.array([self._getEdge(nodeIndex,neigh) for neigh in neighbors],dtype='float')
+		if not self.symmetric:
+			weights+=numpy.array([self._getEdge(neigh,nodeIndex) for neigh in neighbors],dtype='float')
+		return weights
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		"""
+		Sets the weights of edges given as arrays of backend indices.
+		"""
+		if accumulate:
+			for s,d,w in itertools.izip(src.tolist(),dest.tolist(),weights.tolist()):
+				self._setEdge(s,d,self._getEdge(s,d)+w)
+		else:
+			for s,d,w in itertools.izip(src.tolist(),dest.tolist(),weights.tolist()):
+				self._setEdge(s,d,w)
+
+
+def _namesToArray(names):
+	"""
+	Converts a list of node names to a numpy array. Integer names
+	give an integer array and all other names an object array.
+	"""
+	if all(isinstance(name,(int,long)) for name in names):
+		return numpy.array(names,dtype='int64')
+	array=numpy.empty(len(names),dtype=object)
+	for i,name in enumerate(names):
+		array[i]=name
+	return array
+
 
 class Node(object):
 	def __init__(self,net,name):
@@ -252,6 +418,31 @@ class DictSymmNet(VirtualNet):
 			self._nodeList[dest][src]=val
 	def _iterNode(self,nodeIndex):
 		return self._nodeList[nodeIndex].iterkeys()
+	def _edgeArrays(self):
+		src,dest,weights=[],[],[]
+		for nodeIndex,edges in enumerate(self._nodeList):
+			for neigh,w in edges.iteritems():
+				if nodeIndex<neigh:
+					src.append(nodeIndex)
+					dest.append(neigh)
+					weights.append(w)
+		return (numpy.array(src,dtype='int64'),numpy.array(dest,dtype='int64'),
+			numpy.array(weights,dtype='float'))
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		if len(src)==0:
+			return
+		while len(self._nodeList)<=max(src.max(),dest.max()):
+			self._addNode()
+		nodeList=self._nodeList
+		for s,d,w in itertools.izip(src.tolist(),dest.tolist(),weights.tolist()):
+			if accumulate:
+				w+=nodeList[s].get(d,0)
+			if w==0:
+				nodeList[s].pop(d,None)
+				nodeList[d].pop(s,None)
+			else:
+				nodeList[s][d]=w
+				nodeList[d][s]=w
 
 class DictDirNet(VirtualDirNet):
 	def __init__(self,sizeLimit=0):
@@ -309,6 +500,36 @@ class DictDirNet(VirtualDirNet):
 		return self._backNodeList[nodeIndex].iterkeys()
 	def _iterNodeOut(self,nodeIndex):
 		return self._nodeList[nodeIndex].iterkeys()
+	def _edgeArrays(self):
+		src,dest,weights=[],[],[]
+		for nodeIndex,edges in enumerate(self._nodeList):
+			src.extend([nodeIndex]*len(edges))
+			dest.extend(edges.iterkeys())
+			weights.extend(edges.itervalues())
+		return (numpy.array(src,dtype='int64'),numpy.array(dest,dtype='int64'),
+			numpy.array(weights,dtype='float'))
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		if len(src)==0:
+			return
+		while len(self._nodeList)<=max(src.max(),dest.max()):
+			self._addNode()
+		nodeList,backNodeList,totalDeg=self._nodeList,self._backNodeList,self._totalDeg
+		for s,d,w in itertools.izip(src.tolist(),dest.tolist(),weights.tolist()):
+			if accumulate:
+				w+=nodeList[s].get(d,0)
+			if w==0:
+				if d in nodeList[s]:
+					if not s in nodeList[d]:
+						totalDeg[s]+=-1
+						totalDeg[d]+=-1
+					del nodeList[s][d]
+					del backNodeList[d][s]
+			else:
+				if not d in nodeList[s] and not s in nodeList[d]:
+					totalDeg[s]+=1
+					totalDeg[d]+=1
+				nodeList[s][d]=w
+				backNodeList[d][s]=1
 
 	def _inDegIndex(self,nodeIndex):
 		return len(self._backNodeList[nodeIndex])
@@ -317,104 +538,308 @@ class DictDirNet(VirtualDirNet):
 
 
 
+def _csrGetEdge(matrix,src,dest):
+	"""
+	Returns the element (src,dest) of a csr matrix with sorted indices.
+	Rows outside the matrix are considered empty.
+	"""
+	if src>=matrix.shape[0]:
+		return 0.0
+	start,end=matrix.indptr[src],matrix.indptr[src+1]
+	pos=start+numpy.searchsorted(matrix.indices[start:end],dest)
+	if pos<end and matrix.indices[pos]==dest:
+		return float(matrix.data[pos])
+	else:
+		return 0.0
+
+def _csrRow(matrix,nodeIndex):
+	"""
+	Returns the column indices of the nonzero elements in a row as a list.
+	"""
+	if nodeIndex>=matrix.shape[0]:
+		return []
+	return matrix.indices[matrix.indptr[nodeIndex]:matrix.indptr[nodeIndex+1]].tolist()
+
+def _csrMerge(matrix,size,rows,cols,vals):
+	"""
+	Returns a new size x size csr matrix where the elements (rows,cols)
+	of the old matrix are replaced with vals. Each element should be
+	given only once. Zero elements are not stored.
+	"""
+	old=matrix.tocoo()
+	oldKeys=old.row.astype('int64')*size+old.col
+	newKeys=rows*size+cols
+	keep=numpy.logical_not(numpy.in1d(oldKeys,newKeys))
+	rows=numpy.concatenate((old.row[keep],rows))
+	cols=numpy.concatenate((old.col[keep],cols))
+	vals=numpy.concatenate((old.data[keep],vals))
+	nonzero=vals!=0
+	newMatrix=scipy.sparse.csr_matrix((vals[nonzero],(rows[nonzero],cols[nonzero])),shape=(size,size),dtype='float')
+	newMatrix.sort_indices()
+	return newMatrix
+
+def _csrBulkValues(matrix,size,src,dest,weights,accumulate):
+	"""
+	Returns the edges (src,dest) with the new values as unique
+	elements that can be given to _csrMerge.
+	"""
+	keys=src*size+dest
+	if accumulate:
+		keys,inverse=numpy.unique(keys,return_inverse=True)
+		weights=numpy.bincount(inverse,weights=weights)
+		#add the current values
+		current=matrix.tocoo()
+		currentKeys=current.row.astype('int64')*size+current.col
+		if len(currentKeys)>0:
+			pos=numpy.searchsorted(currentKeys,keys)
+			pos[pos==len(currentKeys)]=0
+			found=currentKeys[pos]==keys
+			weights[found]+=current.data[pos[found]]
+	else:
+		#the last occurrence of each edge is used
+		keys,lastIndex=numpy.unique(keys[::-1],return_index=True)
+		weights=weights[::-1][lastIndex]
+	return keys//size,keys%size,weights
+
+def _iterStagedRow(matrixNeighbors,stagedRow):
+	for neigh in matrixNeighbors:
+		if neigh not in stagedRow:
+			yield neigh
+	for neigh,val in stagedRow.iteritems():
+		if val!=0:
+			yield neigh
+
 class ScipySparseSymmNet(VirtualNet):
+	"""
+	Symmetric network stored in a single scipy.sparse csr matrix. Edges
+	changed one by one are first kept in a small staging dictionary,
+	which is merged to the matrix when it grows large enough.
+	"""
+	minStaged=2**16 #edges are staged at least this many before merging
 	def __init__(self,sizeLimit=0):
 		VirtualNet.__init__(self,sizeLimit=sizeLimit)
-		self._nodeList=[]
+		self._size=0
+		self._matrix=scipy.sparse.csr_matrix((0,0),dtype='float')
+		self._staged={} #row -> {column: value}, value 0 for removed edges
+		self._nStaged=0
+		self._degree=[]
 	def _addNode(self):
-		newNode=scipy.sparse.dok_matrix((10**10,1),dtype='float')
-		self._nodeList.append(newNode)
+		self._size+=1
+		self._degree.append(0)
+
+	def _stage(self,src,dest,val):
+		stagedRow=self._staged.get(src)
+		if stagedRow is None:
+			stagedRow=self._staged[src]={}
+		if dest not in stagedRow:
+			self._nStaged+=1
+		stagedRow[dest]=val
+
+	def _compact(self):
+		"""
+		Merges the staged edges to the matrix.
+		"""
+		if self._nStaged==0 and self._matrix.shape[0]==self._size:
+			return
+		rows,cols,vals=[],[],[]
+		for src,stagedRow in self._staged.iteritems():
+			rows.extend([src]*len(stagedRow))
+			cols.extend(stagedRow.iterkeys())
+			vals.extend(stagedRow.itervalues())
+		self._matrix=_csrMerge(self._matrix,self._size,numpy.array(rows,dtype='int64'),
+				       numpy.array(cols,dtype='int64'),numpy.array(vals,dtype='float'))
+		self._staged={}
+		self._nStaged=0
 
 	#--- Methods used by VirtualNet:
 	def _degIndex(self,nodeIndex):
-		return len(self._nodeList[nodeIndex])
+		return self._degree[nodeIndex]
 	def _getEdge(self,src,dest):
-		return self._nodeList[src][dest,0]
+		stagedRow=self._staged.get(src)
+		if stagedRow is not None and dest in stagedRow:
+			return stagedRow[dest]
+		return _csrGetEdge(self._matrix,src,dest)
 	def _setEdge(self,src,dest,val):
-		nNodes=len(self._nodeList)
-		while nNodes<=src or nNodes<=dest:
+		while self._size<=src or self._size<=dest:
 			self._addNode()
-			nNodes+=1
-		if val==0:
-			try:
-				del self._nodeList[src][dest,0]
-			except KeyError:
-				pass
-			try:
-				del self._nodeList[dest][src,0]
-			except KeyError:
-				pass
-		else:
-			self._nodeList[src][dest,0]=val
-			self._nodeList[dest][src,0]=val
+		old=self._getEdge(src,dest)
+		if val==0 and old!=0:
+			self._degree[src]+=-1
+			self._degree[dest]+=-1
+		elif val!=0 and old==0:
+			self._degree[src]+=1
+			self._degree[dest]+=1
+		self._stage(src,dest,val)
+		self._stage(dest,src,val)
+		if self._nStaged>max(self.minStaged,self._matrix.nnz/4):
+			self._compact()
 	def _iterNode(self,nodeIndex):
-		return itertools.imap(lambda x:x[0],self._nodeList[nodeIndex].iterkeys())
+		matrixNeighbors=_csrRow(self._matrix,nodeIndex)
+		stagedRow=self._staged.get(nodeIndex)
+		if stagedRow is None:
+			return iter(matrixNeighbors)
+		return _iterStagedRow(matrixNeighbors,stagedRow)
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		self._compact()
+		low,high=numpy.minimum(src,dest),numpy.maximum(src,dest)
+		low,high,weights=_csrBulkValues(self._matrix,self._size,low,high,weights,accumulate)
+		self._matrix=_csrMerge(self._matrix,self._size,numpy.concatenate((low,high)),
+				       numpy.concatenate((high,low)),numpy.concatenate((weights,weights)))
+		self._degree=numpy.diff(self._matrix.indptr).tolist()
+	def _edgeArrays(self):
+		self._compact()
+		edges=self._matrix.tocoo()
+		mask=edges.row<edges.col
+		return (edges.row[mask].astype('int64'),edges.col[mask].astype('int64'),
+			edges.data[mask].astype('float'))
 
 
 class ScipySparseDirNet(VirtualDirNet):
+	"""
+	Directed network stored in a single scipy.sparse csr matrix. The
+	transpose of the matrix is kept for the incoming edges. Edges
+	changed one by one are first kept in small staging dictionaries,
+	which are merged to the matrices when they grow large enough.
+	"""
+	minStaged=2**16 #edges are staged at least this many before merging
 	def __init__(self,sizeLimit=0):
 		VirtualNet.__init__(self,sizeLimit=sizeLimit)
-		self._nodeList=[] #directed edges and weights
-		self._backNodeList=[] #reversed directed edges 
+		self._size=0
+		self._matrix=scipy.sparse.csr_matrix((0,0),dtype='float') #directed edges and weights
+		self._inMatrix=scipy.sparse.csr_matrix((0,0),dtype='float') #reversed directed edges
+		self._staged={} #src -> {dest: value}, value 0 for removed edges
+		self._stagedIn={} #dest -> {src: value}
+		self._nStaged=0
 		self._totalDeg=[] #total degree of nodes
+		self._inDeg=[]
+		self._outDeg=[]
 	def _addNode(self):
-		newNode=scipy.sparse.dok_matrix((10**10,1),dtype='float')
-		self._nodeList.append(newNode)
-		newBackNode=scipy.sparse.dok_matrix((10**10,1),dtype='bool')
-		self._backNodeList.append(newBackNode)
+		self._size+=1
 		self._totalDeg.append(0)
+		self._inDeg.append(0)
+		self._outDeg.append(0)
+
+	def _stage(self,src,dest,val):
+		stagedRow=self._staged.get(src)
+		if stagedRow is None:
+			stagedRow=self._staged[src]={}
+		if dest not in stagedRow:
+			self._nStaged+=1
+		stagedRow[dest]=val
+		stagedRow=self._stagedIn.get(dest)
+		if stagedRow is None:
+			stagedRow=self._stagedIn[dest]={}
+		stagedRow[src]=val
+
+	def _compact(self):
+		"""
+		Merges the staged edges to the matrices.
+		"""
+		if self._nStaged==0 and self._matrix.shape[0]==self._size:
+			return
+		rows,cols,vals=[],[],[]
+		for src,stagedRow in self._staged.iteritems():
+			rows.extend([src]*len(stagedRow))
+			cols.extend(stagedRow.iterkeys())
+			vals.extend(stagedRow.itervalues())
+		self._matrix=_csrMerge(self._matrix,self._size,numpy.array(rows,dtype='int64'),
+				       numpy.array(cols,dtype='int64'),numpy.array(vals,dtype='float'))
+		self._inMatrix=self._matrix.T.tocsr()
+		self._inMatrix.sort_indices()
+		self._staged={}
+		self._stagedIn={}
+		self._nStaged=0
 
 	#--- Methods used by VirtualDirNet:
 	def _degIndex(self,nodeIndex):
 		return self._totalDeg[nodeIndex]
 	def _getEdge(self,src,dest):
-		return self._nodeList[src][dest,0]
+		stagedRow=self._staged.get(src)
+		if stagedRow is not None and dest in stagedRow:
+			return stagedRow[dest]
+		return _csrGetEdge(self._matrix,src,dest)
 	def _setEdge(self,src,dest,val):
-		nNodes=len(self._nodeList)
-		if src>=nNodes: 
+		while self._size<=src or self._size<=dest:
 			self._addNode()
-		if dest>=nNodes: 
-			self._addNode()
-		if val==0: #removing an edge
-			#nothing happens if the link does not exist:
-			if (dest,0) in self._nodeList[src]:
-				if not (src,0) in self._nodeList[dest]:
-					self._totalDeg[src]+=-1
-					self._totalDeg[dest]+=-1
-				self._nodeList[src][dest,0]=0
-				self._backNodeList[dest][src,0]=0
-		else:
-			if not (dest,0) in self._nodeList[src] and not (src,0) in self._nodeList[dest]:
-				self._totalDeg[src]+=1
-				self._totalDeg[dest]+=1
-
-			self._nodeList[src][dest,0]=val
-			self._backNodeList[dest][src,0]=1
-
+		old=self._getEdge(src,dest)
+		if (val==0) != (old==0):
+			if val==0:
+				change=-1
+			else:
+				change=1
+			self._outDeg[src]+=change
+			self._inDeg[dest]+=change
+			if self._getEdge(dest,src)==0:
+				self._totalDeg[src]+=change
+				self._totalDeg[dest]+=change
+		self._stage(src,dest,val)
+		if self._nStaged>max(self.minStaged,self._matrix.nnz/4):
+			self._compact()
 
 	def _iterNode(self,nodeIndex):
 		#First iter through all outgoing neighbors:
-		for neigh in self._nodeList[nodeIndex].iterkeys():
-			yield neigh[0]
+		outNeighbors=[]
+		for neigh in self._iterNodeOut(nodeIndex):
+			outNeighbors.append(neigh)
+			yield neigh
 		#Then iter through only incoming neighbors
-		for neigh in self._backNodeList[nodeIndex].iterkeys():
-			if not neigh in self._nodeList[nodeIndex]:
-				yield neigh[0]
+		outNeighbors=set(outNeighbors)
+		for neigh in self._iterNodeIn(nodeIndex):
+			if not neigh in outNeighbors:
+				yield neigh
 	def _iterNodeIn(self,nodeIndex):
-		return itertools.imap(lambda x:x[0],self._backNodeList[nodeIndex].iterkeys())
+		matrixNeighbors=_csrRow(self._inMatrix,nodeIndex)
+		stagedRow=self._stagedIn.get(nodeIndex)
+		if stagedRow is None:
+			return iter(matrixNeighbors)
+		return _iterStagedRow(matrixNeighbors,stagedRow)
 	def _iterNodeOut(self,nodeIndex):
-		return itertools.imap(lambda x:x[0],self._nodeList[nodeIndex].iterkeys())
+		matrixNeighbors=_csrRow(self._matrix,nodeIndex)
+		stagedRow=self._staged.get(nodeIndex)
+		if stagedRow is None:
+			return iter(matrixNeighbors)
+		return _iterStagedRow(matrixNeighbors,stagedRow)
 
 	def _inDegIndex(self,nodeIndex):
-		return len(self._backNodeList[nodeIndex])
+		return self._inDeg[nodeIndex]
 	def _outDegIndex(self,nodeIndex):
-		return len(self._nodeList[nodeIndex])
+		return self._outDeg[nodeIndex]
+
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		self._compact()
+		src,dest,weights=_csrBulkValues(self._matrix,self._size,src,dest,weights,accumulate)
+		self._matrix=_csrMerge(self._matrix,self._size,src,dest,weights)
+		self._inMatrix=self._matrix.T.tocsr()
+		self._inMatrix.sort_indices()
+
+		#recalculate the degrees
+		size=self._size
+		edges=self._matrix.tocoo()
+		pairs=numpy.unique(numpy.concatenate((edges.row.astype('int64')*size+edges.col,
+						      edges.col.astype('int64')*size+edges.row)))
+		self._totalDeg=numpy.bincount(pairs//max(size,1),minlength=size).tolist()
+		self._outDeg=numpy.diff(self._matrix.indptr).tolist()
+		self._inDeg=numpy.diff(self._inMatrix.indptr).tolist()
+	def _edgeArrays(self):
+		self._compact()
+		edges=self._matrix.tocoo()
+		return edges.row.astype('int64'),edges.col.astype('int64'),edges.data.astype('float')
+
 
 class NumpyFullSymmNet(VirtualNet):
+	"""
+	Symmetric network stored in a full numpy adjacency matrix. The
+	neighbor indices of each node are found with numpy.flatnonzero
+	and cached until an edge of the node changes. Set cacheNeighbors
+	to False to save memory for dense networks.
+	"""
+	cacheNeighbors=True
+
 	def __init__(self,sizeLimit):
 		VirtualNet.__init__(self,sizeLimit=sizeLimit)
 		self._adjMatrix=numpy.zeros([sizeLimit,sizeLimit])
 		self._degree=numpy.zeros(self.sizeLimit,dtype='uint')
+		self._neighborCache={}
 
 	#--- Methods used by VirtualNet:
 	def _degIndex(self,nodeIndex):
@@ -430,18 +855,51 @@ class NumpyFullSymmNet(VirtualNet):
 			self._degree[dest]+=1
 		self._adjMatrix[src][dest]=val
 		self._adjMatrix[dest][src]=val
+		self._neighborCache.pop(src,None)
+		self._neighborCache.pop(dest,None)
 	def _iterNode(self,nodeIndex):
-		for i in range(0,self.sizeLimit):
-                        if self._adjMatrix[nodeIndex,i]!=0:
-                                yield i
+		return iter(self._neighborIndexArray(nodeIndex).tolist())
+	def _neighborIndexArray(self,nodeIndex):
+		neighbors=self._neighborCache.get(nodeIndex)
+		if neighbors is None:
+			neighbors=numpy.flatnonzero(self._adjMatrix[nodeIndex])
+			if self.cacheNeighbors:
+				self._neighborCache[nodeIndex]=neighbors
+		return neighbors
+	def _weightIndexArray(self,nodeIndex,neighbors):
+		return self._adjMatrix[nodeIndex,neighbors]
+	def _edgeArrays(self):
+		src,dest=numpy.nonzero(numpy.triu(self._adjMatrix,1))
+		return src.astype('int64'),dest.astype('int64'),self._adjMatrix[src,dest]
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		#Work on the upper triangle so that (i,j) and (j,i) are the same edge
+		low,high=numpy.minimum(src,dest),numpy.maximum(src,dest)
+		if accumulate:
+			numpy.add.at(self._adjMatrix,(low,high),weights)
+		else:
+			self._adjMatrix[low,high]=weights
+		self._adjMatrix[high,low]=self._adjMatrix[low,high]
+		touched=numpy.unique(numpy.concatenate((low,high)))
+		self._degree[touched]=(self._adjMatrix[touched]!=0).sum(axis=1)
+		for nodeIndex in touched.tolist():
+			self._neighborCache.pop(nodeIndex,None)
 
 class NumpyFullDirNet(VirtualDirNet):
+	"""
+	Directed network stored in a full numpy adjacency matrix. The
+	outgoing and incoming neighbor indices are cached as in
+	NumpyFullSymmNet.
+	"""
+	cacheNeighbors=True
+
 	def __init__(self,sizeLimit):
 		VirtualNet.__init__(self,sizeLimit=sizeLimit)
 		self._adjMatrix=numpy.zeros([sizeLimit,sizeLimit])
 		self._degree=numpy.zeros(self.sizeLimit)
 		self._inDegree=numpy.zeros(self.sizeLimit)
 		self._outDegree=numpy.zeros(self.sizeLimit)
+		self._outCache={}
+		self._inCache={}
 
 	#--- Methods used by VirtualDirNet:
 	def _degIndex(self,nodeIndex):
@@ -464,22 +922,54 @@ class NumpyFullDirNet(VirtualDirNet):
 					self._degree[src]+=1
 					self._degree[dest]+=1
 		self._adjMatrix[src][dest]=val
+		self._outCache.pop(src,None)
+		self._inCache.pop(dest,None)
+	def _outIndexArray(self,nodeIndex):
+		neighbors=self._outCache.get(nodeIndex)
+		if neighbors is None:
+			neighbors=numpy.flatnonzero(self._adjMatrix[nodeIndex,:])
+			if self.cacheNeighbors:
+				self._outCache[nodeIndex]=neighbors
+		return neighbors
+	def _inIndexArray(self,nodeIndex):
+		neighbors=self._inCache.get(nodeIndex)
+		if neighbors is None:
+			neighbors=numpy.flatnonzero(self._adjMatrix[:,nodeIndex])
+			if self.cacheNeighbors:
+				self._inCache[nodeIndex]=neighbors
+		return neighbors
+	def _neighborIndexArray(self,nodeIndex):
+		return numpy.union1d(self._outIndexArray(nodeIndex),self._inIndexArray(nodeIndex))
+	def _weightIndexArray(self,nodeIndex,neighbors):
+		return self._adjMatrix[nodeIndex,neighbors]+self._adjMatrix[neighbors,nodeIndex]
+	def _edgeArrays(self):
+		src,dest=numpy.nonzero(self._adjMatrix)
+		return src.astype('int64'),dest.astype('int64'),self._adjMatrix[src,dest]
 	def _iterNode(self,nodeIndex):
-		for i in range(0,self.sizeLimit):
-                        if self._adjMatrix[nodeIndex,i]!=0 or self._adjMatrix[i,nodeIndex]!=0:
-                                yield i
+		return iter(self._neighborIndexArray(nodeIndex).tolist())
 	def _iterNodeIn(self,nodeIndex):
-		for i in range(0,self.sizeLimit):
-                        if self._adjMatrix[i,nodeIndex]!=0:
-                                yield i
+		return iter(self._inIndexArray(nodeIndex).tolist())
 	def _iterNodeOut(self,nodeIndex):
-		for i in range(0,self.sizeLimit):
-                        if self._adjMatrix[nodeIndex,i]!=0:
-                                yield i
+		return iter(self._outIndexArray(nodeIndex).tolist())
 	def _inDegIndex(self,nodeIndex):
 		return int(self._inDegree[nodeIndex])
 	def _outDegIndex(self,nodeIndex):
 		return int(self._outDegree[nodeIndex])
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		if accumulate:
+			numpy.add.at(self._adjMatrix,(src,dest),weights)
+		else:
+			self._adjMatrix[src,dest]=weights
+		#Only the rows of the sources and the columns of the destinations change
+		touched=numpy.unique(numpy.concatenate((src,dest)))
+		outEdges=self._adjMatrix[touched,:]!=0
+		inEdges=(self._adjMatrix[:,touched]!=0).T
+		self._outDegree[touched]=outEdges.sum(axis=1)
+		self._inDegree[touched]=inEdges.sum(axis=1)
+		self._degree[touched]=(outEdges|inEdges).sum(axis=1)
+		for nodeIndex in touched.tolist():
+			self._outCache.pop(nodeIndex,None)
+			self._inCache.pop(nodeIndex,None)
 
 
 
@@ -498,6 +988,12 @@ class LCELibSparseSymmNet(VirtualNet):
 		return _cnet.Sn_getEdge(self._net,src,dest)
 	def _setEdge(self,src,dest,val):
 		_cnet.Sn_setEdge(self._net,src,dest, float(val))
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		cnet,getEdge,setEdge=self._net,_cnet.Sn_getEdge,_cnet.Sn_setEdge
+		for s,d,w in itertools.izip(src.tolist(),dest.tolist(),weights.tolist()):
+			if accumulate:
+				w+=getEdge(cnet,s,d)
+			setEdge(cnet,s,d,w)
 	def _iterNode(self,nodeIndex):
 		citerator=_cnet.Sn_getNeighborIterator(self._net,nodeIndex)
 		next=_cnet.NeighborIterator_getNext(citerator)
@@ -521,6 +1017,12 @@ class LCELibSparseDirNet(VirtualDirNet):
 		return _cnet.Dn_getEdge(self._net,src,dest)
 	def _setEdge(self,src,dest,val):
 		_cnet.Dn_setEdge(self._net,src,dest, float(val))
+	def _setEdgesBulk(self,src,dest,weights,accumulate=False):
+		cnet,getEdge,setEdge=self._net,_cnet.Dn_getEdge,_cnet.Dn_setEdge
+		for s,d,w in itertools.izip(src.tolist(),dest.tolist(),weights.tolist()):
+			if accumulate:
+				w+=getEdge(cnet,s,d)
+			setEdge(cnet,s,d,w)
 	def _iterNode(self,nodeIndex):
 		citerator=_cnet.Dn_getNeighborIteratorAll(self._net,nodeIndex)
 		next=_cnet.NeighborIteratorAll_getNext(citerator)
@@ -551,6 +1053,314 @@ class LCELibSparseDirNet(VirtualDirNet):
 
 
 
+def _buildCSR(nNodes,rows,cols,weights):
+	"""
+	Returns indptr, indices and weights arrays of a compressed sparse
+	row matrix with the given entries. Indices of each row are sorted.
+	"""
+	if nNodes<2**31:
+		indexType='int32'
+	else:
+		indexType='int64'
+	order=numpy.lexsort((cols,rows))
+	indptr=numpy.zeros(nNodes+1,dtype='int64')
+	numpy.cumsum(numpy.bincount(rows,minlength=nNodes),out=indptr[1:])
+	indices=numpy.asarray(cols[order],dtype=indexType)
+	weights=numpy.asarray(weights[order],dtype='float')
+	for array in (indptr,indices,weights):
+		array.setflags(write=False)
+	return indptr,indices,weights
+
+class CSRNet(object):
+	"""
+	Common methods for the frozen networks stored in compressed sparse
+	row format. The networks are read-only: adding or removing nodes
+	or edges raises an exception. Use freeze() of any other network
+	to create one.
+	"""
+	def _setNames(self,names):
+		self._indexToName=list(names)
+		self._nodes=dict(itertools.izip(self._indexToName,itertools.count()))
+		if len(self._nodes)!=len(self._indexToName):
+			raise Exception("Node names must be unique.")
+		self._hashes=None
+
+	def addNode(self,nodeName):
+		if nodeName not in self:
+			raise Exception("The network is frozen and cannot be modified.")
+	def delNode(self,nodeName):
+		raise Exception("The network is frozen and cannot be modified.")
+	def _setEdge(self,src,dest,val):
+		raise Exception("The network is frozen and cannot be modified.")
+
+	def freeze(self):
+		return self
+
+	def __copy__(self):
+		#the arrays are read-only, so they can be shared
+		copyNet=self.__class__.__new__(self.__class__)
+		copyNet.__dict__.update(self.__dict__)
+		copyNet._setNames(self._indexToName)
+		return copyNet
+
+	def _getRowEdge(self,indptr,indices,weights,src,dest):
+		start,end=indptr[src],indptr[src+1]
+		pos=start+numpy.searchsorted(indices[start:end],dest)
+		if pos<end and indices[pos]==dest:
+			return float(weights[pos])
+		else:
+			return 0.0
+
+	def _rowIndices(self,indptr):
+		"""
+		Returns the row index of each stored entry.
+		"""
+		return numpy.repeat(numpy.arange(len(indptr)-1),numpy.diff(indptr))
+
+	def _getHashes(self):
+		if self._hashes is None:
+			self._hashes=numpy.fromiter(itertools.imap(hash,self._indexToName),dtype='int64',count=len(self._indexToName))
+		return self._hashes
+
+	def _iterEdgeIndices(self):
+		"""
+		Returns arrays of source indices, destination indices and weights
+		of the edges in the same order and orientation as netext.Net_edges
+		would list them.
+		"""
+		rows=self._rowIndices(self._indptr)
+		cols=self._indices
+		weights=self._weights
+		if self.symmetric:
+			hashes=self._getHashes()
+			mask=hashes[rows]<hashes[cols]
+			rows,cols,weights=rows[mask],cols[mask],weights[mask]
+		return rows,cols,weights
+
+	def _iterEdges(self):
+		names=self._indexToName
+		rows,cols,weights=self._iterEdgeIndices()
+		for src,dest,weight in itertools.izip(rows.tolist(),cols.tolist(),weights.tolist()):
+			yield [names[src],names[dest],weight]
+
+	def _edgeArrays(self):
+		rows=self._rowIndices(self._indptr)
+		cols=self._indices.astype('int64')
+		if self.symmetric:
+			mask=rows<cols
+			return rows[mask],cols[mask],self._weights[mask]
+		return rows,cols,self._weights.copy()
+
+	def _numberOfEdges(self):
+		if self.symmetric:
+			return len(self._indices)/2
+		else:
+			return len(self._indices)
+
+	def _degrees(self):
+		"""
+		Returns the degrees of the nodes as an array in index order.
+		"""
+		return numpy.diff(self._indptr)
+
+class CSRSymmNet(CSRNet,VirtualNet):
+	"""
+	Frozen symmetric network. The adjacency matrix is kept in three
+	numpy arrays: indptr, indices and weights. Both directions of each
+	edge are stored.
+	"""
+	def __init__(self,sizeLimit=0):
+		VirtualNet.__init__(self,sizeLimit=sizeLimit)
+		self._setArrays([],numpy.zeros(1,dtype='int64'),numpy.zeros(0,dtype='int32'),numpy.zeros(0))
+
+	@classmethod
+	def _fromIndexArrays(cls,names,src,dest,weights):
+		"""
+		Creates the network from node names and arrays of edges given
+		as indices to the names list. Each edge should be listed once.
+		"""
+		newNet=cls.__new__(cls)
+		VirtualNet.__init__(newNet)
+		rows=numpy.concatenate((src,dest))
+		cols=numpy.concatenate((dest,src))
+		indptr,indices,weights=_buildCSR(len(names),rows,cols,numpy.concatenate((weights,weights)))
+		newNet._setArrays(names,indptr,indices,weights)
+		return newNet
+
+	def _setArrays(self,names,indptr,indices,weights):
+		self._setNames(names)
+		self._indptr=indptr
+		self._indices=indices
+		self._weights=weights
+
+	#--- Methods used by VirtualNet:
+	def _degIndex(self,nodeIndex):
+		return int(self._indptr[nodeIndex+1]-self._indptr[nodeIndex])
+	def _getEdge(self,src,dest):
+		return self._getRowEdge(self._indptr,self._indices,self._weights,src,dest)
+	def _iterNode(self,nodeIndex):
+		return iter(self._indices[self._indptr[nodeIndex]:self._indptr[nodeIndex+1]].tolist())
+	def _neighborIndexArray(self,nodeIndex):
+		return self._indices[self._indptr[nodeIndex]:self._indptr[nodeIndex+1]]
+	def _weightIndexArray(self,nodeIndex,neighbors):
+		return self._weights[self._indptr[nodeIndex]:self._indptr[nodeIndex+1]]
+
+class CSRDirNet(CSRNet,VirtualDirNet):
+	"""
+	Frozen directed network. Outgoing edges are stored in compressed
+	sparse row format and incoming edges in compressed sparse column
+	format.
+	"""
+	def __init__(self,sizeLimit=0):
+		VirtualNet.__init__(self,sizeLimit=sizeLimit)
+		empty=numpy.zeros(0,dtype='int32')
+		self._setArrays([],numpy.zeros(1,dtype='int64'),empty,numpy.zeros(0),
+				numpy.zeros(1,dtype='int64'),empty,numpy.zeros(0),numpy.zeros(0,dtype='int64'))
+
+	@classmethod
+	def _fromIndexArrays(cls,names,src,dest,weights):
+		"""
+		Creates the network from node names and arrays of directed
+		edges given as indices to the names list.
+		"""
+		newNet=cls.__new__(cls)
+		VirtualNet.__init__(newNet)
+		nNodes=len(names)
+		indptr,indices,outWeights=_buildCSR(nNodes,src,dest,weights)
+		inIndptr,inIndices,inWeights=_buildCSR(nNodes,dest,src,weights)
+
+		#the total degree is the number of distinct neighbors
+		pairs=numpy.unique(numpy.concatenate((src*nNodes+dest,dest*nNodes+src)))
+		degree=numpy.bincount(pairs//max(nNodes,1),minlength=nNodes)
+
+		newNet._setArrays(names,indptr,indices,outWeights,inIndptr,inIndices,inWeights,degree)
+		return newNet
+
+	def _setArrays(self,names,indptr,indices,weights,inIndptr,inIndices,inWeights,degree):
+		self._setNames(names)
+		self._indptr=indptr
+		self._indices=indices
+		self._weights=weights
+		self._inIndptr=inIndptr
+		self._inIndices=inIndices
+		self._inWeights=inWeights
+		self._degree=degree
+
+	#--- Methods used by VirtualDirNet:
+	def _degIndex(self,nodeIndex):
+		return int(self._degree[nodeIndex])
+	def _getEdge(self,src,dest):
+		return self._getRowEdge(self._indptr,self._indices,self._weights,src,dest)
+	def _iterNode(self,nodeIndex):
+		#First iter through all outgoing neighbors:
+		outNeighbors=self._indices[self._indptr[nodeIndex]:self._indptr[nodeIndex+1]].tolist()
+		for neigh in outNeighbors:
+			yield neigh
+		#Then iter through only incoming neighbors
+		outNeighbors=set(outNeighbors)
+		for neigh in self._iterNodeIn(nodeIndex):
+			if not neigh in outNeighbors:
+				yield neigh
+	def _iterNodeIn(self,nodeIndex):
+		return iter(self._inIndices[self._inIndptr[nodeIndex]:self._inIndptr[nodeIndex+1]].tolist())
+	def _iterNodeOut(self,nodeIndex):
+		return iter(self._indices[self._indptr[nodeIndex]:self._indptr[nodeIndex+1]].tolist())
+	def _neighborIndexArray(self,nodeIndex):
+		#outgoing neighbors first, then the ones that are only incoming
+		outNeighbors=self._indices[self._indptr[nodeIndex]:self._indptr[nodeIndex+1]]
+		inNeighbors=self._inIndices[self._inIndptr[nodeIndex]:self._inIndptr[nodeIndex+1]]
+		onlyIn=inNeighbors[~numpy.in1d(inNeighbors,outNeighbors)]
+		return numpy.concatenate((outNeighbors,onlyIn))
+	def _weightIndexArray(self,nodeIndex,neighbors):
+		start,end=self._indptr[nodeIndex],self._indptr[nodeIndex+1]
+		inStart,inEnd=self._inIndptr[nodeIndex],self._inIndptr[nodeIndex+1]
+		outNeighbors,outWeights=self._indices[start:end],self._weights[start:end]
+		inNeighbors,inWeights=self._inIndices[inStart:inEnd],self._inWeights[inStart:inEnd]
+		#both index lists are sorted, so the matches are found by binary search
+		weights=numpy.zeros(len(neighbors))
+		pos=numpy.searchsorted(outNeighbors,neighbors)
+		found=pos<len(outNeighbors)
+		found[found]=outNeighbors[pos[found]]==neighbors[found]
+		weights[found]+=outWeights[pos[found]]
+		pos=numpy.searchsorted(inNeighbors,neighbors)
+		found=pos<len(inNeighbors)
+		found[found]=inNeighbors[pos[found]]==neighbors[found]
+		weights[found]+=inWeights[pos[found]]
+		return weights
+	def _inDegIndex(self,nodeIndex):
+		return int(self._inIndptr[nodeIndex+1]-self._inIndptr[nodeIndex])
+	def _outDegIndex(self,nodeIndex):
+		return int(self._indptr[nodeIndex+1]-self._indptr[nodeIndex])
+
+	def _degrees(self):
+		return self._degree
+
+def fromArrays(src,dest,weights,names=None,symmetric=True,netType=None):
+	"""
+	Creates a network from edges given as arrays, for example the
+	ones returned by toArrays.
+
+	Parameters
+	----------
+	src, dest : array-like
+	    Indices of the source and destination nodes in names.
+	weights : array-like
+	    Edge weights.
+	names : sequence
+	    Node names. If None, the nodes are named by their indices
+	    0,1,...,max(src,dest).
+	symmetric : bool
+	    Whether the network is symmetric. Ignored if netType is given.
+	netType : class
+	    Network class to create. The default is SymmNet for symmetric
+	    and Net for directed networks. CSRSymmNet and CSRDirNet are
+	    built directly from the arrays.
+
+	Each edge should be listed only once; for symmetric networks
+	this means that (i,j) and (j,i) must not both be given.
+
+	Returns
+	-------
+	net : network of type netType
+	"""
+	src=numpy.asarray(src,dtype='int64')
+	dest=numpy.asarray(dest,dtype='int64')
+	weights=numpy.asarray(weights,dtype='float')
+	if not len(src)==len(dest)==len(weights):
+		raise Exception("The edge arrays must be of equal length.")
+	if names is None:
+		if len(src)>0:
+			names=range(max(src.max(),dest.max())+1)
+		else:
+			names=[]
+	elif isinstance(names,numpy.ndarray):
+		names=names.tolist()
+	else:
+		names=list(names)
+	if len(src)>0 and (min(src.min(),dest.min())<0 or max(src.max(),dest.max())>=len(names)):
+		raise Exception("Node index out of range.")
+	assert not numpy.any(src==dest), "No self-edges."
+
+	if netType is None:
+		if symmetric:
+			netType=SymmNet
+		else:
+			netType=Net
+	if issubclass(netType,CSRNet):
+		return netType._fromIndexArrays(names,src,dest,weights)
+
+	if issubclass(netType,(NumpyFullSymmNet,NumpyFullDirNet)):
+		newNet=netType(len(names))
+	else:
+		newNet=netType()
+	for name in names:
+		newNet.addNode(name)
+	if len(newNet)!=len(names):
+		raise Exception("Node names must be unique.")
+	#a new network has its nodes indexed in the order they were added
+	newNet._setEdgesBulk(src,dest,weights)
+	return newNet
+
 
 #--- Implementation lists
 SymmBackends=[LCELibSparseSymmNet,ScipySparseSymmNet,NumpyFullSymmNet,DictSymmNet]
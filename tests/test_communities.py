@@ -1,4 +1,5 @@
 import unittest
+import random
 from netpython import communities
 from netpython import pynet
 
@@ -33,6 +34,32 @@ class TestNodeCover(unittest.TestCase):
         self.assertEqual(commStr2,str(communities.NodeCover(inputStr=commStr2,nodeSeparator=",",communitySeparator=" ")))
     
 
+    def test_fromArrays(self):
+        """Covers made from arrays match the set-based covers."""
+        for cmap in self.cmaps:
+            members = sum([cmap[c] for c in sorted(cmap)], [])
+            offsets = [0]
+            for c in sorted(cmap):
+                offsets.append(offsets[-1] + len(cmap[c]))
+            cover = communities.NodeCover.fromArrays(members, offsets)
+            reference = communities.NodeCover(cmap=cmap)
+            self.assertEqual(len(cover), len(reference))
+            self.assertEqual(cover.getCommunitySizes(), reference.getCommunitySizes())
+            self.assertEqual(cover.getSizeDist(), reference.getSizeDist())
+            self.assertEqual(cover.getSusceptibility(), reference.getSusceptibility())
+            self.assertEqual(cover.N_nodes, reference.N_nodes)
+            self.assertEqual(cover.comm, reference.comm)
+            self.assertEqual(type(cover), communities.NodeCover)
+        cover = communities.NodePartition.fromArrays([0, 1, 2], [0, 2, 3])
+        self.assertEqual(type(cover), communities.NodeCover)
+
+    def test_getCollapsed(self):
+        cover = communities.NodeCover(cmap={0: [(0, 1), (1, 2)], 1: [(3, 4)]})
+        collapsed = cover.getCollapsed()
+        self.assertEqual(collapsed.comm, [set([0, 1, 2]), set([3, 4])])
+        new = self.comms[1].getNew(dict((i, [i // 2]) for i in range(8)))
+        self.assertEqual(new.comm, [set([0, 1]), set([2]), set([3])])
+
     def test_getMaxVariationOfInformation_selfmatch(self):
         """A community structure must always match itself."""
         for c in self.comms:
@@ -71,6 +98,29 @@ class TestNodeCover(unittest.TestCase):
                 #       ci.getNormalizedMutualInformation(cj))
                 j += 1
 
+class TestCommunityTree(unittest.TestCase):
+
+    def test_tree(self):
+        levels = [[set([1]), set([2]), set([3]), set([4]), set([5])],
+                  [set([1,2,3]), set([4,5])],
+                  [set([1,2,3,4,5])]]
+        tree = communities.communityTree(levels)
+        self.assertEqual(tree.tree, [[None], [0, 0], [0, 0, 0, 1, 1]])
+        self.assertEqual(tree._getLeafOrderInTree(),
+                         [(2, 0), (2, 1), (2, 2), (2, 3), (2, 4)])
+
+        # With several supersets the one with the largest index is the
+        # father, and communities without children are leaves.
+        levels = [communities.NodeCover({0: [4], 1: [1, 2]}),
+                  [set([1, 2, 3]), set([4, 5]), set([1, 2, 3, 4])],
+                  [set([1, 2, 3, 4, 5]), set([6]), set([6])]]
+        tree = communities.communityTree(levels)
+        self.assertEqual(tree.tree, [[None, None, None], [0, 0, 0], [2, 2]])
+        self.assertEqual(tree._getLeafOrderInTree(),
+                         [(1, 0), (1, 1), (2, 0), (2, 1), (0, 1), (0, 2)])
+        self.assertRaises(ValueError, communities.communityTree,
+                          [[set([1, 7])], [set([1, 2])]])
+
 class TestNodePartition(unittest.TestCase):
     
     def setUp(self):
@@ -115,6 +165,83 @@ class TestNodePartition(unittest.TestCase):
                 self.assertEqual(ci.getMutualInformation(cj), 
                                  ci.getMutualInformation_slow(cj))
 
+    def test_labels(self):
+        """Partitions made from label arrays match the dictionaries."""
+        for c in self.comms:
+            c2 = communities.NodePartition(labels=c.labels)
+            self.assertEqual(sorted(map(sorted, c2)), sorted(map(sorted, c)))
+        c = communities.NodePartition(labels=[1, -1, 1, 0], N_nodes=4)
+        self.assertEqual(sorted(map(sorted, c)), [[0, 2], [3]])
+        self.assertEqual(c.labels.tolist(), [0, -1, 0, 1])
+
+    def test_getMutualInformation_labels(self):
+        """Random partitions and partitions of non-integer nodes."""
+        random.seed(4)
+        for i in range(20):
+            ci = communities.NodePartition(labels=[random.randint(-1, 5) for j in range(40)])
+            cj = communities.NodePartition(labels=[random.randint(0, 8) for j in range(40)])
+            self.assertAlmostEqual(ci.getMutualInformation(cj),
+                                   ci.getMutualInformation_slow(cj))
+        ci = communities.NodePartition({0: ['a', 'b'], 1: ['c']})
+        cj = communities.NodePartition({0: ['a', 'b', 'c']})
+        self.assertEqual(ci.getMutualInformation(cj), 0.0)
+        self.assertAlmostEqual(ci.getMutualInformation(ci), ci.entropy)
+
+    def test_compareAll(self):
+        """The matrix agrees with the methods and can be cached by content."""
+        partitions = self.comms[:3] + [communities.NodePartition(self.cmaps[0])]
+        for metric, method in [("nmi", "getNormalizedMutualInformation"),
+                               ("mimetric", "getMImetric"),
+                               ("maxvi", "getMaxVariationOfInformation")]:
+            for n_jobs in [1, 2]:
+                matrix = communities.compareAll(partitions, metric=metric, n_jobs=n_jobs)
+                for i, ci in enumerate(partitions):
+                    for j, cj in enumerate(partitions):
+                        self.assertAlmostEqual(matrix[i, j], getattr(ci, method)(cj))
+        self.assertAlmostEqual(matrix[0, 3], 1.0)
+        cache = {}
+        matrix = communities.compareAll(partitions, metric="maxvi", cache=cache)
+        key = ("maxvi",) + tuple(sorted([partitions[0]._getContentHash(),
+                                         partitions[1]._getContentHash()]))
+        self.assertEqual(cache[key], matrix[0, 1])
+        self.assertEqual(len(cache), 6)
+        cache[key] = -1.0
+        self.assertEqual(communities.compareAll(partitions, metric="maxvi", cache=cache)[1, 0], -1.0)
+        self.assertNotEqual(communities.compareAll(partitions, metric="maxvi")[1, 0], -1.0)
+        self.assertEqual(partitions[0]._getContentHash(), partitions[3]._getContentHash())
+        self.assertRaises(ValueError, communities.compareAll, partitions, "other")
+
+        # Large node IDs are numbered densely.
+        ci = communities.NodePartition({0: [10**12, 5], 1: [7]})
+        cj = communities.NodePartition({0: [10**12], 1: [5, 7]})
+        self.assertAlmostEqual(ci.getMutualInformation(cj), ci.getMutualInformation_slow(cj))
+        self.assertAlmostEqual(ci.getMutualInformation(cj), 0.2516291673878229)
+        matrix = communities.compareAll([ci, cj, ci])
+        self.assertAlmostEqual(matrix[0, 1], ci.getNormalizedMutualInformation(cj))
+        self.assertAlmostEqual(matrix[0, 2], 1.0)
+        self.assertEqual(communities._partitionLabelMatrix([ci, cj]).shape, (2, 3))
+
+    def test_getTilingImperfection(self):
+        ti, pm = self.comms[0].getTilingImperfection(self.comms[1])
+        self.assertEqual(ti[0].tolist(), [0.0, 0.0])
+        self.assertEqual(sorted(ti[1].tolist()), [0.0, 1.0, 1.0])
+        self.assertEqual(sorted(pm[0].tolist()), [0, 1])
+        self.assertEqual(sorted(pm[1].tolist()), [0, 0, 1])
+        for c in self.comms:
+            ti, pm = c.getTilingImperfection(c)
+            self.assertEqual(ti[0].tolist(), [0.0]*len(c))
+            self.assertEqual(pm[1].tolist(), [1]*len(c))
+
+        # Large node IDs are not used as array indices.
+        ci = communities.NodePartition({0: [10**12, 5], 1: [7]})
+        cj = communities.NodePartition({0: [10**12], 1: [5, 7]})
+        small_i = communities.NodePartition({0: [3, 5], 1: [7]})
+        small_j = communities.NodePartition({0: [3], 1: [5, 7]})
+        ti, pm = ci.getTilingImperfection(cj)
+        ti_small, pm_small = small_i.getTilingImperfection(small_j)
+        self.assertEqual(map(list, ti), map(list, ti_small))
+        self.assertEqual(map(list, pm), map(list, pm_small))
+
     def test_modularity(self):
         net = pynet.SymmNet()
         np = self.comms[0]
@@ -127,6 +254,38 @@ class TestNodePartition(unittest.TestCase):
         m2 = 2.0*(6+6+1)
         correct_modularity = (6*(1-3*3/m2) + 6*(1-3*4/m2))/m2
         self.assertEqual(np.modularity(net), correct_modularity)
+
+        # The standard modularity includes the i=j terms and both
+        # orders of each pair.
+        correct_modularity = 2*(6/13.0 - (13/m2)**2)
+        self.assertAlmostEqual(communities.getModularity(net, np), correct_modularity)
+        self.assertAlmostEqual(communities.getModularity(net, np._commIDs), correct_modularity)
+        self.assertAlmostEqual(communities.getModularity(net, {}), -86/m2**2)
+
+    def test_getLouvainPartition(self):
+        # Two cliques joined by a single edge are found.
+        net = pynet.SymmNet()
+        for c in self.cmaps[0].values():
+            for n_i, i in enumerate(c):
+                for j in c[n_i+1:]:
+                    net[i, j] = 1
+        net[3, 4] = 1
+        partition = communities.getLouvainPartition(net, seed=1)
+        self.assertEqual(sorted(map(sorted, partition)), [[0,1,2,3], [4,5,6,7]])
+
+        # Planted communities in a random network.
+        random.seed(3)
+        net = pynet.SymmNet()
+        for i in range(120):
+            for j in range(i+1, 120):
+                if random.random() < (0.5 if i//20 == j//20 else 0.01):
+                    net[i, j] = random.randint(1, 3)
+        partition = communities.getLouvainPartition(net, seed=2)
+        planted = communities.NodePartition(
+            dict((c, range(20*c, 20*c+20)) for c in range(6)))
+        self.assertEqual(partition.getNormalizedMutualInformation(planted), 1.0)
+        self.assertEqual(partition._commIDs,
+                         communities.getLouvainPartition(net, seed=2)._commIDs)
                 
 
 if __name__ == '__main__':
@@ -0,0 +1,47 @@
+import unittest
+import random
+from netpython import pynet
+from netpython import lfk
+
+class TestLFK(unittest.TestCase):
+
+    def setUp(self):
+        #two cliques of five nodes joined by the edge 4-5
+        self.net=pynet.SymmNet()
+        for c in [range(5),range(5,10)]:
+            for i in c:
+                for j in c:
+                    if i<j:
+                        self.net[i,j]=1.0
+        self.net[4,5]=1.0
+        random.seed(1)
+        self.randomNet=pynet.SymmNet()
+        for k in range(100):
+            i,j=random.randint(0,30),random.randint(0,30)
+            if i!=j:
+                self.randomNet[i,j]=random.random()+0.1
+
+    def test_detectCommunityForNode(self):
+        self.assertEqual(sorted(lfk.detectCommunityForNode(self.net,1.0,0)),range(5))
+        self.assertEqual(sorted(lfk.detectCommunityForNode(self.net,1.0,9)),range(5,10))
+
+        #the community is a local maximum of the fitness
+        for node in self.randomNet:
+            com=lfk.detectCommunityForNode(self.randomNet,1.0,node)
+            for member in com:
+                self.assert_(lfk.getNodeFitness(self.randomNet,com,member,1.0)>=0)
+            for neighbor in lfk.getNeighborNodes(self.randomNet,com):
+                self.assert_(lfk.getNodeFitness(self.randomNet,com,neighbor,1.0)<0)
+
+    def test_detectCommunities(self):
+        cover=lfk.detectCommunities(self.net,1.0)
+        self.assertEqual(sorted(map(sorted,cover)),[range(5),range(5,10)])
+
+        #the result does not depend on the number of processes
+        for net in [self.net,self.randomNet]:
+            cover=lfk.detectCommunities(net,1.0)
+            cover2=lfk.detectCommunities(net,1.0,processes=2)
+            self.assertEqual(sorted(map(sorted,cover)),sorted(map(sorted,cover2)))
+
+if __name__ == '__main__':
+    unittest.main()
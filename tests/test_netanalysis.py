@@ -0,0 +1,99 @@
+import unittest
+import random
+from netpython import pynet
+from netpython import netanalysis
+
+class TestNetanalysis(unittest.TestCase):
+
+    def setUp(self):
+        #two triangles 0-1-2 and 1-2-3 sharing the edge 1-2, and a tail 3-4
+        self.symmNet=pynet.SymmNet()
+        for i,j,w in [(0,1,1.0),(0,2,2.0),(1,2,4.0),(1,3,1.0),(2,3,1.0),(3,4,3.0)]:
+            self.symmNet[i,j]=w
+        random.seed(2)
+        self.randomNet=pynet.SymmNet()
+        for k in range(300):
+            i,j=random.randint(0,40),random.randint(0,40)
+            if i!=j:
+                self.randomNet[i,j]=random.randint(1,5)
+
+    def loopClustering(self,net,node):
+        k=net[node].deg()
+        if k<2:
+            return 0
+        t=sum(1 for j in net[node] for l in net[j] if l in net[node])
+        return float(t)/(k*(k-1))
+
+    def loopCommon(self,net,node1,node2):
+        return sum(1 for neigh in net[node1] if node2 in net[neigh])
+
+    def test_triangleCounts(self):
+        names,degrees,nodeTriangles,src,dest,edgeTriangles=netanalysis.triangleCounts(self.symmNet)
+        counts=dict(zip(names.tolist(),nodeTriangles.tolist()))
+        self.assertEqual([counts[i] for i in range(5)],[1,2,2,1,0])
+        self.assertEqual(len(src),6)
+        for e in range(len(src)):
+            self.assertEqual(edgeTriangles[e],self.loopCommon(self.symmNet,names[src[e]],names[dest[e]]))
+
+    def test_clustering(self):
+        for net in [self.symmNet,self.randomNet]:
+            c=netanalysis.clustering(net)
+            degs,cList=netanalysis.clustering_valuelist(net)
+            for node,k,ci in zip(list(net),degs,cList):
+                self.assertAlmostEqual(c[node],self.loopClustering(net,node))
+                self.assertEqual(k,net[node].deg())
+                if k>1:
+                    self.assertAlmostEqual(ci,c[node])
+                else:
+                    self.assertEqual(ci,None)
+
+    def test_overlap(self):
+        for net in [self.symmNet,self.randomNet]:
+            src,dest,overlaps=netanalysis.getOverlaps(net)
+            src,dest,edgeClusterings=netanalysis.getEdgeClusterings(net)
+            self.assertEqual(len(src),len(net.edges))
+            for i,j,o,ec in zip(src,dest,overlaps,edgeClusterings):
+                n=self.loopCommon(net,i,j)
+                k1,k2=net[i].deg(),net[j].deg()
+                d=k1+k2-2-n
+                self.assertAlmostEqual(o,n/float(d) if d>0 else 0.0)
+                self.assertAlmostEqual(netanalysis.overlap(net,i,j),o)
+                d=min(k1,k2)-1.0
+                self.assertAlmostEqual(ec,n/d if d>0 else 0.0)
+                self.assertAlmostEqual(netanalysis.edgeClustering(net,i,j),ec)
+
+    def test_directed(self):
+        #edge directions are ignored: the triangle 0-1-2 with a
+        #reciprocal pair 0-1, and a tail 0-3
+        net=pynet.Net()
+        for i,j in [(0,1),(1,0),(1,2),(2,0),(0,3)]:
+            net[i,j]=1
+        c=netanalysis.clustering(net)
+        self.assertEqual([c[i] for i in range(4)],[1/3.0,1.0,1.0,0.0])
+        self.assertAlmostEqual(netanalysis.overlap(net,0,1),1/(3+2-2-1.0))
+        self.assertAlmostEqual(netanalysis.overlap(net,1,0),netanalysis.overlap(net,0,1))
+        self.assertAlmostEqual(netanalysis.edgeClustering(net,2,0),1.0)
+        src,dest,overlaps=netanalysis.getOverlaps(net)
+        self.assertEqual(len(src),4)
+
+    def test_weightedClustering(self):
+        c=netanalysis.weightedClustering(self.symmNet,method='onnela')
+        self.assertAlmostEqual(c[0],2*(8/64.0)**(1/3.0)/2)
+        self.assertEqual(c[4],0)
+        c=netanalysis.weightedClustering(self.symmNet,method='barrat')
+        self.assertAlmostEqual(c[0],3.0/(3.0*1))
+        self.assertAlmostEqual(c[3],2.0/(5.0*2))
+
+        #equal weights give the unweighted clustering
+        net=pynet.SymmNet()
+        for i,j,w in self.randomNet.edges:
+            net[i,j]=1.0
+        c=netanalysis.clustering(net)
+        for method in ['onnela','barrat']:
+            cw=netanalysis.weightedClustering(net,method=method)
+            for node in net:
+                self.assertAlmostEqual(cw[node],c[node])
+        self.assertRaises(ValueError,netanalysis.weightedClustering,net,'other')
+
+if __name__ == '__main__':
+    unittest.main()
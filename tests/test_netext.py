@@ -0,0 +1,72 @@
+import unittest
+import random
+import numpy
+from netpython import pynet
+from netpython import netext
+
+class TestNetext(unittest.TestCase):
+
+    def setUp(self):
+        #a path 0-1-2-3, a triangle 4-5-6 and an isolated edge 7-8
+        self.symmNet=pynet.SymmNet()
+        for i,j in [(0,1),(1,2),(2,3),(4,5),(5,6),(6,4),(7,8)]:
+            self.symmNet[i,j]=1.0
+        random.seed(1)
+        self.randomNet=pynet.DictDirNet()
+        for k in range(150):
+            i,j=random.randint(0,50),random.randint(0,50)
+            if i!=j:
+                self.randomNet[i,j]=1.0
+
+    def test_bfsDistanceHistograms(self):
+        histogram,reached,distanceSums=netext.bfsDistanceHistograms(self.symmNet,[0,4,7])
+        self.assertEqual(histogram.tolist(),[0,4,1,1])
+        self.assertEqual(reached.tolist(),[3,2,1])
+        self.assertEqual(distanceSums.tolist(),[6,2,1])
+
+        #same as getPathLengths, serially and in parallel
+        for net in [self.symmNet,self.randomNet]:
+            nodes=list(net)
+            for processes in [1,2]:
+                histogram,reached,distanceSums=netext.bfsDistanceHistograms(net,nodes,processes)
+                for i,node in enumerate(nodes):
+                    pathLengths=netext.getPathLengths(net,node)
+                    self.assertEqual(reached[i],len(pathLengths))
+                    self.assertEqual(distanceSums[i],sum(pathLengths.values()))
+
+    def test_getPathLengthDistribution(self):
+        distribution=netext.getPathLengthDistribution(self.symmNet)
+        self.assertEqual(sorted(distribution.keys()),[1,2,3])
+        self.assertAlmostEqual(distribution[1],14/20.0)
+        self.assertAlmostEqual(distribution[3],2/20.0)
+        self.assertAlmostEqual(netext.getMeanPathLength(self.symmNet),
+                               numpy.mean([2,4/3.,4/3.,2,1,1,1,1,1]))
+
+    def test_getBetweennessCentrality(self):
+        cb,bcNet=netext.getBetweennessCentrality(self.symmNet,edgeBC=True)
+        self.assertEqual([cb[i] for i in range(9)],[0,2,2,0,0,0,0,0,0])
+        self.assertEqual(bcNet[0,1],3.0)
+        self.assertEqual(bcNet[1,2],4.0)
+        self.assertEqual(bcNet[4,5],1.0)
+
+        #the weighted, sampled and parallel versions agree when they should
+        for net in [self.symmNet,self.randomNet]:
+            cb,bcNet=netext.getBetweennessCentrality(net,edgeBC=True)
+            for keywords in [dict(weighted=True),dict(processes=2),dict(samples=len(net))]:
+                cb2,bcNet2=netext.getBetweennessCentrality(net,edgeBC=True,**keywords)
+                for node in net:
+                    self.assertAlmostEqual(cb[node],cb2[node])
+                self.assertEqual(len(bcNet.edges),len(bcNet2.edges))
+                for i,j,w in bcNet.edges:
+                    self.assertAlmostEqual(bcNet2[i,j],w)
+
+        #longer edges are avoided in the weighted version
+        net=pynet.SymmNet()
+        net[0,1]=1.0
+        net[1,2]=1.0
+        net[0,2]=5.0
+        self.assertEqual(netext.getBetweennessCentrality(net,weighted=True)[1],1.0)
+        self.assertEqual(netext.getBetweennessCentrality(net)[1],0.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,15 @@
 import unittest
 import cStringIO
+import StringIO
 from operator import itemgetter
 from netpython import pynet
 from netpython import netio
 from netpython import transforms
 import os
+import tempfile as tempfile_module
+import shutil
+import gzip,bz2
+import numpy
 
 class TestNetio(unittest.TestCase):
     
@@ -97,6 +102,135 @@ class TestNetio(unittest.TestCase):
         testConsistency("lowerdiag",True)
         testConsistency("slowerdiag",True)
 
+    def test_loadNet_edg_fast(self):
+        class LineByLineFile(StringIO.StringIO):
+            """A file that makes loadNet_edg use the line by line parser."""
+            def tell(self):
+                raise IOError("No tell.")
+        def assertSameNets(net1,net2):
+            self.assertEqual(sorted(list(net1)),sorted(list(net2)))
+            for node in net1:
+                self.assertEqual(sorted(net1[node]),sorted(net2[node]))
+                for neigh in net1[node]:
+                    self.assertEqual(net1[node,neigh],net2[node,neigh])
+        contents=["1 2 1.5\n2 1 2.0\n3 1 1.0\n3 3 4\n1 2 0.5\n\n5 6 1\n",
+                  "10\t20\n20 30\n30\t10\n",
+                  "from to weight\n1 2 1.0\n2 1 2.0\n",
+                  "1 2 1.0\n1.0 3 2.0\n"]
+        for content in contents:
+            for mutualEdges in [False,True]:
+                for allowSelfEdges in [False,True]:
+                    for symmetricNet in [True,False]:
+                        if mutualEdges and not symmetricNet:
+                            continue
+                        keywords=dict(mutualEdges=mutualEdges,allowSelfEdges=allowSelfEdges,
+                                      symmetricNet=symmetricNet,hasHeaderLine=None)
+                        fastNet=netio.loadNet_edg(StringIO.StringIO(content),**keywords)
+                        numerical=("from" not in content and "1.0 3" not in content)
+                        slowNet=netio.loadNet_edg(LineByLineFile(content),numerical=numerical,
+                                                  **keywords)
+                        assertSameNets(fastNet,slowNet)
+        net=netio.loadNet_edg(StringIO.StringIO(contents[0]))
+        self.assertEqual(net[1,2],4.0)
+        self.assertEqual(net[3].deg(),1)
+        self.assertTrue(5 in net)
+
+    def test_iterEdges(self):
+        net=self.simpleWeightedNet
+        edges=sorted((min(i,j),max(i,j),w) for i,j,w in net.edges)
+        def canonical(edgeList):
+            return sorted((min(i,j),max(i,j),w) for i,j,w in edgeList)
+        folder=tempfile_module.mkdtemp()
+        try:
+            for fileType in ["edg","net","gml"]:
+                for suffix in ["",".gz",".bz2"]:
+                    fileName=os.path.join(folder,"net."+fileType)
+                    netio.writeNet(net,fileName)
+                    if suffix!="":
+                        compressed={".gz":gzip.open,".bz2":bz2.BZ2File}[suffix](fileName+suffix,"wb")
+                        compressed.write(open(fileName).read())
+                        compressed.close()
+                        fileName+=suffix
+                    if fileType=="gml":
+                        #gml files name the nodes by their ids
+                        self.assertEqual(sorted(w for i,j,w in netio.iterEdges(fileName)),
+                                         sorted(w for i,j,w in edges))
+                        continue
+                    self.assertEqual(canonical(netio.iterEdges(fileName)),edges)
+                    chunks=list(netio.iterEdges(fileName,chunksize=2))
+                    self.assertEqual(max(len(chunk[0]) for chunk in chunks),2)
+                    chunkEdges=[]
+                    for sources,targets,weights in chunks:
+                        self.assertEqual(sources.dtype,numpy.int64)
+                        chunkEdges.extend(zip(sources.tolist(),targets.tolist(),weights.tolist()))
+                    self.assertEqual(canonical(chunkEdges),edges)
+        finally:
+            shutil.rmtree(folder)
+
+        #self-edges are skipped and names that are not integers are kept
+        content=StringIO.StringIO("from to weight\n1 1 2.0\na 2\n3 4 1.5\n")
+        self.assertEqual(list(netio.iterEdges(content,fileType="edg")),[("a",2,1.0),(3,4,1.5)])
+        content.seek(0)
+        sources,targets,weights=list(netio.iterEdges(content,fileType="edg",chunksize=10))[0]
+        self.assertEqual(sources.tolist(),["a",3])
+        self.assertRaises(ValueError,netio.iterEdges,content,fileType="mat")
+
+        #the gml reader also skips self-edges, both when iterating and loading
+        gml=("graph [\n directed 1\n edge [\n source 1\n target 1\n value 2\n ]\n"
+             " edge [\n source 1\n target 2\n value 3\n ]\n edge [\n source 2\n target 1\n ]\n]\n")
+        self.assertEqual(list(netio.iterEdges(StringIO.StringIO(gml),fileType="gml")),
+                         [("1","2",3.0),("2","1",1.0)])
+        net=netio.loadNet_gml(StringIO.StringIO(gml))
+        self.assertTrue(isinstance(net,pynet.Net))
+        self.assertEqual(sorted(net.edges),[["1","2",3.0],["2","1",1.0]])
+
+    def test_npnet_readwrite_consistency(self):
+        dirNet=pynet.DictDirNet()
+        dirNet["a","b"]=1.5
+        dirNet["b","a"]=2.0
+        dirNet["c","a"]=3.0
+        dirNet.addNode("d")
+        unicodeNet=pynet.SymmNet()
+        unicodeNet[u"\xe4",u"b"]=1.0
+        mixedNet=pynet.SymmNet()
+        mixedNet[1,"b"]=1.0
+        for net in [self.simpleWeightedNet,dirNet,unicodeNet,mixedNet]:
+            #through a virtual file and through a real file
+            tempfile = cStringIO.StringIO()
+            netio.writeNet_npnet(net,tempfile)
+            tempfile.seek(0)
+            newNets=[netio.loadNet_npnet(tempfile)]
+            fileName=tempfile_module.mktemp(suffix=".npnet")
+            try:
+                netio.writeNet(net,fileName)
+                newNets.append(netio.loadNet(fileName))
+            finally:
+                os.remove(fileName)
+            for newNet in newNets:
+                self.assertEqual(newNet.isSymmetric(),net.isSymmetric())
+                self.assertEqual(sorted(list(newNet)),sorted(list(net)))
+                for node in net:
+                    self.assertEqual(newNet[node].deg(),net[node].deg())
+                    self.assertEqual(sorted(newNet[node].iterOut()),sorted(net[node].iterOut()))
+                    for neigh in net[node]:
+                        self.assertEqual(newNet[node,neigh],net[node,neigh])
+                self.assertRaises(Exception,newNet.__setitem__,(1,2),1.0)
+
+        #mixed names are stored as literals, never as pickles
+        tupleNet=pynet.SymmNet()
+        tupleNet[(1,"a"),2.5]=1.0
+        tempfile=cStringIO.StringIO()
+        netio.writeNet_npnet(tupleNet,tempfile)
+        tempfile.seek(0)
+        self.assertEqual(sorted(netio.loadNet_npnet(tempfile)),sorted(tupleNet))
+        objectNet=pynet.SymmNet()
+        objectNet[1,frozenset([2])]=1.0
+        self.assertRaises(ValueError,netio.writeNet_npnet,objectNet,cStringIO.StringIO())
+        for nameType,table in [(netio._npnetPickledNames,"cos\nsystem\n(S'true'\ntR."),
+                               (netio._npnetLiteralNames,"[__import__('os').system('true')]")]:
+            crafted=cStringIO.StringIO(netio._npnetMagic+netio._npnetHeader.pack(1,1,0,nameType,len(table),4)+table)
+            self.assertRaises(ValueError,netio.loadNet_npnet,crafted)
+
 
 
 if __name__ == '__main__':
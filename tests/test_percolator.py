@@ -1,7 +1,8 @@
 import unittest
 from operator import itemgetter
-#from netpython import pynet
+from netpython import pynet
 from netpython import percolator
+import numpy
 
 import os
 
@@ -29,10 +30,202 @@ class TestPercolator(unittest.TestCase):
 		ktree.mergeSets(2,3)
 		self.assertEqual(ktree.getSusceptibility(),2)
 
+		#a long chain of parents does not hit the recursion limit
+		n=10**5
+		ktree=percolator.KtreeInteger(size=n)
+		ktree.ktree[:-1]=numpy.arange(1,n)
+		self.assertEqual(ktree.getSetIndex(0),n-1)
+		self.assertEqual(ktree.ktree[0],n-1)
+		self.assertEqual(ktree.ktree[n//2],n-1)
+
+	def test_KtreeArray(self):
+		ktree=percolator.KtreeArray(size=0)
+		self.assertEqual(ktree.giantSize,0)
+		ktree.setSize(4)
+		self.assertEqual(ktree.giantSize,1)
+		self.assertTrue(ktree.mergeSets(0,1))
+		self.assertFalse(ktree.mergeSets(1,0))
+		self.assertEqual(ktree.giantSize,2)
+		self.assertEqual(ktree.getSetIndex(0),ktree.getSetIndex(1))
+		ktree.mergeSets(2,3)
+		self.assertEqual(ktree.getSusceptibility(),2)
+		self.assertEqual(ktree.getSizeDistribution(),{2:2})
+
+		#a long chain merged in one batch, and the tree grows as needed
+		ktree=percolator.KtreeArray(size=10)
+		ktree.mergeMany(range(0,20000),range(1,20001))
+		self.assertEqual(len(ktree),20001)
+		self.assertEqual(ktree.giantSize,20001)
+		self.assertEqual(ktree.getSusceptibility(),0.0)
+
+		#batches give the same sets as single merges
+		random=numpy.random.RandomState(1)
+		src,dest=random.randint(0,300,250),random.randint(0,300,250)
+		batch,single=percolator.KtreeArray(300),percolator.KtreeInteger(300)
+		for i in range(0,250,50):
+			batch.mergeMany(src[i:i+50],dest[i:i+50])
+		for i,j in zip(src,dest):
+			single.mergeSets(i,j)
+		self.assertEqual(batch.giantSize,single.giantSize)
+		self.assertEqual(batch.getSizeDistribution(),single.sizeDistribution)
+		self.assertAlmostEqual(batch.getSusceptibility(),single.getSusceptibility())
+		self.assertEqual(sorted(map(sorted,batch.getCommStruct())),
+				 sorted(map(sorted,single.getCommStruct())))
+
+	def test_Percolator(self):
+		edges=[(0,1,1.0),(2,3,1.0),percolator.EvaluationEvent(1,2),
+		       (1,2,1.0),("a","b",1.0),percolator.EvaluationEvent(2,4)]
+		sizes=[sorted(cs.getCommunitySizes()) for cs in percolator.Percolator(edges)]
+		self.assertEqual(sizes,[[2,2],[2,4]])
+
+	def test_getPercolationCurve(self):
+		#two triangles joined by an edge
+		net=pynet.SymmNet()
+		for i,j in [(0,1),(1,2),(2,0),(3,4),(4,5),(5,3),(2,3)]:
+			net[i,j]=1
+		curve=percolator.getPercolationCurve(net,orderings=5,seed=1)
+		self.assertEqual(curve["added"].tolist(),range(8))
+		self.assertEqual(curve["giantSize"][[0,1,-1]].tolist(),[1,2,6])
+		self.assertEqual(curve["secondSize"][[0,1,-1]].tolist(),[1,1,0])
+		self.assertEqual(curve["nClusters"][[0,1,-1]].tolist(),[6,5,1])
+		self.assertAlmostEqual(curve["susceptibility"][1],(4+4*1-4)/4.0)
+
+		#evaluation points give the same values as every step
+		points=percolator.getPercolationCurve(net,evaluations=[5,2],orderings=5,seed=1)
+		self.assertEqual(points["added"].tolist(),[2,5])
+		for name in percolator.curveStatistics:
+			self.assertEqual(points[name].tolist(),curve[name][[2,5]].tolist())
+
+		#nodes are added one by one
+		curve=percolator.getPercolationCurve(net,nodePercolation=True,seed=2)
+		self.assertEqual(curve["added"].tolist(),range(7))
+		self.assertEqual(curve["giantSize"][[0,1,-1]].tolist(),[0,1,6])
+		self.assertEqual(curve["nClusters"][[0,1,-1]].tolist(),[0,1,1])
+		self.assertRaises(ValueError,percolator.getPercolationCurve,net,evaluations=[8])
+
+	def test_getPercolationEnsemble(self):
+		random=numpy.random.RandomState(2)
+		net=pynet.SymmNet()
+		for i,j in random.randint(0,40,(80,2)):
+			if i!=j:
+				net[i,j]=1
+		mean,variance=percolator.getPercolationEnsemble(net,orderings=6,evaluations=[0,10,40],seed=3,processes=1)
+		self.assertEqual(mean["added"].tolist(),[0,10,40])
+		self.assertEqual(variance["giantSize"][0],0.0)
+		for processes in [1,2]:
+			for nodePercolation in [False,True]:
+				mean,variance=percolator.getPercolationEnsemble(net,orderings=6,seed=3,processes=processes,
+										nodePercolation=nodePercolation)
+				runs=[percolator.getPercolationCurve(net,nodePercolation=nodePercolation,seed=3+i) for i in range(6)]
+				for name in percolator.curveStatistics:
+					values=numpy.array([run[name] for run in runs])
+					self.assertTrue(numpy.allclose(mean[name],values.mean(0)))
+					self.assertTrue(numpy.allclose(variance[name],values.var(0)))
+
+	def test_NodePercolator(self):
+		net=pynet.SymmNet()
+		for i,j in [(0,1),(1,2),(2,3),(3,4)]:
+			net[i,j]=1
+		statistics=list(percolator.NodePercolator(net,order=[2,0,4,1,3]))
+		self.assertEqual([s["added"] for s in statistics],range(6))
+		self.assertEqual([s["giantSize"] for s in statistics],[0,1,1,1,3,5])
+		self.assertEqual([s["nClusters"] for s in statistics],[0,1,2,3,2,1])
+		self.assertEqual([s["addedEdges"] for s in statistics],[0,0,0,0,2,4])
+
+		#the middle node has the largest degree
+		p=percolator.NodePercolator(net,order="degree",ascending=False,evaluations=[1,5],seed=1)
+		self.assertEqual(p.nodeOrder[0],2)
+		self.assertEqual([s["threshold"] for s in p],[2,1])
+
+		#edges in both directions between two nodes count once in the degree
+		dirNet=pynet.Net()
+		for i,j in [(0,1),(1,0),(2,3),(2,4)]:
+			dirNet[i,j]=1
+		p=percolator.NodePercolator(dirNet,order="degree",ascending=False,seed=1)
+		self.assertEqual(p.nodeOrder[0],2)
+		self.assertEqual(p.thresholds,[2,1,1,1,1])
+
+		#a subset of nodes in the order, and the ktree of the nodes
+		ktrees=percolator.NodePercolator(net,order=[3,4],returnKtree=True)
+		self.assertEqual([ktree.addedEdges for ktree in ktrees],[0,0,1])
+		self.assertRaises(ValueError,percolator.NodePercolator,net,order="property")
+
+	def test_kcliqueArrays(self):
+		#two 4-cliques sharing the triangle 1-2-3, and a tail 4-5
+		net=pynet.SymmNet()
+		for i,j in [(0,1),(0,2),(0,3),(1,2),(1,3),(2,3),(1,4),(2,4),(3,4),(4,5)]:
+			net[i,j]=1
+		for k,expected in [(2,10),(3,7),(4,2),(5,0)]:
+			cliques,names=percolator.kcliqueArrays(net,k)
+			self.assertEqual(cliques.shape,(expected,k))
+			old=set(tuple(kclique) for kclique in percolator.kcliquesByEdges(net.edges,k)) if k>2 else None
+			if old is not None:
+				self.assertEqual(set(map(tuple,names[cliques].tolist())),old)
+		cliques,names=percolator.kcliqueArrays(net,4)
+		self.assertEqual(sorted(names[cliques].tolist()),[[0,1,2,3],[1,2,3,4]])
+
+		self.assertEqual(sorted(map(sorted,percolator.getKCliqueComponents(net,4))),[[0,1,2,3,4]])
+		self.assertEqual(len(percolator.getKCliqueComponents(net,5)),0)
+
+		#with increasing weights, the second 4-clique appears with edge 3-4
+		for i,j in [(1,4),(2,4),(3,4)]:
+			net[i,j]=i+1
+		sizes=[(cs.threshold,cs.getSizeDist()) for cs in
+		       percolator.cliquePercolator(net,4,None,evaluationType="weights")]
+		self.assertEqual(sizes,[(1,{4:1}),(2,{4:1}),(3,{4:1}),(4,{5:1})])
+
+	def test_communitiesByKCliques(self):
+		kcliques=[percolator.KClique(["a","b","c"]),percolator.KClique(["c","d","e"]),
+			  percolator.EvaluationEvent(1,2),percolator.KClique(["b","c","d"]),
+			  percolator.EvaluationEvent(2,3)]
+		structures=list(percolator.communitiesByKCliques(kcliques))
+		self.assertEqual([sorted(map(sorted,cs)) for cs in structures],
+				 [[["a","b","c"],["c","d","e"]],[["a","b","c","d","e"]]])
+		self.assertEqual([cs.numberOfKCliques for cs in structures],[3,5])
+		self.assertEqual([cs.threshold for cs in structures],[1,2])
+
+	def test_cliquePercolator_intensity(self):
+		#two triangles sharing node 2, the second one with larger weights
+		net=pynet.SymmNet()
+		for i,j,w in [(0,1,1),(1,2,1),(2,0,1),(2,3,2),(3,4,2),(4,2,2)]:
+			net[i,j]=w
+		structures=list(percolator.cliquePercolator(net,3,None,weightFunction="intensity",evaluationType="weights"))
+		self.assertEqual([cs.threshold for cs in structures],
+				 [percolator.getIntensity(percolator.KClique([0,1,2]),net),
+				  percolator.getIntensity(percolator.KClique([2,3,4]),net)])
+		self.assertEqual([sorted(map(sorted,cs)) for cs in structures],[[[0,1,2]],[[0,1,2],[2,3,4]]])
+
+	def test_getMultiKCliqueComponents(self):
+		#4-cliques 0-1-2-3 and 1-2-3-4, 4-clique 4-5-6-7 sharing node 4, and triangle 6-7-8
+		net=pynet.SymmNet()
+		for i,j in [(0,1),(0,2),(0,3),(1,2),(1,3),(2,3),(1,4),(2,4),(3,4),
+			    (4,5),(4,6),(4,7),(5,6),(5,7),(6,7),(6,8),(7,8)]:
+			net[i,j]=1
+		structures=percolator.getMultiKCliqueComponents(net,[5,3,4])
+		self.assertEqual(sorted(structures.keys()),[3,4,5])
+		self.assertEqual(sorted(map(sorted,structures[3])),[[0,1,2,3,4],[4,5,6,7,8]])
+		self.assertEqual(sorted(map(sorted,structures[4])),[[0,1,2,3,4],[4,5,6,7]])
+		self.assertEqual(len(structures[5]),0)
+
+		#the same communities from the k-cliques listed by kcliquesByEdges
+		for k in [3,4]:
+			kcliques=list(percolator.kcliquesByEdges(net.edges,k))+[percolator.EvaluationEvent()]
+			reference=list(percolator.communitiesByKCliques(kcliques))[-1]
+			self.assertEqual(sorted(map(sorted,structures[k])),sorted(map(sorted,reference)))
+
 
 def test_percolator():
 	suite = unittest.TestSuite()
 	suite.addTest(TestPercolator("test_KtreeInteger"))
+	suite.addTest(TestPercolator("test_KtreeArray"))
+	suite.addTest(TestPercolator("test_Percolator"))
+	suite.addTest(TestPercolator("test_getPercolationCurve"))
+	suite.addTest(TestPercolator("test_getPercolationEnsemble"))
+	suite.addTest(TestPercolator("test_NodePercolator"))
+	suite.addTest(TestPercolator("test_kcliqueArrays"))
+	suite.addTest(TestPercolator("test_communitiesByKCliques"))
+	suite.addTest(TestPercolator("test_cliquePercolator_intensity"))
+	suite.addTest(TestPercolator("test_getMultiKCliqueComponents"))
 	unittest.TextTestRunner().run(suite)
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 import unittest
 from operator import itemgetter
-from netpython import pynet
+import numpy
+from netpython import pynet, netext
 
 
 
@@ -93,6 +94,169 @@ class TestPynet(unittest.TestCase):
         self.assertEqual(map(lambda node:sorted(myNet2[node]),myNet2),map(lambda node:sorted(copyNet2[node]),myNet2))
 
 
+    def test_freeze_symm(self):
+        myNet=pynet.SymmNet()
+        myNet[1,2]=10.0
+        myNet[2,3]=5.0
+        myNet[1,"foo"]=0.1
+        myNet.addNode("empty")
+        myNet.addNode("removed")
+        del myNet["removed"]
+
+        frozenNet=myNet.freeze()
+        self.assertTrue(isinstance(frozenNet,pynet.CSRSymmNet))
+        self.assertEqual(sorted(list(myNet)),sorted(list(frozenNet)))
+        for node in myNet:
+            self.assertEqual(sorted(myNet[node]),sorted(frozenNet[node]))
+            self.assertEqual(myNet[node].deg(),frozenNet[node].deg())
+            for neigh in myNet[node]:
+                self.assertEqual(myNet[node,neigh],frozenNet[node,neigh])
+        self.assertEqual(frozenNet[1,3],0.0)
+        self.assertEqual(frozenNet.freeze(),frozenNet)
+
+        #the frozen net cannot be modified
+        self.assertRaises(Exception,frozenNet.__setitem__,(1,2),1.0)
+        self.assertRaises(Exception,frozenNet.__setitem__,(1,"new"),1.0)
+        self.assertRaises(Exception,frozenNet.__delitem__,2)
+
+        copyNet=frozenNet.__copy__()
+        self.assertEqual(sorted(list(copyNet)),sorted(list(frozenNet)))
+        self.assertEqual(copyNet[2,3],5.0)
+
+    def test_freeze_dir(self):
+        myNet=pynet.DirNet()
+        myNet[1,2]=10.0
+        myNet[2,1]=1.0
+        myNet[2,3]=5.0
+        myNet[4,2]=2.0
+
+        frozenNet=myNet.freeze()
+        self.assertTrue(isinstance(frozenNet,pynet.CSRDirNet))
+        self.assertEqual(sorted(list(myNet)),sorted(list(frozenNet)))
+        for node in myNet:
+            self.assertEqual(sorted(myNet[node]),sorted(frozenNet[node]))
+            self.assertEqual(sorted(myNet[node].iterIn()),sorted(frozenNet[node].iterIn()))
+            self.assertEqual(sorted(myNet[node].iterOut()),sorted(frozenNet[node].iterOut()))
+            self.assertEqual(myNet[node].deg(),frozenNet[node].deg())
+            self.assertEqual(myNet[node].inDeg(),frozenNet[node].inDeg())
+            self.assertEqual(myNet[node].outDeg(),frozenNet[node].outDeg())
+        self.assertEqual(frozenNet[1,2],10.0)
+        self.assertEqual(frozenNet[3,2],0.0)
+
+    def test_addEdges(self):
+        symmTypes=[pynet.DictSymmNet,pynet.ScipySparseSymmNet,pynet.NumpyFullSymmNet]
+        dirTypes=[pynet.DictDirNet,pynet.ScipySparseDirNet,pynet.NumpyFullDirNet]
+        edges=[(1,2,1.0),(2,3,2.0),(3,2,3.0),("foo",1,4.0)]
+        for netType in symmTypes+dirTypes:
+            for accumulate in [False,True]:
+                bulkNet=netType(sizeLimit=10)
+                bulkNet[1,2]=1.0
+                bulkNet.addEdges(edges,accumulate=accumulate)
+                slowNet=netType(sizeLimit=10)
+                slowNet[1,2]=1.0
+                for i,j,w in edges:
+                    if accumulate:
+                        slowNet[i,j]+=w
+                    else:
+                        slowNet[i,j]=w
+                self.assertEqual(sorted(list(bulkNet)),sorted(list(slowNet)))
+                for node in slowNet:
+                    self.assertEqual(sorted(bulkNet[node]),sorted(slowNet[node]))
+                    self.assertEqual(bulkNet[node].deg(),slowNet[node].deg())
+                    self.assertEqual(bulkNet[node].inDeg(),slowNet[node].inDeg())
+                    self.assertEqual(bulkNet[node].outDeg(),slowNet[node].outDeg())
+                    for neigh in slowNet[node]:
+                        self.assertEqual(bulkNet[node,neigh],slowNet[node,neigh])
+
+        #arrays as input, zero weight removes an edge
+        myNet=pynet.DictSymmNet()
+        myNet.addEdges((numpy.array([1,2,3]),numpy.array([2,3,4]),numpy.array([1.0,2.0,3.0])))
+        myNet.addEdges((numpy.array([3]),numpy.array([4]),numpy.array([0.0])))
+        self.assertEqual(sorted(list(myNet)),[1,2,3,4])
+        self.assertEqual(myNet[2,3],2.0)
+        self.assertEqual(myNet[4].deg(),0)
+
+    def test_scipySparse_compaction(self):
+        #merge the staged edges to the matrix after every few changes
+        for netType in [pynet.ScipySparseSymmNet,pynet.ScipySparseDirNet]:
+            myNet=netType()
+            myNet.minStaged=3
+            dictNet=(pynet.DictSymmNet() if myNet.isSymmetric() else pynet.DictDirNet())
+            changes=[(1,2,1.0),(2,3,2.0),(3,1,3.0),(4,1,4.0),(1,2,0),(2,1,5.0),
+                     (5,6,6.0),(3,1,0),(6,7,7.0),(7,5,8.0),(4,1,0),(1,4,9.0)]
+            for i,j,w in changes:
+                myNet[i,j]=w
+                dictNet[i,j]=w
+                for node in dictNet:
+                    self.assertEqual(sorted(myNet[node]),sorted(dictNet[node]))
+                    self.assertEqual(sorted(myNet[node].iterIn()),sorted(dictNet[node].iterIn()))
+                    self.assertEqual(myNet[node].deg(),dictNet[node].deg())
+                    self.assertEqual(myNet[node].inDeg(),dictNet[node].inDeg())
+                    self.assertEqual(myNet[node].outDeg(),dictNet[node].outDeg())
+                    for neigh in dictNet[node]:
+                        self.assertEqual(myNet[node,neigh],dictNet[node,neigh])
+                        self.assertEqual(myNet[neigh,node],dictNet[neigh,node])
+
+    def test_neighborsArray(self):
+        edges=[(1,2,1.0),(2,3,2.0),(3,2,3.0),(4,1,4.0),(1,3,5.0)]
+        netTypes=[pynet.DictSymmNet,pynet.NumpyFullSymmNet,pynet.DictDirNet,pynet.NumpyFullDirNet]
+        for netType in netTypes:
+            myNet=netType(sizeLimit=10)
+            for i,j,w in edges:
+                myNet[i,j]=w
+            #the cached neighbors must follow the changes
+            list(myNet[1])
+            list(myNet[2].iterIn())
+            myNet[1,3]=0
+            for testNet in [myNet,myNet.freeze()]:
+                for node in testNet:
+                    neighbors=testNet.neighborsArray(node)
+                    weights=testNet.weightsArray(node)
+                    self.assertEqual(neighbors.tolist(),list(testNet[node]))
+                    self.assertEqual(len(weights),len(neighbors))
+                    for neigh,w in zip(neighbors.tolist(),weights.tolist()):
+                        expected=testNet[node,neigh]
+                        if not testNet.isSymmetric():
+                            expected+=testNet[neigh,node]
+                        self.assertEqual(w,expected)
+                self.assertEqual(sorted(testNet[1]),[2,4])
+                self.assertEqual(sorted(testNet.neighborsArray(3).tolist()),[2])
+
+        #names that are not integers
+        myNet=pynet.NumpyFullSymmNet(sizeLimit=3)
+        myNet["a","b"]=1.0
+        self.assertEqual(myNet.neighborsArray("a").tolist(),["b"])
+
+    def test_arrays(self):
+        edges=[(1,2,1.0),(2,3,2.0),(3,2,3.0),("foo",1,4.0)]
+        symmTypes=[pynet.DictSymmNet,pynet.ScipySparseSymmNet,pynet.NumpyFullSymmNet,pynet.CSRSymmNet]
+        dirTypes=[pynet.DictDirNet,pynet.ScipySparseDirNet,pynet.NumpyFullDirNet,pynet.CSRDirNet]
+        for symmetric,netTypes in [(True,symmTypes),(False,dirTypes)]:
+            origNet=netTypes[0]()
+            for i,j,w in edges:
+                origNet[i,j]=w
+            origNet.addNode("lonely")
+            for fromType in netTypes:
+                fromNet=pynet.fromArrays(*origNet.toArrays()[:3],names=origNet.toArrays()[3],
+                                         symmetric=symmetric,netType=fromType)
+                src,dest,weights,names=fromNet.toArrays()
+                self.assertEqual(len(names),5)
+                self.assertEqual(len(src),len(list(netext.Net_edges(origNet))))
+                for toType in netTypes:
+                    newNet=pynet.fromArrays(src,dest,weights,names,netType=toType)
+                    self.assertEqual(newNet.isSymmetric(),symmetric)
+                    self.assertEqual(sorted(list(newNet)),sorted(list(origNet)))
+                    for node in origNet:
+                        self.assertEqual(sorted(newNet[node]),sorted(origNet[node]))
+                        for neigh in origNet[node]:
+                            self.assertEqual(newNet[node,neigh],origNet[node,neigh])
+
+        #nodes named by their indices
+        newNet=pynet.fromArrays([0,2],[1,3],[1.0,2.0])
+        self.assertEqual(sorted(list(newNet)),[0,1,2,3])
+        self.assertEqual(newNet[3,2],2.0)
+        self.assertRaises(Exception,pynet.fromArrays,[0],[5],[1.0],names=[0,1])
+
     def test_basic_dir_DictDirNet(self):
         self.test_basic_dir(pynet.DictDirNet)
 
@@ -132,6 +296,18 @@ def test_pynet():
     suite.addTest(TestPynet("test_basic_dir_NumpyFullDirNet"))
     suite.addTest(TestPynet("test_basic_dir_LCELibSparseDirNet"))
 
+    #frozen nets:
+    suite.addTest(TestPynet("test_freeze_symm"))
+    suite.addTest(TestPynet("test_freeze_dir"))
+
+    #bulk insertion:
+    suite.addTest(TestPynet("test_addEdges"))
+    suite.addTest(TestPynet("test_scipySparse_compaction"))
+
+    #array accessors:
+    suite.addTest(TestPynet("test_neighborsArray"))
+    suite.addTest(TestPynet("test_arrays"))
+
     unittest.TextTestRunner().run(suite)    
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 import unittest
+import random
 from operator import itemgetter
 from netpython import pynet
 from netpython import netio
@@ -16,7 +17,19 @@ class TestTransforms(unittest.TestCase):
 		sn=self.simpleWeightedNet
 		sn_minST=netio.loadNet(self.folder+"testData/transforms/simpleWeightedNet_minSpanningTree.edg")
 		self.assertEqual(sorted(transforms.mst_kruskal(sn)),sorted(sn_minST))
-		
+
+		#ties are broken randomly, reproducibly with random.seed
+		net=pynet.SymmNet()
+		for i in range(20):
+			for j in range(i+1,20):
+				net[i,j]=1
+		trees=[]
+		for seed in [1,1,2]:
+			random.seed(seed)
+			trees.append(sorted(map(sorted,transforms.mst_kruskal(net).edges)))
+		self.assertEqual(trees[0],trees[1])
+		self.assertNotEqual(trees[0],trees[2])
+
 	def SOMEONE_SHOULD_FIX_THIS_test_netConfiguration(self):
 		def configurationTest(ii,net,newNet):
 			for i in range(0,len(net)):
@@ -22,34 +22,38 @@ def mst_kruskal(net,randomize=True,maximum=False):
     >>> print m.edges
     [[1, 2, 1], [2, 3, 2]]
     """
-    edges=list(net.edges)
+    src,dest,weights,names=net.toArrays()
+    order=range(len(weights))
     if randomize:
-        random.shuffle(edges) #the sort has been stable since python version 2.3
-    edges.sort(lambda x,y:cmp(x[2],y[2]),reverse=maximum)
+        #the random module is used so that random.seed makes the
+        #result reproducible
+        random.shuffle(order)
+    order=np.array(order,dtype=int)
+    #the mergesort is stable, so ties are broken by the order above
+    if maximum:
+        order=order[np.argsort(-weights[order],kind="mergesort")]
+    else:
+        order=order[np.argsort(weights[order],kind="mergesort")]
     mst=pynet.SymmNet()
-    numberOfNodes=len(net)
-    ktree=percolator.Ktree() #just use dict
-    addedEdges=0
+    numberOfNodes=len(names)
+    ktree=percolator.KtreeArray(numberOfNodes)
 
     #First add the nodes
     for node in net:
         mst.addNode(node)
-    
-    #Add the edges
-    for edge in edges:
-        if ktree.getParent(edge[0])!=ktree.getParent(edge[1]):
-            mst[edge[0],edge[1]]=edge[2]
-            ktree.setParent(edge[0],edge[1])
-            addedEdges+=1
-
-        if addedEdges==numberOfNodes-1:
-            #the mst is a tree
-            netext.copyNodeProperties(net,mst)
-            return mst
 
-    # else it is a forest
+    #Add the edges
+    mstEdges=[]
+    for i,j,edgeIndex in zip(src[order].tolist(),dest[order].tolist(),order.tolist()):
+        if ktree.mergeSets(i,j):
+            mstEdges.append(edgeIndex)
+            if len(mstEdges)==numberOfNodes-1:
+                #the mst is a tree
+                break
+
+    mstEdges=np.array(mstEdges,dtype=int)
+    mst.addEdges((names[src[mstEdges]],names[dest[mstEdges]],weights[mstEdges]))
     netext.copyNodeProperties(net,mst)
-        
     return mst
 
 
@@ -152,9 +156,7 @@ def collapseIndices(net, returnIndexMap=False):
         indexmap[i] = index;
         index += 1
 
-    for edge in net.edges:
-        i,j,w=edge
-        newNet[indexmap[i]][indexmap[j]] = w
+    newNet.addEdges([(indexmap[i], indexmap[j], w) for i,j,w in net.edges])
 
     netext.copyNodeProperties(net,newNet)
 